@@ -0,0 +1,257 @@
+"""Sheet backends for excel_watcher (``--backend com|file|memory``).
+
+A backend owns the connection to the cell source and reads a ReadPlan's
+cells into the plan's slot arrays with ``read_slots(plan)`` (``read(plan)``
+returns them as a dict):
+
+    com     running Excel over COM (default, needs pywin32); busy retries and
+            reattach after an Excel restart in excel_session.py
+    file    saved .xlsx/.xlsm on disk: re-read only when the file changes,
+            only the target sheet's XML part, only up to the last watched row
+            (excel_xlsx.py, imported only for this backend)
+    memory  dict-backed sheet (replay, benchmarks, headless UI work)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from excel_cells import MemorySheet, ReadPlan
+
+# Exit codes for structured error handling (Electron reads these)
+EXIT_EXCEL_NOT_RUNNING = 2
+EXIT_WORKBOOK_NOT_FOUND = 3
+
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm", ".xlsb", ".xls")
+
+
+def _win32com():
+    """win32com.client, imported on first COM use (startup before the attach stays light)."""
+    try:
+        import win32com.client  # type: ignore
+    except ImportError:
+        raise SystemExit("pywin32 not installed. Run: pip install pywin32")
+    return win32com.client
+
+
+def excel_app():
+    """Running Excel.Application, or None if Excel is not running."""
+    client = _win32com()
+    try:
+        return client.GetObject(Class="Excel.Application")
+    except Exception:
+        return None
+
+
+def attach_excel_app():
+    """Connect to running Excel."""
+    app = excel_app()
+    if app is None:
+        print("[ERROR] Excel is not running.", flush=True)
+        raise SystemExit(EXIT_EXCEL_NOT_RUNNING)
+    return app
+
+
+def early_bound(obj):
+    """``obj`` as its makepy (gencache) class; dynamic dispatch if that is unavailable.
+
+    Dynamic dispatch asks Excel for type info of every object it returns
+    (each Range of every read); the generated classes already know the
+    DISPIDs. The wrapper module is generated once per machine into gen_py
+    (bForDemand: only the interfaces used), later starts load it from there.
+    """
+    try:
+        from win32com.client import gencache  # type: ignore
+        return gencache.EnsureDispatch(obj)
+    except Exception as e:
+        print(f"[WARN] Early-bound COM wrapper unavailable ({e}), using dynamic dispatch")
+        return obj
+
+
+def norm_path(path: Any) -> str:
+    """Case/separator-normalized absolute path (string work only, no file system calls)."""
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def find_workbook(app, path: Path):
+    """Find already-open workbook (does NOT auto-open files), exit if it is not open."""
+    wb = open_workbook(app, path)
+    if wb is None:
+        print(f"[ERROR] Workbook not found among open files: {path}", flush=True)
+        raise SystemExit(EXIT_WORKBOOK_NOT_FOUND)
+    return wb
+
+
+def open_workbook(app, path: Path):
+    """Already-open workbook at ``path`` or None.
+
+    ``Workbooks(name)`` is one COM call, checked against the normalized full
+    path (same name in another folder). Only on a miss are the open
+    workbooks compared by normalized path, and ``samefile`` (symlinks,
+    mapped drives) is the last resort.
+    """
+    target = norm_path(path)
+    try:
+        wb = app.Workbooks(Path(path).name)
+        if norm_path(wb.FullName) == target:
+            return wb
+    except Exception:
+        pass
+    books = []
+    for wb in app.Workbooks:
+        try:
+            full = wb.FullName
+        except Exception:
+            continue
+        if norm_path(full) == target:
+            return wb
+        books.append((full, wb))
+    for full, wb in books:
+        try:
+            if Path(full).resolve().samefile(path):
+                return wb
+        except Exception:
+            continue
+    return None
+
+
+def running_workbooks() -> List[Tuple[Path, Any]]:
+    """(path, Workbook) of every saved workbook open in any Excel instance.
+
+    GetObject(Class=...) only sees one Excel process; the Running Object
+    Table has a file moniker for each open workbook of every instance.
+    """
+    client = _win32com()
+    import pythoncom  # type: ignore
+    rot = pythoncom.GetRunningObjectTable()
+    ctx = pythoncom.CreateBindCtx(0)
+    found = []
+    for moniker in rot:
+        try:
+            name = moniker.GetDisplayName(ctx, None)
+        except Exception:
+            continue
+        if Path(name).suffix.lower() not in WORKBOOK_SUFFIXES:
+            continue
+        try:
+            obj = rot.GetObject(moniker)
+            wb = client.Dispatch(obj.QueryInterface(pythoncom.IID_IDispatch))
+        except Exception:
+            continue
+        found.append((Path(name), wb))
+    return found
+
+
+class SheetBackend:
+    """Source of cell values for the watcher."""
+
+    name = ""
+    discoverable = False  # sheet exposes UsedRange for excel_layout.discover
+
+    def open(self) -> "SheetBackend":
+        return self
+
+    def read_slots(self, plan: ReadPlan):
+        """Fill ``plan.cur`` (the watcher's per-tick path, no dicts)."""
+        raise NotImplementedError
+
+    def read(self, plan: ReadPlan) -> Dict[str, Any]:
+        self.read_slots(plan)
+        return plan.as_dict()
+
+    def describe(self) -> str:
+        return self.name
+
+    def close(self):
+        pass
+
+
+class ComBackend(SheetBackend):
+    """Running Excel instance over COM (exits with EXIT_* codes like before at startup).
+
+    After the attach the connection lives in an excel_session.ComSession: a
+    busy Excel keeps the last values (``plan.stale``), a closed or restarted
+    one is reattached on a later read.
+    """
+
+    name = "com"
+    discoverable = True
+
+    def __init__(self, path: Path, sheet_name: str, workbook=None, early: bool = True,
+                 retry_ms: Optional[int] = None):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.early = early  # --com-binding early: makepy wrapper for the sheet (see early_bound)
+        self.retry_ms = retry_ms  # --com-retry-ms; None = excel_session.RETRY_BUDGET_MS
+        self.session = None  # excel_session.ComSession, set by open()
+        self._workbook = workbook  # already bound (running_workbooks), skips the lookup
+
+    def open(self) -> "ComBackend":
+        from excel_session import RETRY_BUDGET_MS, ComSession
+        retry_ms = RETRY_BUDGET_MS if self.retry_ms is None else self.retry_ms
+        self.session = ComSession(self.path, self.sheet_name, self.early, retry_ms).open(self._workbook)
+        self._workbook = None
+        return self
+
+    @property
+    def app(self):
+        return self.session.app if self.session is not None else None
+
+    @property
+    def workbook(self):
+        return self.session.workbook if self.session is not None else self._workbook
+
+    @property
+    def sheet(self):
+        return self.session.sheet if self.session is not None else None
+
+    @property
+    def binding(self) -> str:
+        return self.session.binding if self.session is not None else ""
+
+    def read_slots(self, plan: ReadPlan):
+        s = self.session
+        if not s.ensure():
+            plan.keep()
+            return
+        plan.read_slots(s.sheet, s.interrupts)
+        s.check(plan.last_error)
+
+    def describe(self) -> str:
+        return f"com ({self.binding})" if self.binding else self.name
+
+
+class MemoryBackend(SheetBackend):
+    """Dict-backed sheet; ``update`` sets cells (replay, benchmarks)."""
+
+    name = "memory"
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None):
+        self.sheet = MemorySheet(values)
+
+    @classmethod
+    def from_json(cls, path: Path) -> "MemoryBackend":
+        """Seed from a current_state.json-like file ("cells" key) or a flat {cell: value} dict."""
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if isinstance(data, dict) and isinstance(data.get("cells"), dict):
+            data = data["cells"]
+        return cls(data if isinstance(data, dict) else {})
+
+    def update(self, cells: Dict[str, Any]):
+        self.sheet.values.update(cells)
+
+    def read_slots(self, plan: ReadPlan):
+        plan.read_slots(self.sheet)
+
+
+def make_backend(kind: str, path: Path, sheet_name: str, early: bool = True,
+                 retry_ms: Optional[int] = None) -> SheetBackend:
+    if kind == "file":
+        from excel_xlsx import FileBackend  # zipfile / xml only for this backend
+        return FileBackend(path, sheet_name)
+    if kind == "memory":
+        if path and Path(path).suffix.lower() == ".json" and Path(path).is_file():
+            return MemoryBackend.from_json(path)
+        return MemoryBackend()
+    return ComBackend(path, sheet_name, early=early, retry_ms=retry_ms)
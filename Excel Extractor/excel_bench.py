@@ -0,0 +1,1262 @@
+"""Benchmarks for the Excel Extractor hot path (run on any OS, no Excel needed).
+
+Запуск:
+    python excel_bench.py wire [--traffic FILE] [--ticks N] [--json]
+    python excel_bench.py pipeline [--latency-ms 0.3] [--jitter-ms 0.1] [--iterations N]
+                                   [--scenario NAME ...] [--json] [--out FILE] [--baseline FILE]
+    python excel_bench.py keypress [--latency-ms 0.3] [--presses N] [--json]
+    python excel_bench.py multi [--workbooks 1 4 8] [--seconds 5] [--change-ms 50] [--json]
+    python excel_bench.py markets [--rows 10 50 146] [--iterations N] [--json]
+    python excel_bench.py writer [--stall-ms 150] [--stall-p 0.05] [--iterations N] [--json]
+    python excel_bench.py shm [--iterations N] [--seconds 2] [--json]
+    python excel_bench.py startup [--workbooks 1 5 20] [--runs 5] [--json]
+    python excel_bench.py session [--ticks 600] [--tick-ms 10] [--json]
+    python excel_bench.py alloc [--cells 14 500 2000] [--iterations N] [--json]
+
+wire: full state payload (current_state.json, indent=2) vs compact
+      keyframe/delta wire format (excel_publish.DeltaEncoder) on recorded
+      or synthetic traffic. Reports bytes per tick and encode time.
+
+pipeline: watcher hot path against FakeComSheet (``Range(ref).Value`` with
+      per-call latency, jitter and occasional recalc stalls). Per scenario
+      (idle, one_cell, all_maps, template_switch) reports ops/s, p50/p99 for
+      each stage - read (planned blocks), read_cells (legacy per-cell),
+      diff, diff_maps, build_maps, serialize, write_state - and for the full
+      tick (Watcher.tick: read -> diff -> current_state.json replaced).
+      ``--out`` saves the JSON report; ``--baseline`` compares against a
+      saved report (e.g. from the previous commit).
+
+keypress: hotkey odds step (excel_hotkey_controller) on FakeComSheet - the
+      old call sequence (template_sync.json read twice, eight Cells reads,
+      list.index ladder lookup, write) vs excel_keypath.KeyPath (one M:N
+      block read, one write). Reports COM calls and latency per keypress.
+
+multi: several FakeComSheet workbooks, one of them changing every
+      ``--change-ms``, the rest idle. ``deadline`` = excel_multi.MultiWatcher
+      (each workbook on its own adaptive interval), ``lockstep`` = one loop
+      reading every workbook per cycle. Reports change -> state file latency
+      of the active workbook and reads/s, per workbook count.
+
+markets: ``--markets all`` (excel_markets.MarketWatch) on FakeComSheet with
+      5 map blocks of ``--rows`` rows x A:N, one market row changing per
+      tick, next to the 14-cell Map Winner tick. Reports Watcher.tick
+      latency, COM calls, read time (most of its growth is FakeComSheet
+      building the block tuples cell by cell), block row diff time, and a
+      per-cell read of the same cells for comparison.
+
+writer: Watcher.tick with one cell changing per tick while the state file
+      replace stalls for ``--stall-ms`` with probability ``--stall-p``
+      (antivirus / OneDrive). ``sync`` writes inside the tick (--sync-write),
+      ``writer`` hands the state to excel_writer.StateWriter. Reports tick
+      latency, file writes, merged states and whether the file ends with
+      the last snapshot.
+
+shm: consumer side of the state. ``json`` = open + read + json.loads of a
+      current_state.json per check (what a file consumer does every poll),
+      ``stat`` = mtime check only, ``shm seq`` = excel_shm.ShmReader seq
+      check, ``shm read`` = consistent copy + decode. Then a writer process
+      rewrites the --shm snapshot as fast as it can for ``--seconds`` while
+      this process reads it: every accepted snapshot is checked for torn
+      fields (must be 0), retries count copies the seqlock threw away.
+
+startup: workbook lookup on a fake Excel with N open workbooks (FullName
+      and Workbooks(name) cost one call latency each): the old
+      resolve().samefile loop vs excel_backends.find_workbook. Then
+      ``--runs`` watcher processes (memory backend): wall time from spawn
+      to the stale republish line and to the first INIT, and the startup
+      total the watcher prints itself.
+
+session: fault injection on a fake Excel: five short busy spells (cell
+      edit), one long one, then Excel closes and comes back as a new
+      process. ``legacy`` = failed reads become None (the old ReadPlan),
+      ``session`` = excel_backends.ComBackend on excel_session.ComSession
+      (last good values, stale flag, reattach). Reports state file writes,
+      writes with phantom None cells, writes marked stale, ticks where
+      Excel answers but the state differs from the sheet, reconnects, time
+      from the Excel restart to live values again, and whether the last
+      state matches the sheet. Runs on a virtual clock (``--tick-ms`` per
+      tick) shared by the reconnect throttle and STALE_AFTER, so every run
+      gives the same numbers. The COM message filter itself needs real
+      COM; its retry schedule (excel_session.retry_delay_ms) is in the
+      config.
+
+alloc: per-tick cost of the watcher snapshot with 14 watched cells and
+      with larger cell sets (extra cells in a dense grid below the maps),
+      idle and with one cell changing per tick. ``dict`` = the tick before
+      the slot arrays (read into a dict, copy in cell order, changed-dict
+      comprehension, Watcher.process), ``slots`` = Watcher.tick on
+      ReadPlan's preallocated arrays. Reports time per tick, bytes
+      allocated at the peak of a tick (tracemalloc), memory retained after
+      all ticks, and gen-0 GC collections per 10k ticks. The sheet has no
+      call latency, so the numbers are the Python side of the tick.
+
+Traffic file: replay format (see excel_replay.py) - JSONL ticks
+``{"t": seconds, "cells": {cell: value}}`` or a ``--record`` tick ring.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import gc
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import excel_watcher as watcher
+import excel_session
+from excel_backends import ComBackend, MemoryBackend, find_workbook
+from excel_cells import MemorySheet, cell_ref
+from excel_keypath import STEP_OK, KeyPath
+from excel_ladder import OddsLadder
+from excel_layout import DEFAULT_LAYOUT, Layout
+from excel_metrics import Metrics
+from excel_multi import MULTI_STAGES, MultiWatcher
+from excel_publish import DeltaEncoder, encode_line
+from excel_replay import load_ticks
+from excel_scheduler import TaskScheduler
+from excel_shm import ShmReader, ShmSnapshot
+from excel_writer import StateWriter, replace_file
+
+# Шаг лестницы odds для синтетического трафика
+ODDS_LADDER = [round(1.01 + i * 0.01, 2) for i in range(100)] + [round(2.0 + i * 0.02, 2) for i in range(100)]
+
+
+def synthetic_traffic(ticks: int, seed: int = 1) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Trading-like traffic: one or two map odds step per tick, rare status/template flips."""
+    rnd = random.Random(seed)
+    cells = {c: None for c in watcher.CELLS}
+    cells.update({watcher.TEMPLATE_CELL: "LoL Bo3", watcher.STATUS_CELL: "Trading",
+                  watcher.TEAM1_CELL: "Team Liquid", watcher.TEAM2_CELL: "Cloud9"})
+    idx = {}
+    for home, away in watcher.MAP_CELL_PAIRS:
+        i = rnd.randrange(len(ODDS_LADDER))
+        idx[home] = i
+        cells[home] = ODDS_LADDER[i]
+        cells[away] = ODDS_LADDER[len(ODDS_LADDER) - 1 - i]
+    t = 0.0
+    yield t, dict(cells)
+    for n in range(1, ticks):
+        t += rnd.uniform(0.02, 0.5)
+        changed = {}
+        if n % 500 == 0:
+            changed[watcher.TEMPLATE_CELL] = rnd.choice(["LoL Bo3", "LoL Bo5", "CS2 Bo3"])
+        elif rnd.random() < 0.03:
+            changed[watcher.STATUS_CELL] = "Suspended" if cells[watcher.STATUS_CELL] == "Trading" else "Trading"
+        else:
+            for home, away in rnd.sample(watcher.MAP_CELL_PAIRS[:3], rnd.choice((1, 1, 1, 2))):
+                i = max(0, min(len(ODDS_LADDER) - 1, idx[home] + rnd.choice((-1, 1))))
+                idx[home] = i
+                changed[home] = ODDS_LADDER[i]
+                changed[away] = ODDS_LADDER[len(ODDS_LADDER) - 1 - i]
+        cells.update(changed)
+        yield t, changed
+
+
+def snapshots(traffic) -> Iterator[Tuple[float, Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+    """(t, full, changed, prev) per tick, prev=None for the first."""
+    full: Dict[str, Any] = {}
+    prev = None
+    for t, cells in traffic:
+        cur = dict(full)
+        cur.update(cells)
+        changed = {k: v for k, v in cur.items() if prev is None or prev.get(k) != v}
+        yield t, cur, changed, prev
+        full = cur
+        prev = cur
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q / 100.0 * (len(s) - 1))))]
+
+
+def summarize(name: str, sizes: List[int], times_us: List[float]) -> Dict[str, Any]:
+    return {
+        "format": name,
+        "messages": len(sizes),
+        "bytes_total": sum(sizes),
+        "bytes_per_msg": round(statistics.mean(sizes), 1) if sizes else 0,
+        "encode_us_mean": round(statistics.mean(times_us), 2) if times_us else 0,
+        "encode_us_p50": round(percentile(times_us, 50), 2),
+        "encode_us_p99": round(percentile(times_us, 99), 2),
+    }
+
+
+def bench_wire(traffic, keyframe_interval: float) -> List[Dict[str, Any]]:
+    ticks = list(snapshots(traffic))
+    clock = time.perf_counter
+
+    sizes, times = [], []
+    for t, cur, changed, prev in ticks:
+        first = prev is None
+        t0 = clock()
+        payload = watcher.build_state("2026-01-01 00:00:00", cur, None if first else changed, first, prev)
+        data = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        times.append((clock() - t0) * 1e6)
+        sizes.append(len(data))
+    full = summarize("full (indent=2)", sizes, times)
+
+    enc = DeltaEncoder(watcher.MAP_CELL_PAIRS, watcher.state_header, keyframe_interval)
+    sizes, times = [], []
+    for t, cur, changed, prev in ticks:
+        tpl_changed = prev is not None and prev.get(watcher.TEMPLATE_CELL) != cur.get(watcher.TEMPLATE_CELL)
+        t0 = clock()
+        data = encode_line(enc.encode(cur, changed, force_keyframe=prev is None or tpl_changed, now=t))
+        times.append((clock() - t0) * 1e6)
+        sizes.append(len(data))
+    delta = summarize("delta (compact)", sizes, times)
+    delta["keyframes"] = enc.keyframes
+    return [full, delta]
+
+
+class FakeComSheet(MemorySheet):
+    """MemorySheet that costs like a COM worksheet.
+
+    Every ``Range`` call spins for ``latency_ms`` plus uniform ``jitter_ms``;
+    with probability ``recalc_p`` a call also hits a recalc stall of
+    ``recalc_ms`` (Excel busy recalculating). Spinning instead of sleeping
+    keeps sub-millisecond latencies accurate.
+    """
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None, latency_ms: float = 0.3,
+                 jitter_ms: float = 0.1, recalc_p: float = 0.01, recalc_ms: float = 5.0, seed: int = 1):
+        super().__init__(values)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.recalc_p = recalc_p
+        self.recalc_ms = recalc_ms
+        self._rnd = random.Random(seed)
+
+    def _stall(self):
+        delay = self.latency_ms + self._rnd.uniform(0.0, self.jitter_ms)
+        if self.recalc_p and self._rnd.random() < self.recalc_p:
+            delay += self.recalc_ms
+        if delay > 0:
+            end = time.perf_counter() + delay / 1000.0
+            while time.perf_counter() < end:
+                pass
+
+    def Range(self, ref: str):
+        self._stall()
+        return super().Range(ref)
+
+    def Cells(self, row: int, col: int):
+        # Cell writes go through the returned object and cost nothing extra
+        # here; the call itself stands in for the round trip.
+        self._stall()
+        return super().Cells(row, col)
+
+
+class FakeComBackend(MemoryBackend):
+    """MemoryBackend over a FakeComSheet (Watcher.tick reads through it)."""
+
+    name = "fake-com"
+
+    def __init__(self, sheet: FakeComSheet):
+        self.sheet = sheet
+
+
+def base_cells() -> Dict[str, Any]:
+    return next(synthetic_traffic(1))[1]
+
+
+def _step_odds(values: Dict[str, Any], home: str, away: str, n: int):
+    i = n % len(ODDS_LADDER)
+    values[home] = ODDS_LADDER[i]
+    values[away] = ODDS_LADDER[len(ODDS_LADDER) - 1 - i]
+
+
+def _idle(values: Dict[str, Any], n: int):
+    pass
+
+
+def _one_cell(values: Dict[str, Any], n: int):
+    values["M44"] = ODDS_LADDER[n % len(ODDS_LADDER)]
+
+
+def _all_maps(values: Dict[str, Any], n: int):
+    for k, (home, away) in enumerate(watcher.MAP_CELL_PAIRS):
+        _step_odds(values, home, away, n + k)
+
+
+def _template_switch(values: Dict[str, Any], n: int):
+    values[watcher.TEMPLATE_CELL] = ("LoL Bo3", "LoL Bo5", "CS2 Bo3")[n % 3]
+
+
+SCENARIOS: Dict[str, Callable[[Dict[str, Any], int], None]] = {
+    "idle": _idle,
+    "one_cell": _one_cell,
+    "all_maps": _all_maps,
+    "template_switch": _template_switch,
+}
+
+
+def stage_row(scenario: str, stage: str, times_us: List[float]) -> Dict[str, Any]:
+    mean = statistics.mean(times_us) if times_us else 0.0
+    return {
+        "scenario": scenario,
+        "stage": stage,
+        "n": len(times_us),
+        "ops_per_s": round(1e6 / mean, 1) if mean > 0 else 0.0,
+        "mean_us": round(mean, 2),
+        "p50_us": round(percentile(times_us, 50), 2),
+        "p99_us": round(percentile(times_us, 99), 2),
+    }
+
+
+def bench_pipeline(scenarios: List[str], iterations: int, sheet_kw: Dict[str, Any],
+                   state_dir: Path) -> List[Dict[str, Any]]:
+    """Time every stage of the watcher tick on a FakeComSheet, per scenario."""
+    clock = time.perf_counter
+    watcher.STATE_FILE = state_dir / "current_state.json"
+    plan = watcher.make_read_plan(watcher.CELLS)
+    rows = []
+    for name in scenarios:
+        mutate = SCENARIOS[name]
+        sheet = FakeComSheet(base_cells(), **sheet_kw)
+        stages: Dict[str, List[float]] = {k: [] for k in (
+            "read", "read_cells", "diff", "diff_maps", "build_maps", "serialize", "write_state")}
+        prev = plan.read(sheet)
+        for n in range(1, iterations + 1):
+            mutate(sheet.values, n)
+
+            t0 = clock()
+            cur = plan.read(sheet)
+            t1 = clock()
+            watcher.read_cells_batch(sheet, watcher.CELLS)
+            t2 = clock()
+            changed = {k: v for k, v in cur.items() if prev.get(k) != v}
+            t3 = clock()
+            watcher.diff_maps(prev, cur)
+            t4 = clock()
+            watcher.build_maps(cur)
+            t5 = clock()
+            payload = watcher.build_state("2026-01-01 00:00:00", cur, changed or None, False, prev)
+            json.dumps(payload, ensure_ascii=False, indent=2)
+            t6 = clock()
+            watcher.write_state_file(payload)
+            t7 = clock()
+
+            for key, a, b in (("read", t0, t1), ("read_cells", t1, t2), ("diff", t2, t3),
+                              ("diff_maps", t3, t4), ("build_maps", t4, t5),
+                              ("serialize", t5, t6), ("write_state", t6, t7)):
+                stages[key].append((b - a) * 1e6)
+            prev = cur
+        rows.extend(stage_row(name, stage, times) for stage, times in stages.items())
+
+        # Full tick: Watcher.tick as the poll loop runs it (INIT/CHG prints swallowed)
+        sheet = FakeComSheet(base_cells(), **sheet_kw)
+        backend = FakeComBackend(sheet)
+        w = watcher.Watcher(plan)
+        ticks = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            w.tick(backend)
+            for n in range(1, iterations + 1):
+                mutate(sheet.values, n)
+                t0 = clock()
+                w.tick(backend)
+                ticks.append((clock() - t0) * 1e6)
+        rows.append(stage_row(name, "tick_to_file", ticks))
+    return rows
+
+
+# Map rows of the controller's default layout (the controller needs pywin32 to import)
+MAP_WINNER_ROWS = DEFAULT_LAYOUT.map_rows
+
+
+def _legacy_read_map(sync_file: Path) -> int:
+    data = json.loads(sync_file.read_text(encoding="utf-8"))
+    return data.get("map", 1)
+
+
+def legacy_keypress(sheet: FakeComSheet, ladder: List[Any], sync_file: Path, direction: int) -> bool:
+    """COM/file call sequence of the controller before excel_keypath (hold check + next/prev)."""
+    # _check_key_hold_allowed
+    row = MAP_WINNER_ROWS[_legacy_read_map(sync_file)]
+    (sheet.Cells(row, 13).Value, sheet.Cells(row, 14).Value)
+    # next_odds_home: get_row_for_current_map, is_cell_blocked, get_current_odds
+    row = MAP_WINNER_ROWS[_legacy_read_map(sync_file)]
+    home, away = sheet.Cells(row, 13).Value, sheet.Cells(row, 14).Value
+    if any(str(v).strip().upper() in ("WIN", "LOSE") for v in (home, away) if v):
+        return False
+    current = sheet.Cells(row, 13).Value
+    sheet.Cells(row, 14).Value
+    idx = -1
+    if current in ladder:
+        idx = ladder.index(current)
+    else:
+        for i, v in enumerate(ladder):
+            if isinstance(v, (int, float)) and abs(v - current) < 0.001:
+                idx = i
+                break
+    j = idx + direction
+    if idx < 0 or not 0 <= j < len(ladder):
+        return False
+    sheet.Cells(row, 13).Value = ladder[j]
+    # log line re-read
+    (sheet.Cells(row, 13).Value, sheet.Cells(row, 14).Value)
+    return True
+
+
+def bench_keypress(presses: int, sheet_kw: Dict[str, Any], state_dir: Path) -> List[Dict[str, Any]]:
+    """Old vs KeyPath keypress latency; the watcher rewrites current_state.json after every step."""
+    home = [round(1.01 + i * 0.01, 2) for i in range(100)] + [round(2.0 + i * 0.02, 2) for i in range(400)]
+    away = [round(1 / (1 - 1 / h), 3) for h in home]
+    sync_file = state_dir / "template_sync.json"
+    sync_file.write_text(json.dumps({"map": 1, "template": "LoL Bo3"}), encoding="utf-8")
+    notify_file = state_dir / "current_state.json"
+    notify_file.write_text("{}", encoding="utf-8")
+    clock = time.perf_counter
+    rows = []
+    for name in ("legacy", "keypath"):
+        sheet = FakeComSheet({"M44": home[250], "N44": away[250]}, **sheet_kw)
+        keys = KeyPath(sheet, OddsLadder(home, away), notify_file=notify_file)
+        sync_sig, map_num = None, 1
+        times = []
+        for n in range(presses):
+            direction = 1 if (n // 50) % 2 == 0 else -1
+            calls0 = sheet.calls
+            t0 = clock()
+            if name == "legacy":
+                ok = legacy_keypress(sheet, home, sync_file, direction)
+            else:
+                st = sync_file.stat()  # controller: read_current_map re-parses only on change
+                if (st.st_mtime_ns, st.st_size) != sync_sig:
+                    sync_sig = (st.st_mtime_ns, st.st_size)
+                    map_num = _legacy_read_map(sync_file)
+                row = MAP_WINNER_ROWS[map_num]
+                odds = keys.read_row(row)
+                ok = keys.step(row, direction, odds).status == STEP_OK
+            times.append((clock() - t0) * 1e6)
+            if n == 0:
+                calls = sheet.calls - calls0
+            if ok:
+                # Watcher noticed the change and rewrote current_state.json
+                notify_file.write_text(json.dumps({"n": n}), encoding="utf-8")
+        row_out = stage_row("keypress", name, times)
+        row_out["com_calls"] = calls
+        row_out["writes"] = sheet.writes
+        rows.append(row_out)
+    return rows
+
+
+def _multi_run(mode: str, count: int, seconds: float, change_ms: float, sheet_kw: Dict[str, Any],
+               state_dir: Path) -> Dict[str, Any]:
+    tasks = TaskScheduler()
+    multi = MultiWatcher(state_dir / f"{mode}{count}.json", "bench",
+                         make_plan=watcher.make_read_plan,
+                         make_poll=watcher.AdaptiveScheduler,
+                         metrics=Metrics(1, MULTI_STAGES), tasks=tasks)
+    sheets = [FakeComSheet(base_cells(), **dict(sheet_kw, seed=sheet_kw.get("seed", 1) + i)) for i in range(count)]
+    clock = time.perf_counter
+    warmup = watcher.POLL_BURST + 0.5  # idle workbooks have backed off by then
+    start = clock()
+    pending: List[Optional[float]] = [None]
+    latencies: List[float] = []
+    reads = [0]
+
+    def detect(slot, changed: bool):
+        if clock() - start >= warmup:
+            reads[0] += 1
+        if changed and slot.name == "book0.xlsm" and pending[0] is not None:
+            if pending[0] - start >= warmup:
+                latencies.append((clock() - pending[0]) * 1e6)
+            pending[0] = None
+
+    def change(n=[0]):
+        n[0] += 1
+        sheets[0].values["M44"] = ODDS_LADDER[n[0] % len(ODDS_LADDER)]
+        if pending[0] is None:
+            pending[0] = clock()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        slots = [multi.add(Path(f"book{i}.xlsm"), FakeComBackend(sh)) for i, sh in enumerate(sheets)]
+        if mode == "deadline":
+            poll = multi.poll
+
+            def tracked(slot):
+                before = slot.changes
+                poll(slot)
+                detect(slot, slot.changes != before)
+            multi.poll = tracked
+        else:
+            for slot in slots:
+                slot.task.cancel()
+            shared = watcher.AdaptiveScheduler()
+
+            def lockstep():
+                any_changed = False
+                for slot in slots:
+                    changed = slot.watcher.tick(slot.backend)
+                    detect(slot, changed)
+                    any_changed = any_changed or changed
+                tasks.call_later(shared.update(any_changed), lockstep)
+            tasks.call_later(0.0, lockstep)
+        tasks.call_every(change_ms / 1000.0, change)
+        while clock() - start < seconds:
+            time.sleep(tasks.next_delay(0.05))
+            tasks.run_due()
+    row = stage_row(f"{count} workbooks", mode, latencies)
+    row["reads_per_s"] = round(reads[0] / max(1e-9, seconds - warmup), 1)
+    return row
+
+
+def bench_multi(counts: List[int], seconds: float, change_ms: float, sheet_kw: Dict[str, Any],
+                state_dir: Path) -> List[Dict[str, Any]]:
+    """Change -> state file latency of one active workbook next to idle ones."""
+    rows = []
+    for count in counts:
+        for mode in ("deadline", "lockstep"):
+            rows.append(_multi_run(mode, count, seconds, change_ms, sheet_kw, state_dir))
+    return rows
+
+
+def _market_values(layout: Layout, rows_per_map: int) -> Dict[str, Any]:
+    values = {c: v for c, v in base_cells().items() if c in (watcher.TEMPLATE_CELL, watcher.STATUS_CELL,
+                                                              watcher.TEAM1_CELL, watcher.TEAM2_CELL)}
+    for n, top in layout.map_rows.items():
+        for i in range(max(1, rows_per_map)):
+            values[f"B{top + i}"] = f"Map {n} Winner" if i == 0 else f"Market {i}"
+            _step_odds(values, f"M{top + i}", f"N{top + i}", n + i)
+    return values
+
+
+def bench_markets(sizes: List[int], iterations: int, sheet_kw: Dict[str, Any],
+                  state_dir: Path) -> List[Dict[str, Any]]:
+    """Watcher.tick cost vs number of watched cells: Map Winner only, then whole map blocks."""
+    clock = time.perf_counter
+    watcher.STATE_FILE = state_dir / "current_state.json"
+    rows = []
+    for k in [0] + sizes:
+        layout = DEFAULT_LAYOUT if k == 0 else Layout({n: 44 + (n - 1) * k for n in range(1, 6)})
+        sheet = FakeComSheet(_market_values(layout, k), **sheet_kw)
+        backend = FakeComBackend(sheet)
+        w = watcher.Watcher(watcher.make_read_plan(layout.cells), layout=layout)
+        if k:
+            w.enable_markets()
+        cells = w.markets.cell_count + len(w.plan.cells) if k else len(layout.cells)
+        times, reads, diffs = [], [], []
+        with contextlib.redirect_stdout(io.StringIO()):
+            w.tick(backend)
+            for n in range(1, iterations + 1):
+                row = 44 + (1 + n % (k - 1) if k > 1 else 0)  # a market row of map 1 (Map Winner if k <= 1)
+                _step_odds(sheet.values, f"M{row}", f"N{row}", n)
+                t0 = clock()
+                w.tick(backend)
+                times.append((clock() - t0) * 1e6)
+                read_us = w.plan.last_ms * 1e3
+                if k:
+                    diffs.append(w.markets.diff_ns / 1e3)
+                    read_us += w.markets.last_ms * 1e3 - diffs[-1]
+                reads.append(read_us)
+        out = stage_row(f"{cells} cells", "blocks" if k else "map_winner", times)
+        out["com_calls"] = w.plan.last_calls + (w.markets.last_calls if k else 0)
+        out["read_us"] = round(statistics.mean(reads), 2)
+        out["diff_us"] = round(statistics.mean(diffs), 2) if diffs else ""
+        rows.append(out)
+        if k:
+            # Same cells one COM call each (--read-mode cells over the blocks): a few ticks are enough
+            per_cell = w.plan.cells + [cell_ref(b.top + i, c) for b in w.markets.blocks
+                                       for i in range(b.n_rows) for c in range(b.left, b.right + 1)]
+            times = []
+            for _ in range(max(1, min(iterations, 2000 // len(per_cell)))):
+                t0 = clock()
+                watcher.read_cells_batch(sheet, per_cell)
+                times.append((clock() - t0) * 1e6)
+            out = stage_row(f"{cells} cells", "per_cell_read", times)
+            out["com_calls"] = len(per_cell)
+            rows.append(out)
+    return rows
+
+
+def _stalling_replace(stall_ms: float, stall_p: float, seed: int) -> Callable[[Path, str], bool]:
+    rnd = random.Random(seed)
+
+    def replace(path: Path, text: str) -> bool:
+        if rnd.random() < stall_p:
+            time.sleep(stall_ms / 1000.0)
+        return replace_file(path, text)
+    return replace
+
+
+def bench_writer(iterations: int, stall_ms: float, stall_p: float, write_interval: float,
+                 sheet_kw: Dict[str, Any], state_dir: Path) -> List[Dict[str, Any]]:
+    """Tick latency with a stalling state file: inline writes vs the writer thread."""
+    clock = time.perf_counter
+    rows = []
+    for mode in ("sync", "writer"):
+        sheet = FakeComSheet(base_cells(), **sheet_kw)
+        backend = FakeComBackend(sheet)
+        w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS))
+        w.state_file = state_dir / f"{mode}.json"
+        replace = _stalling_replace(stall_ms, stall_p, sheet_kw.get("seed", 1))
+        writer = None
+        saved = watcher.replace_file
+        if mode == "writer":
+            writer = w.writer = StateWriter(write_interval, replace=replace).start()
+        else:
+            watcher.replace_file = replace
+        times = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                w.tick(backend)
+                for n in range(1, iterations + 1):
+                    _one_cell(sheet.values, n)
+                    t0 = clock()
+                    w.tick(backend)
+                    times.append((clock() - t0) * 1e6)
+                if writer is not None:
+                    writer.close()
+        finally:
+            watcher.replace_file = saved
+        row = stage_row(f"stall {stall_ms:g}ms p={stall_p:g}", mode, times)
+        row["max_us"] = round(max(times), 2)
+        row["writes"] = writer.writes if writer is not None else iterations + 1
+        row["merged"] = writer.merged if writer is not None else 0
+        final = json.loads(w.state_file.read_text(encoding="utf-8"))
+        row["final_is_last"] = final["cells"] == w.prev
+        rows.append(row)
+    return rows
+
+
+def _timed(fn: Callable[[], Any], iterations: int) -> List[float]:
+    clock = time.perf_counter_ns
+    times = []
+    for _ in range(iterations):
+        t0 = clock()
+        fn()
+        times.append((clock() - t0) / 1000.0)
+    return times
+
+
+def _shm_writer(path: str, seconds: float, started):
+    """Writer process: snapshot k has every field derived from k (checked by _shm_torn)."""
+    shm = ShmSnapshot(Path(path))
+    started.set()
+    deadline = time.monotonic() + seconds
+    k = 0
+    while time.monotonic() < deadline:
+        k += 1
+        shm.write(f"T{k}", "Trading", f"A{k}", f"B{k}", 5, [(n, float(k + n), float(-k - n)) for n in range(1, 6)])
+    shm.close()
+
+
+def _shm_torn(snap: Dict[str, Any]) -> bool:
+    k = int(snap["template"][1:] or 0)
+    if snap["team1Name"] != f"A{k}" or snap["team2Name"] != f"B{k}":
+        return True
+    return any(m["side1"] != k + int(n) or m["side2"] != -k - int(n) for n, m in snap["maps"].items())
+
+
+def bench_shm(iterations: int, seconds: float, state_dir: Path) -> List[Dict[str, Any]]:
+    """Per-check consumer cost (JSON file vs shm), then torn reads against a concurrent writer."""
+    cells = base_cells()
+    w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS))
+    state_file = state_dir / "current_state.json"
+    replace_file(state_file, watcher.serialize_state(
+        watcher.build_state(watcher.ts(), cells, None, True, None, w.extra())))
+    shm_path = state_dir / "state.shm"
+    shm = ShmSnapshot(shm_path)
+    watcher.write_shm(shm, cells)
+    reader = ShmReader(shm_path)
+
+    def read_json():
+        with state_file.open("r", encoding="utf-8") as f:
+            return json.loads(f.read())
+
+    rows = []
+    try:
+        for stage, fn in (("json", read_json), ("stat", lambda: os.stat(state_file).st_mtime_ns),
+                          ("shm seq", reader.seq), ("shm read", reader.read)):
+            rows.append(stage_row("check (no change)", stage, _timed(fn, iterations)))
+        rows[0]["bytes"] = state_file.stat().st_size
+        rows[-1]["bytes"] = shm_path.stat().st_size
+    finally:
+        reader.close()
+        shm.close()
+
+    # Writer in another process: a real concurrent writer, not one serialized by the GIL
+    ctx = multiprocessing.get_context("spawn")
+    started = ctx.Event()
+    proc = ctx.Process(target=_shm_writer, args=(str(shm_path), seconds, started), daemon=True)
+    proc.start()
+    started.wait(30)
+    reader = ShmReader(shm_path)
+    times, torn, failed = [], 0, 0
+    clock = time.perf_counter_ns
+    try:
+        while proc.is_alive():
+            t0 = clock()
+            snap = reader.read()
+            times.append((clock() - t0) / 1000.0)
+            if snap is None:
+                failed += 1
+            elif not snap["template"].startswith("T"):
+                continue  # the snapshot from the check above, before the writer's first write
+            elif _shm_torn(snap):
+                torn += 1
+        proc.join()
+        row = stage_row("concurrent writer", "shm read", times)
+        row["writes"] = reader.seq() // 2
+        row["retries"] = reader.retries
+        row["failed"] = failed
+        row["torn"] = torn
+        rows.append(row)
+    finally:
+        reader.close()
+    return rows
+
+
+class _FakeWorkbook:
+    def __init__(self, full_name: str, stall: Callable[[], None]):
+        self._full = full_name
+        self._stall = stall
+
+    @property
+    def FullName(self) -> str:
+        self._stall()
+        return self._full
+
+
+class _FakeWorkbooks:
+    """Excel's Workbooks collection: iteration and Workbooks(name) cost one call each."""
+
+    def __init__(self, books: List[_FakeWorkbook], stall: Callable[[], None]):
+        self.books = books
+        self._stall = stall
+
+    def __iter__(self):
+        self._stall()
+        return iter(self.books)
+
+    def __call__(self, name: str) -> _FakeWorkbook:
+        self._stall()
+        for wb in self.books:
+            if Path(wb._full).name.lower() == name.lower():
+                return wb
+        raise KeyError(name)
+
+
+class _FakeExcelApp:
+    def __init__(self, names: List[str], stall: Callable[[], None]):
+        self.Workbooks = _FakeWorkbooks([_FakeWorkbook(n, stall) for n in names], stall)
+
+
+def _legacy_find_workbook(app, path: Path):
+    """find_workbook before the normalized lookup: resolve + samefile per open workbook."""
+    for wb in app.Workbooks:
+        try:
+            if Path(wb.FullName).resolve().samefile(path):
+                return wb
+        except Exception:
+            continue
+    return None
+
+
+def _spawn_watcher(args: List[str], marks: Dict[str, str], timeout: float = 30.0) -> Dict[str, float]:
+    """Run a watcher process until every mark was printed: {mark: ms from spawn} (+ its own startup total)."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", str(Path(__file__).with_name("excel_watcher.py"))] + args,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    seen: Dict[str, float] = {}
+    try:
+        deadline = t0 + timeout
+        while len(seen) < len(marks) and time.perf_counter() < deadline:
+            line = proc.stdout.readline()
+            if not line:
+                break
+            for name, text in marks.items():
+                if name not in seen and text in line:
+                    seen[name] = (time.perf_counter() - t0) * 1000.0
+            if "Startup:" in line:
+                seen["reported"] = float(line.split("Startup:")[1].split("ms")[0])  # the watcher's own total
+    finally:
+        proc.kill()
+        proc.wait()
+    return seen
+
+
+def bench_startup(counts: List[int], runs: int, sheet_kw: Dict[str, Any], state_dir: Path) -> List[Dict[str, Any]]:
+    """Workbook lookup (old loop vs find_workbook) and spawn -> stale / INIT of a watcher process."""
+    stall = FakeComSheet({}, **sheet_kw)._stall
+    rows = []
+    for count in counts:
+        names = []
+        for i in range(count):
+            f = state_dir / f"Book {i}.xlsm"
+            f.write_bytes(b"")
+            names.append(str(f))
+        target = Path(names[-1])  # last in Workbooks: the loop's worst case
+        app = _FakeExcelApp(names, stall)
+        for stage, fn in (("samefile loop", lambda: _legacy_find_workbook(app, target)),
+                          ("find_workbook", lambda: find_workbook(app, target))):
+            assert fn() is not None
+            row = stage_row(f"lookup, {count} workbooks", stage, _timed(fn, 50))
+            rows.append(row)
+
+    state_file = state_dir / "current_state.json"
+    cells_file = state_dir / "cells.json"
+    cells_file.write_text(json.dumps(base_cells()), encoding="utf-8")
+    args = ["--backend", "memory", "--file", str(cells_file), "--state-file", str(state_file),
+            "--metrics-interval", "0", "--sync-write"]
+    # A state file from an earlier run, for the republish
+    replace_file(state_file, watcher.serialize_state(watcher.build_state(watcher.ts(), base_cells(), None, True, None)))
+    marks = {"stale": "as stale", "init": " INIT: ", "reported": "Startup:"}
+    results: Dict[str, List[float]] = {"stale": [], "init": [], "reported": []}
+    for _ in range(runs):
+        seen = _spawn_watcher(args, marks)
+        for name in results:
+            if name in seen:
+                results[name].append(seen[name] * 1000.0)
+    for name, label in (("stale", "spawn -> stale republish"), ("init", "spawn -> INIT"),
+                        ("reported", "printed startup total")):
+        rows.append(stage_row("watcher process (memory)", label, results[name]))
+    return rows
+
+
+class _ComError(Exception):
+    """pywintypes.com_error stand-in: (hresult, text, excepinfo, argerror)."""
+
+
+class _FlakyExcel:
+    """Fake Excel over a MemorySheet that can turn busy, close, and restart as a new process.
+
+    Sheet proxies belong to one Excel "process" (``generation``): after a
+    restart the old ones fail like dead COM objects.
+    """
+
+    def __init__(self, values: Dict[str, Any], clock: Callable[[], float] = time.perf_counter):
+        self.sheet = MemorySheet(values)
+        self.clock = clock
+        self.fault = ""      # "busy" / "gone" / ""
+        self.generation = 0
+        self.restarted_at: Optional[float] = None
+
+    def restart(self):
+        self.fault = ""
+        self.generation += 1
+        self.restarted_at = self.clock()
+
+    def app(self):
+        return None if self.fault == "gone" else self
+
+    def workbook(self) -> "_FlakyWorkbook":
+        return _FlakyWorkbook(self)
+
+
+class _FlakyWorkbook:
+    def __init__(self, excel: _FlakyExcel):
+        self.Application = excel
+        self._excel = excel
+
+    def Worksheets(self, name: str) -> "_FlakySheet":
+        return _FlakySheet(self._excel)
+
+
+class _FlakySheet:
+    BUSY = _ComError(excel_session._hr(0x800AC472), "VBA_E_IGNORE", None, None)
+    GONE = _ComError(excel_session._hr(0x80010108), "RPC_E_DISCONNECTED", None, None)
+
+    def __init__(self, excel: _FlakyExcel):
+        self._excel = excel
+        self._generation = excel.generation
+
+    def Range(self, ref: str):
+        excel = self._excel
+        if excel.fault == "gone" or excel.generation != self._generation:
+            raise self.GONE
+        if excel.fault == "busy":
+            raise self.BUSY
+        return excel.sheet.Range(ref)
+
+
+class _LegacyComBackend(MemoryBackend):
+    """Reads like before excel_session: any failed call -> None, the dead sheet is never replaced."""
+
+    name = "legacy"
+
+    def __init__(self, sheet: _FlakySheet):
+        self.sheet = sheet
+
+    def read(self, plan) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for block in plan.blocks:
+            try:
+                values.update(block.split(self.sheet.Range(block.ref).Value))
+                continue
+            except Exception:
+                pass
+            for c in block.cells:
+                try:
+                    values[c] = self.sheet.Range(c).Value
+                except Exception:
+                    values[c] = None
+        return {c: values.get(c) for c in plan.cells}
+
+    def read_slots(self, plan):
+        plan.load(self.read(plan))
+
+
+def _session_timeline(ticks: int) -> Dict[int, str]:
+    """tick -> fault from that tick on: short busy spells, a long one, then Excel closed and restarted."""
+    events: Dict[int, str] = {}
+    unit = ticks // 12
+    for k in range(5):
+        start = unit + k * unit // 2
+        events[start], events[start + 3] = "busy", ""
+    events[4 * unit], events[5 * unit] = "busy", ""
+    events[6 * unit], events[7 * unit] = "gone", "restart"
+    return events
+
+
+def bench_session(ticks: int, tick_ms: float, stale_after: float) -> List[Dict[str, Any]]:
+    """Fault injection: legacy None-on-failure reads vs ComSession (last good values + reattach)."""
+    events = _session_timeline(ticks)
+    rows = []
+    saved = (watcher.replace_file, watcher.STALE_AFTER, excel_session.excel_app, excel_session.open_workbook,
+             excel_session.running_workbooks)
+    for mode in ("legacy", "session"):
+        # Virtual time, advanced tick_ms per tick: the reconnect throttle and
+        # STALE_AFTER see the same timeline on every run
+        now = [0.0]
+
+        def clock() -> float:
+            return now[0]
+        excel = _FlakyExcel(base_cells(), clock)
+        writes: List[dict] = []
+
+        def replace(path: Path, text: str) -> bool:
+            writes.append(json.loads(text))
+            return True
+        watcher.replace_file = replace
+        watcher.STALE_AFTER = stale_after
+        excel_session.excel_app = excel.app
+        excel_session.open_workbook = lambda app, path: app.workbook()
+        excel_session.running_workbooks = lambda: []
+        back_ms = None
+        wrong = 0  # ticks with Excel answering but a published state that differs from the sheet
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if mode == "legacy":
+                    backend = _LegacyComBackend(_FlakySheet(excel))
+                else:
+                    backend = ComBackend(Path("Book.xlsm"), watcher.SHEET_NAME, workbook=excel.workbook(),
+                                         early=False)
+                    backend.open()
+                    backend.session.clock = clock
+                w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS))
+                w.clock = clock
+                w.session = getattr(backend, "session", None)
+                for n in range(ticks):
+                    fault = events.get(n)
+                    if fault == "restart":
+                        excel.restart()
+                    elif fault is not None:
+                        excel.fault = fault
+                    if n % 5 == 0 and not excel.fault:
+                        _one_cell(excel.sheet.values, n // 5)
+                    w.tick(backend)
+                    if not excel.fault and w.prev != excel.sheet.values:
+                        wrong += 1
+                    if back_ms is None and excel.restarted_at is not None and w.prev == excel.sheet.values:
+                        back_ms = (clock() - excel.restarted_at) * 1000.0
+                    now[0] += tick_ms / 1000.0
+        finally:
+            (watcher.replace_file, watcher.STALE_AFTER, excel_session.excel_app, excel_session.open_workbook,
+             excel_session.running_workbooks) = saved
+        session = getattr(backend, "session", None)
+        rows.append({
+            "mode": mode, "ticks": ticks, "writes": len(writes),
+            "phantom_writes": sum(1 for p in writes if any(v is None for v in p["cells"].values())),
+            "stale_writes": sum(1 for p in writes if p.get("stale")),
+            "wrong_ticks": wrong,
+            "rejected": session.rejected if session is not None else "",
+            "disconnects": session.disconnects if session is not None else "",
+            "reconnects": session.reconnects if session is not None else "",
+            "back_ms": round(back_ms, 1) if back_ms is not None else "never",
+            "final_ok": writes[-1]["cells"] == excel.sheet.values and not writes[-1].get("stale"),
+        })
+    return rows
+
+
+def _legacy_plan_read(plan, sheet) -> Dict[str, Any]:
+    """ReadPlan.read before the slot arrays: dict per block, then a copy in cell order."""
+    values: Dict[str, Any] = {}
+    for block in plan.blocks:
+        values.update(block.split(sheet.Range(block.ref).Value))
+    return {c: values.get(c) for c in plan.cells}
+
+
+def _alloc_cells(count: int) -> Tuple[List[str], Dict[str, Any]]:
+    """Layout cells plus a dense grid (10 columns from P, rows from 1000) up to ``count`` cells."""
+    cells = list(watcher.CELLS)
+    values = base_cells()
+    extra = max(0, count - len(cells))
+    rnd = random.Random(count)
+    for k in range(extra):
+        c = cell_ref(1000 + k // 10, 16 + k % 10)
+        cells.append(c)
+        values[c] = rnd.choice(ODDS_LADDER)
+    return cells, values
+
+
+def bench_alloc(counts: List[int], iterations: int, state_dir: Path) -> List[Dict[str, Any]]:
+    """Tick time, transient / retained memory and GC collections: dict snapshots vs slot arrays."""
+    collections = [0]
+
+    def on_gc(phase: str, info: Dict[str, int]):
+        if phase == "start" and info.get("generation") == 0:
+            collections[0] += 1
+    saved = watcher.replace_file
+    watcher.replace_file = lambda path, text: True  # the file write is the same for both, keep it out
+    gc.callbacks.append(on_gc)
+    rows = []
+    try:
+        for count in counts:
+            cells, values = _alloc_cells(count)
+            for scenario, mutate in (("idle", _idle), ("one_cell", _one_cell)):
+                for mode in ("dict", "slots"):
+                    sheet = MemorySheet(values)
+                    backend = MemoryBackend()
+                    backend.sheet = sheet
+                    w = watcher.Watcher(watcher.make_read_plan(cells))
+                    w.state_file = state_dir / "state.json"
+                    if mode == "dict":
+                        def tick():
+                            return w.process(_legacy_plan_read(w.plan, sheet))
+                    else:
+                        def tick():
+                            return w.tick(backend)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        tick()
+                        times = []
+                        clock = time.perf_counter_ns
+                        collections[0] = 0
+                        for n in range(1, iterations + 1):
+                            mutate(sheet.values, n)
+                            t0 = clock()
+                            tick()
+                            times.append((clock() - t0) / 1000.0)
+                        gcs = collections[0]
+                        tracemalloc.start()
+                        peaks = []
+                        start = tracemalloc.get_traced_memory()[0]
+                        for n in range(iterations + 1, iterations + 1 + min(iterations, 200)):
+                            mutate(sheet.values, n)
+                            tracemalloc.reset_peak()
+                            before = tracemalloc.get_traced_memory()[0]
+                            tick()
+                            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+                        retained = tracemalloc.get_traced_memory()[0] - start
+                        tracemalloc.stop()
+                    row = stage_row(f"{len(cells)} cells, {scenario}", mode, times)
+                    row["peak_bytes"] = round(statistics.mean(peaks))
+                    row["retained_bytes"] = retained
+                    row["gen0_per_10k"] = round(gcs * 10000 / iterations, 1)
+                    rows.append(row)
+    finally:
+        gc.callbacks.remove(on_gc)
+        watcher.replace_file = saved
+    return rows
+
+
+def compare(rows: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add p50/p99 change vs a saved report (matched by scenario + stage)."""
+    base = {(r.get("scenario"), r.get("stage")): r for r in baseline}
+    for r in rows:
+        b = base.get((r["scenario"], r["stage"]))
+        if not b:
+            continue
+        for key in ("p50_us", "p99_us"):
+            if b.get(key):
+                r[key.replace("_us", "_vs_base")] = f"{(r[key] / b[key] - 1) * 100:+.1f}%"
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    keys = list(rows[0].keys())
+    for r in rows:
+        for k in r:
+            if k not in keys:
+                keys.append(k)
+    widths = {k: max(len(k), *(len(str(r.get(k, ""))) for r in rows)) for k in keys}
+    print("  ".join(k.ljust(widths[k]) for k in keys))
+    for r in rows:
+        print("  ".join(str(r.get(k, "")).ljust(widths[k]) for k in keys))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Excel Extractor benchmarks")
+    sub = p.add_subparsers(dest="bench", required=True)
+    w = sub.add_parser("wire", help="full state payload vs keyframe/delta wire format")
+    w.add_argument("--traffic", default="", help="JSONL / tick ring traffic file (default: synthetic)")
+    w.add_argument("--ticks", type=int, default=5000, help="synthetic traffic length")
+    w.add_argument("--keyframe-interval", type=float, default=10.0)
+    w.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    pl = sub.add_parser("pipeline", help="watcher stages and tick-to-file on a fake COM sheet")
+    pl.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    pl.add_argument("--iterations", type=int, default=500, help="ticks per scenario")
+    pl.add_argument("--latency-ms", type=float, default=0.3, help="per Range() call")
+    pl.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    pl.add_argument("--recalc-p", type=float, default=0.01, help="probability of a recalc stall per call")
+    pl.add_argument("--recalc-ms", type=float, default=5.0, help="recalc stall length")
+    pl.add_argument("--seed", type=int, default=1)
+    pl.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    pl.add_argument("--out", default="", help="also save the JSON report here")
+    pl.add_argument("--baseline", default="", help="JSON report to compare p50/p99 against")
+    kp = sub.add_parser("keypress", help="hotkey odds step: old call sequence vs excel_keypath")
+    kp.add_argument("--presses", type=int, default=500)
+    kp.add_argument("--latency-ms", type=float, default=0.3, help="per Range()/Cells() call")
+    kp.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    kp.add_argument("--recalc-p", type=float, default=0.01, help="probability of a recalc stall per call")
+    kp.add_argument("--recalc-ms", type=float, default=5.0, help="recalc stall length")
+    kp.add_argument("--seed", type=int, default=1)
+    kp.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    mw = sub.add_parser("multi", help="one active workbook next to idle ones: per-workbook deadlines vs lockstep")
+    mw.add_argument("--workbooks", type=int, nargs="+", default=[1, 4, 8], help="workbook counts to run")
+    mw.add_argument("--seconds", type=float, default=8.0, help="run time per count and mode (first 3.5 s are warmup)")
+    mw.add_argument("--change-ms", type=float, default=50.0, help="active workbook change period")
+    mw.add_argument("--latency-ms", type=float, default=0.3, help="per Range() call")
+    mw.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    mw.add_argument("--recalc-p", type=float, default=0.01, help="probability of a recalc stall per call")
+    mw.add_argument("--recalc-ms", type=float, default=5.0, help="recalc stall length")
+    mw.add_argument("--seed", type=int, default=1)
+    mw.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    mk = sub.add_parser("markets", help="--markets all block capture vs Map Winner only and per-cell reads")
+    mk.add_argument("--rows", type=int, nargs="+", default=[10, 50, 146], help="rows per map block")
+    mk.add_argument("--iterations", type=int, default=300, help="ticks per size")
+    mk.add_argument("--latency-ms", type=float, default=0.3, help="per Range() call")
+    mk.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    mk.add_argument("--recalc-p", type=float, default=0.01, help="probability of a recalc stall per call")
+    mk.add_argument("--recalc-ms", type=float, default=5.0, help="recalc stall length")
+    mk.add_argument("--seed", type=int, default=1)
+    mk.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    wr = sub.add_parser("writer", help="tick latency with a stalling state file: inline vs writer thread")
+    wr.add_argument("--iterations", type=int, default=500, help="ticks per mode")
+    wr.add_argument("--stall-ms", type=float, default=150.0, help="state file replace stall length")
+    wr.add_argument("--stall-p", type=float, default=0.05, help="probability of a stall per replace")
+    wr.add_argument("--write-interval", type=float, default=watcher.WRITE_INTERVAL,
+                    help="StateWriter min interval between writes")
+    wr.add_argument("--latency-ms", type=float, default=0.3, help="per Range() call")
+    wr.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    wr.add_argument("--recalc-p", type=float, default=0.01, help="probability of a recalc stall per call")
+    wr.add_argument("--recalc-ms", type=float, default=5.0, help="recalc stall length")
+    wr.add_argument("--seed", type=int, default=1)
+    wr.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    sh = sub.add_parser("shm", help="consumer check cost: current_state.json parse vs --shm seqlock snapshot")
+    sh.add_argument("--iterations", type=int, default=5000, help="checks per consumer kind")
+    sh.add_argument("--seconds", type=float, default=2.0, help="concurrent writer run time")
+    sh.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    st = sub.add_parser("startup", help="workbook lookup and process spawn -> stale republish / first INIT")
+    st.add_argument("--workbooks", type=int, nargs="+", default=[1, 5, 20], help="open workbooks in the fake Excel")
+    st.add_argument("--runs", type=int, default=5, help="watcher processes to time")
+    st.add_argument("--latency-ms", type=float, default=0.3, help="per COM call")
+    st.add_argument("--jitter-ms", type=float, default=0.1, help="uniform extra per call")
+    st.add_argument("--seed", type=int, default=1)
+    st.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    se = sub.add_parser("session", help="busy / closed / restarted Excel: None-on-failure reads vs ComSession")
+    se.add_argument("--ticks", type=int, default=600, help="watcher ticks (faults at fixed fractions of the run)")
+    se.add_argument("--tick-ms", type=float, default=10.0, help="virtual time between ticks")
+    se.add_argument("--stale-after", type=float, default=0.2,
+                    help="watcher.STALE_AFTER for the run (seconds of failed reads before a stale write)")
+    se.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    al = sub.add_parser("alloc", help="watcher tick time, allocations and GC: dict snapshots vs slot arrays")
+    al.add_argument("--cells", type=int, nargs="+", default=[14, 500, 2000], help="watched cell counts")
+    al.add_argument("--iterations", type=int, default=1000, help="ticks per cell count, scenario and mode")
+    al.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.bench == "wire":
+        traffic = load_ticks(args.traffic) if args.traffic else synthetic_traffic(args.ticks)
+        rows = bench_wire(traffic, args.keyframe_interval)
+        report = {"bench": args.bench, "results": rows}
+    elif args.bench == "keypress":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "recalc_p": args.recalc_p, "recalc_ms": args.recalc_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_keypress(args.presses, sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, presses=args.presses), "results": rows}
+    elif args.bench == "multi":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "recalc_p": args.recalc_p, "recalc_ms": args.recalc_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_multi(args.workbooks, args.seconds, args.change_ms, sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, seconds=args.seconds, change_ms=args.change_ms),
+                  "results": rows}
+    elif args.bench == "markets":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "recalc_p": args.recalc_p, "recalc_ms": args.recalc_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_markets(args.rows, args.iterations, sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, iterations=args.iterations), "results": rows}
+    elif args.bench == "writer":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "recalc_p": args.recalc_p, "recalc_ms": args.recalc_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_writer(args.iterations, args.stall_ms, args.stall_p, args.write_interval,
+                                sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, iterations=args.iterations, stall_ms=args.stall_ms,
+                                                      stall_p=args.stall_p, write_interval=args.write_interval),
+                  "results": rows}
+    elif args.bench == "shm":
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_shm(args.iterations, args.seconds, Path(tmp))
+        report = {"bench": args.bench, "config": {"iterations": args.iterations, "seconds": args.seconds},
+                  "results": rows}
+    elif args.bench == "startup":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_startup(args.workbooks, args.runs, sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, runs=args.runs), "results": rows}
+    elif args.bench == "session":
+        rows = bench_session(args.ticks, args.tick_ms, args.stale_after)
+        schedule, waited = [], 0
+        while True:
+            delay = excel_session.retry_delay_ms(waited)
+            if delay < 0:
+                break
+            schedule.append(delay)
+            waited += delay
+        report = {"bench": args.bench, "config": {"ticks": args.ticks, "tick_ms": args.tick_ms,
+                                                  "stale_after": args.stale_after,
+                                                  "filter_retry_ms": schedule}, "results": rows}
+    elif args.bench == "alloc":
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_alloc(args.cells, args.iterations, Path(tmp))
+        report = {"bench": args.bench, "config": {"iterations": args.iterations}, "results": rows}
+    elif args.bench == "pipeline":
+        sheet_kw = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "recalc_p": args.recalc_p, "recalc_ms": args.recalc_ms, "seed": args.seed}
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = bench_pipeline(args.scenario, args.iterations, sheet_kw, Path(tmp))
+        report = {"bench": args.bench, "config": dict(sheet_kw, iterations=args.iterations),
+                  "results": rows}
+        if args.out:
+            Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        if args.baseline:
+            compare(rows, json.loads(Path(args.baseline).read_text(encoding="utf-8")).get("results", []))
+    else:
+        raise SystemExit(f"Unknown benchmark: {args.bench}")
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Excel bridge: excel_watcher + excel_hotkey_controller in one process, one COM thread.
+
+Запуск:
+    python excel_bridge.py --file BOOK.xlsm [опции excel_watcher.py]
+    python excel_watcher.py ... [--hotkeys]     # то же, хоткеи только с --hotkeys
+    python excel_hotkey_controller.py [--file]  # только хоткеи, без current_state.json
+
+Раньше watcher и контроллер были двумя процессами: каждый подключался к
+Excel по COM и читал одни и те же ячейки M/N, и Excel выполнял их вызовы по
+очереди. Здесь:
+
+    - одно подключение (--file, а не ActiveWorkbook) и один поток: опрос
+      watcher'а - задача в TaskScheduler контроллера, между опросами поток
+      ждёт хоткеи на очереди команд;
+    - общая модель ячеек: снимок последнего опроса (Watcher.prev) заполняет
+      кэш строк M:N контроллера, так что нажатие обычно обходится без чтения;
+    - запись хоткея сразу попадает в модель и публикуется (current_state.json,
+      --serve) без ожидания следующего опроса; пересчитанный N придёт с ним;
+    - одна разметка листа (excel_layout.py): watcher находит её при старте и
+      при смене шаблона и передаёт контроллеру;
+    - одна COM-сессия (excel_session.py): после перезапуска Excel она
+      переподключается сама и отдаёт новые объекты контроллеру и событиям
+      книги.
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import excel_watcher as watcher
+from excel_backends import SheetBackend, make_backend
+from excel_cells import cell_ref, parse_cell
+from excel_history import TickRecorder
+from excel_metrics import Metrics, StartupTimer
+from excel_publish import DeltaEncoder, PublishServer
+from excel_scheduler import TaskScheduler
+from excel_shm import SIZE as SHM_SIZE, ShmSnapshot
+from excel_writer import StateWriter
+
+
+class ExcelBridge:
+    """Runs the watcher's adaptive poll as a scheduler task next to the hotkey controller."""
+
+    def __init__(self, w: "watcher.Watcher", backend: SheetBackend, scheduler: "watcher.AdaptiveScheduler",
+                 controller=None, sync: Optional["watcher.FileTouchMonitor"] = None):
+        self.watcher = w
+        self.backend = backend
+        self.poll_scheduler = scheduler
+        self.controller = controller
+        self.sync = sync
+        self.tasks: TaskScheduler = controller.scheduler if controller is not None else TaskScheduler()
+        self.local_writes = 0
+        self.errors = 0  # failed polls in a row
+
+    def start(self):
+        ctl = self.controller
+        if ctl is not None and ctl.keys is not None:
+            ctl.keys.on_write = self.local_write
+        self.poll()
+
+    def poll(self):
+        """One watcher tick, then reschedule itself at the adaptive interval (also after a failed tick)."""
+        delay = self.poll_scheduler.ceiling
+        try:
+            touched = self.sync.touched() if self.sync is not None else False
+            if touched:
+                self.poll_scheduler.update(True)
+            changed = self.watcher.tick(self.backend)
+            self.share_rows()
+            self.errors = 0
+            delay = self.poll_scheduler.update(changed or touched)
+        except Exception as e:
+            # Like MultiWatcher.poll: warn and back off, but never drop out of the schedule
+            self.errors += 1
+            print(f"[WARN] Poll failed ({self.errors}x): {e}")
+        finally:
+            self.tasks.call_later(delay, self.poll, name="poll")
+
+    def share_rows(self):
+        """Refresh the controller's M:N row cache from the snapshot just read."""
+        ctl = self.controller
+        cur = self.watcher.prev
+        if ctl is None or ctl.keys is None or cur is None:
+            return
+        cache = ctl.keys.cache
+        for home, away in self.watcher.layout.map_cell_pairs:
+            row = parse_cell(home)[0]
+            cache.put(row, cur.get(home), cur.get(away))
+
+    def local_write(self, row: int, home: Any, away: Any):
+        """Hotkey wrote M{row}: publish it now (N follows with the next poll)."""
+        cur = self.watcher.prev
+        if cur is None:
+            return
+        cell = cell_ref(row, self.watcher.layout.home_col)
+        if cell not in cur or cur.get(cell) == home:
+            return
+        snapshot = dict(cur)
+        snapshot[cell] = home
+        self.local_writes += 1
+        self.watcher.process(snapshot)
+        # Next poll right away to pick up the recalculated side
+        self.poll_scheduler.update(True)
+
+    def run(self):
+        self.start()
+        if self.controller is not None:
+            if not self.controller.serve():
+                return  # Ctrl+C
+            # Ctrl+Esc ends the hotkeys only; current_state.json keeps updating
+            print("[INFO] Hotkeys stopped, watcher keeps running")
+            self.controller = None
+            self.watcher.on_layout = None
+        while True:
+            time.sleep(self.tasks.next_delay(watcher.POLL_MAX))
+            self.tasks.run_due()
+
+
+def build_arg_parser():
+    p = watcher.build_arg_parser()
+    p.description = "Excel bridge: watcher + hotkey controller sharing one COM connection"
+    p.add_argument("--hotkeys", dest="hotkeys", action="store_true", default=None,
+                   help="Run the hotkey controller in this process (default for excel_bridge.py)")
+    p.add_argument("--no-hotkeys", dest="hotkeys", action="store_false",
+                   help="Watcher only (default for excel_watcher.py)")
+    p.add_argument("--command-api", default=None,
+                   help="Hotkey controller command socket (e.g. tcp://127.0.0.1:0, see excel_commands.py)")
+    return p
+
+
+def make_controller(args, file_path: Optional[Path]):
+    """Import lazily: the controller needs pywin32 + keyboard."""
+    from excel_hotkey_controller import ExcelOddsHotkeyController
+    return ExcelOddsHotkeyController(file_path, args.sheet or watcher.SHEET_NAME, args.com_retry_ms)
+
+
+def try_make_controller(args, file_path: Optional[Path]):
+    """make_controller for the watcher: None instead of exiting when keyboard/pywin32 are missing."""
+    try:
+        return make_controller(args, file_path)
+    except ImportError as e:
+        print(f"[WARN] Hotkey controller unavailable ({e}), running the watcher only")
+    except SystemExit:
+        # excel_hotkey_controller exits at import time without the keyboard package
+        print("[WARN] Hotkey controller unavailable (pip install keyboard), running the watcher only")
+    return None
+
+
+def run_hotkeys_only(args):
+    """excel_hotkey_controller.py: attach like before (ActiveWorkbook unless --file)."""
+    ctl = make_controller(args, Path(args.file).expanduser() if args.file else None)
+    if args.command_api:
+        ctl.enable_command_api(args.command_api)
+    ctl.run()
+
+
+def main(argv=None, watch: bool = True, hotkeys: Optional[bool] = True):
+    startup = StartupTimer()
+    args = build_arg_parser().parse_args(argv)
+    if args.hotkeys is not None:
+        hotkeys = args.hotkeys
+    if not watch:
+        run_hotkeys_only(args)
+        return
+
+    file_path = Path(args.file).expanduser() if args.file else watcher.DEFAULT_FILE_PATH
+    sheet_name = args.sheet or watcher.SHEET_NAME
+    if args.state_file:
+        watcher.STATE_FILE = Path(args.state_file).expanduser()
+
+    print("[INFO] Excel watcher started...")
+    if not args.replay:
+        # Last known state right away, before the COM attach (the board shows it as stale)
+        stale = watcher.republish_stale(watcher.STATE_FILE)
+        if stale is not None:
+            print(f"[INFO] Republished last state from {stale.get('ts', '?')} as stale")
+    startup.mark("stale")
+
+    if args.workbooks and not args.replay:
+        from excel_multi import run_multi
+        print("[INFO] Multi-workbook mode")
+        if hotkeys:
+            print("[WARN] Hotkeys follow one workbook, not started with --workbooks")
+        try:
+            run_multi(args, watcher.STATE_FILE, sheet_name)
+        except KeyboardInterrupt:
+            print("\n[INFO] Stopped.")
+        return
+
+    backend = None
+    layouts = None
+    if args.replay:
+        print(f"[INFO] Replay: {args.replay} (speed {args.speed or 'max'})")
+    else:
+        print(f"[INFO] File: {file_path}")
+        print(f"[INFO] Sheet: {sheet_name}")
+        backend = make_backend(args.backend, file_path, sheet_name, args.com_binding == "early",
+                               args.com_retry_ms).open()
+        startup.mark("attach")
+        print(f"[INFO] Backend: {backend.describe()}")
+        layouts = watcher.resolve_layout(backend, file_path, sheet_name, args.rediscover)
+        if layouts is not None:
+            watcher.apply_layout(layouts.layout)
+        startup.mark("layout")
+    print(f"[INFO] Cells: {', '.join(watcher.CELLS)}")
+
+    plan = watcher.make_read_plan(watcher.CELLS, args.read_mode)
+    print(f"[INFO] Read plan ({args.read_mode}): {len(plan.blocks)} blocks: {plan.describe()}")
+
+    publisher = None
+    if args.serve:
+        try:
+            publisher = PublishServer(args.serve).start()
+            print(f"[INFO] Publishing to {publisher.bound_endpoint}")
+        except Exception as e:
+            print(f"[WARN] Publish server failed to start on {args.serve}: {e}")
+    encoder = None
+    if publisher is not None and args.wire == "delta":
+        encoder = DeltaEncoder(watcher.MAP_CELL_PAIRS, watcher.state_header, args.keyframe_interval)
+    recorder = None
+    if args.record:
+        try:
+            recorder = TickRecorder(Path(args.record), args.record_capacity)
+            print(f"[INFO] Recording ticks to {args.record} ({recorder.capacity} records)")
+        except Exception as e:
+            print(f"[WARN] Tick recorder failed to open {args.record}: {e}")
+    shm = None
+    if args.shm:
+        try:
+            shm = ShmSnapshot(Path(args.shm).expanduser())
+            print(f"[INFO] Shared snapshot: {args.shm} ({SHM_SIZE} bytes, seq {shm.seq})")
+        except Exception as e:
+            print(f"[WARN] Shared snapshot failed to open {args.shm}: {e}")
+    metrics = Metrics(watcher.METRICS_SLICES, watcher.WATCHER_STAGES)
+    metrics_file = Path(args.metrics_file).expanduser() if args.metrics_file else None
+    writer = None
+    if not args.sync_write:
+        writer = StateWriter(args.write_interval, watcher.METRICS_SLICES).start()
+        print(f"[INFO] State writer thread (min {args.write_interval}s between writes)")
+
+    source = None
+    controller = None
+    try:
+        if args.replay:
+            from excel_replay import load_ticks, run_replay  # replay only
+            if args.markets == "all":
+                print("[WARN] --markets all is ignored with --replay (the log holds watched cells only)")
+            w = watcher.Watcher(plan, None, publisher, encoder, recorder, metrics)
+            w.set_metrics_output(args.metrics_interval, metrics_file)
+            w.writer = writer
+            w.shm = shm
+            w.startup = startup
+            startup.mark("setup")
+            stats = run_replay(w, load_ticks(args.replay), args.speed)
+            print(f"[INFO] Replay done: {stats['ticks']} ticks ({stats['published']} published) "
+                  f"in {stats['seconds']}s -> {stats['ticksPerSec']} ticks/s")
+            w.report_metrics()
+            return
+        if hotkeys and args.backend != "com":
+            print(f"[WARN] Hotkeys need the com backend, running the {args.backend} watcher only")
+            hotkeys = False
+        if hotkeys:
+            controller = try_make_controller(args, file_path)
+        if controller is not None:
+            if not controller.attach(backend.app, backend.workbook, backend.sheet, notify_file=None,
+                                     layout=watcher.LAYOUT, session=backend.session):
+                print("[WARN] Hotkey controller failed to attach, running the watcher only")
+                controller = None
+            elif args.command_api:
+                controller.enable_command_api(args.command_api)
+
+        if args.mode == "events" and controller is not None:
+            print("[WARN] --mode events is not shared with hotkeys yet, polling instead")
+        elif args.mode == "events" and args.backend != "com":
+            print(f"[WARN] --mode events needs the com backend, polling {args.backend} instead")
+        elif args.mode == "events":
+            try:
+                source = watcher.ComEventSource(backend.workbook, sheet_name)
+                backend.session.on_attach.append(lambda s: source.rebind(s.workbook))
+                print(f"[INFO] Mode: events (SheetChange/SheetCalculate, resync {args.event_resync}s)")
+            except Exception as e:
+                print(f"[WARN] Event hookup failed ({e}), falling back to polling")
+        scheduler = None
+        if source is None:
+            scheduler = watcher.AdaptiveScheduler(args.poll_min, args.poll_max, args.poll_burst, args.poll_backoff)
+            print(f"[INFO] Mode: poll ({scheduler.floor}s..{scheduler.ceiling}s, "
+                  f"burst {scheduler.burst}s, backoff x{scheduler.backoff})")
+        w = watcher.Watcher(plan, scheduler, publisher, encoder, recorder, metrics)
+        w.set_metrics_output(args.metrics_interval, metrics_file)
+        w.writer = writer
+        w.shm = shm
+        w.session = getattr(backend, "session", None)
+        watcher.setup_markets(w, backend, args.markets, args.market_cols)
+        if layouts is not None:
+            w.use_layouts(layouts)
+            if controller is not None:
+                w.on_layout = controller.set_layout
+        w.startup = startup
+        startup.mark("setup")
+
+        if source is not None:
+            watcher.run_event_loop(w, backend, source, args.event_resync)
+        elif controller is not None:
+            print("[INFO] Hotkey controller sharing this COM connection")
+            controller.start_hotkeys()
+            ExcelBridge(w, backend, scheduler, controller, watcher.FileTouchMonitor(watcher.SYNC_FILE)).run()
+        else:
+            watcher.run_poll_loop(w, backend, scheduler, watcher.FileTouchMonitor(watcher.SYNC_FILE))
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopped.")
+    finally:
+        if source is not None:
+            source.close()
+        if publisher is not None:
+            publisher.close()
+        if recorder is not None:
+            recorder.close()
+        if shm is not None:
+            shm.close()
+        if writer is not None:
+            writer.close()  # the freshest state is on disk before exit
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""Cell addressing and bulk range reads shared by the Excel scripts.
+
+A single ``sheet.Range(ref).Value`` is one cross-process COM round trip, so
+reading cells one by one costs a round trip per cell. ``ReadPlan`` groups a
+fixed cell list into a few rectangular blocks once, reads each block with one
+``.Value`` call and splits the 2D result back into ``{cell: value}``.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+_CELL_RE = re.compile(r"^\$?([A-Za-z]{1,3})\$?(\d+)$")
+
+# Cost of one COM call expressed in "cells read". Merging two blocks is only
+# worth it when the extra cells in the bounding box cost less than a call.
+READ_CALL_COST_CELLS = 64
+PLAN_PREMERGE_MIN = 200  # cells; above this plan_blocks first merges exact neighbours
+
+
+def col_to_index(col: str) -> int:
+    """'A' -> 1, 'N' -> 14, 'AA' -> 27."""
+    n = 0
+    for ch in col.upper():
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def index_to_col(idx: int) -> str:
+    """1 -> 'A', 14 -> 'N', 27 -> 'AA'."""
+    out = ""
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        out = chr(65 + rem) + out
+    return out
+
+
+def parse_cell(ref: str) -> Tuple[int, int]:
+    """'M44' -> (row, col) = (44, 13)."""
+    m = _CELL_RE.match(ref.strip())
+    if not m:
+        raise ValueError(f"Invalid cell reference: {ref!r}")
+    return int(m.group(2)), col_to_index(m.group(1))
+
+
+def cell_ref(row: int, col: int) -> str:
+    """(44, 13) -> 'M44'."""
+    return f"{index_to_col(col)}{row}"
+
+
+def range_ref(top: int, left: int, bottom: int, right: int) -> str:
+    """Block bounds -> 'M44:N44' (or 'C1' for a single cell)."""
+    first = cell_ref(top, left)
+    if top == bottom and left == right:
+        return first
+    return f"{first}:{cell_ref(bottom, right)}"
+
+
+def as_rows(value: Any, n_rows: int, n_cols: int) -> List[List[Any]]:
+    """Normalize a Range.Value result to a list of rows.
+
+    Single cell ranges return a scalar, multi-cell ranges a tuple of tuples.
+    """
+    if n_rows == 1 and n_cols == 1 and not isinstance(value, (tuple, list)):
+        return [[value]]
+    rows = [list(r) if isinstance(r, (tuple, list)) else [r] for r in (value or ())]
+    return rows
+
+
+class ReadBlock:
+    """One rectangular range read with a single COM call."""
+
+    __slots__ = ("top", "left", "bottom", "right", "cells", "offsets")
+
+    def __init__(self, top: int, left: int, bottom: int, right: int, cells: List[str]):
+        self.top = top
+        self.left = left
+        self.bottom = bottom
+        self.right = right
+        self.cells = cells  # watched cells inside this block
+        self.offsets = []
+        for c in cells:
+            r, col = parse_cell(c)
+            self.offsets.append((c, r - top, col - left))
+
+    @property
+    def ref(self) -> str:
+        return range_ref(self.top, self.left, self.bottom, self.right)
+
+    @property
+    def area(self) -> int:
+        return (self.bottom - self.top + 1) * (self.right - self.left + 1)
+
+    def cost(self, call_cost: int) -> int:
+        return call_cost + self.area
+
+    def merged(self, other: "ReadBlock") -> "ReadBlock":
+        return ReadBlock(
+            min(self.top, other.top), min(self.left, other.left),
+            max(self.bottom, other.bottom), max(self.right, other.right),
+            self.cells + other.cells,
+        )
+
+    def split(self, value: Any) -> Dict[str, Any]:
+        """Map a 2D Range.Value result back to the watched cells."""
+        rows = as_rows(value, self.bottom - self.top + 1, self.right - self.left + 1)
+        out = {}
+        for c, dr, dc in self.offsets:
+            try:
+                out[c] = rows[dr][dc]
+            except (IndexError, TypeError):
+                out[c] = None
+        return out
+
+    def __repr__(self) -> str:
+        return f"ReadBlock({self.ref}, cells={len(self.cells)})"
+
+
+def plan_blocks(cells: List[str], call_cost: int = READ_CALL_COST_CELLS) -> List[ReadBlock]:
+    """Group cells into the cheapest set of rectangular blocks.
+
+    Starts with one block per cell and greedily merges the pair with the
+    biggest saving (two calls -> one call minus the extra cells read) until
+    no merge pays off. With the default cost the header cells (C1, C6, K4,
+    N4) collapse into one C1:N6 block and every map row stays its own M:N
+    block; a single bounding block wins only when the cells are dense enough.
+    ``call_cost=0`` never merges, i.e. one call per cell.
+    """
+    coords = [parse_cell(c) + (c,) for c in dict.fromkeys(cells)]
+    if call_cost <= 0 or len(coords) <= PLAN_PREMERGE_MIN:
+        blocks = [ReadBlock(r, col, r, col, [c]) for r, col, c in coords]
+    else:
+        # Merges that read no extra cell (neighbours in a row, then equal-width
+        # runs in consecutive rows) save a whole call, the most any merge can
+        # save. Taking them up front keeps large dense cell sets (a grid of a
+        # few thousand cells) out of the quadratic pair search; small sets go
+        # straight to the greedy loop so their plans stay as they were.
+        runs: List[list] = []
+        for r, col, c in sorted(coords, key=lambda t: (t[0], t[1])):
+            last = runs[-1] if runs else None
+            if last is not None and last[0] == r and last[3] == col - 1:
+                last[3] = col
+                last[4].append(c)
+            else:
+                runs.append([r, col, r, col, [c]])
+        stacked: List[list] = []
+        for run in sorted(runs, key=lambda b: (b[1], b[3], b[0])):
+            last = stacked[-1] if stacked else None
+            if last is not None and (last[1], last[3]) == (run[1], run[3]) and last[2] == run[0] - 1:
+                last[2] = run[2]
+                last[4].extend(run[4])
+            else:
+                stacked.append(run)
+        blocks = [ReadBlock(*b) for b in stacked]
+
+    while len(blocks) > 1:
+        best = None
+        best_gain = 0
+        for i in range(len(blocks)):
+            for j in range(i + 1, len(blocks)):
+                m = blocks[i].merged(blocks[j])
+                gain = blocks[i].cost(call_cost) + blocks[j].cost(call_cost) - m.cost(call_cost)
+                if gain > best_gain:
+                    best_gain = gain
+                    best = (i, j, m)
+        if best is None:
+            break
+        i, j, m = best
+        blocks = [b for k, b in enumerate(blocks) if k not in (i, j)] + [m]
+
+    blocks.sort(key=lambda b: (b.top, b.left))
+    return blocks
+
+
+class ReadPlan:
+    """Fixed cell list read with the fewest COM calls.
+
+    Each watched cell has a fixed slot (``index``, computed once). A read
+    fills the preallocated ``cur`` array in place, and the array of the
+    previous read is kept as ``prev``; the two are swapped per read, so a
+    poll allocates no dicts. ``changed_slots`` compares them, and
+    ``as_dict`` builds ``{cell: value}`` only when somebody needs it.
+
+    After every read the plan keeps ``last_calls`` (COM round trips) and
+    ``last_ms`` (wall time of the read) for reporting. A cell whose read
+    failed keeps its last good value and is listed in ``stale``;
+    ``last_error`` is the last exception of the read (None if none failed).
+    """
+
+    def __init__(self, cells: List[str], call_cost: int = READ_CALL_COST_CELLS):
+        self.cells = list(dict.fromkeys(cells))
+        self.call_cost = call_cost
+        self.blocks = plan_blocks(self.cells, call_cost)
+        self.index: Dict[str, int] = {c: i for i, c in enumerate(self.cells)}
+        n = len(self.cells)
+        self.cur: List[Any] = [None] * n   # values of the last read, by slot
+        self.prev: List[Any] = [None] * n  # values of the read before it
+        # Per block: (ref, single cell, [(slot, row offset, col offset)])
+        self._reads = [(b.ref, b.area == 1, [(self.index[c], dr, dc) for c, dr, dc in b.offsets])
+                       for b in self.blocks]
+        self._seen = [0] * n  # read number that last read each slot
+        self.reads = 0
+        self.last_calls = 0
+        self.last_ms = 0.0
+        self.stale: List[str] = []
+        self.last_error: Optional[BaseException] = None
+        self.aborted = False  # the last read stopped early (see ``read_slots``' ``interrupts``)
+
+    def describe(self) -> str:
+        return ", ".join(b.ref for b in self.blocks)
+
+    def _swap(self) -> List[Any]:
+        """Last read becomes ``prev``; ``cur`` starts as its copy (failed cells keep their value)."""
+        cur, prev = self.prev, self.cur
+        cur[:] = prev
+        self.cur, self.prev = cur, prev
+        self.reads += 1
+        return cur
+
+    def read_slots(self, sheet, interrupts: Optional[Callable[[BaseException], bool]] = None):
+        """Read all planned blocks into ``cur``; a failing block falls back to per-cell reads.
+
+        ``interrupts(e)`` True stops the read at that error (Excel busy or
+        gone: every further call would fail the same way); the cells not read
+        keep their last good values.
+        """
+        t0 = time.perf_counter()
+        cur = self._swap()
+        seen = self._seen
+        n = self.reads
+        calls = 0
+        error = None
+        aborted = False
+        for ref, single, slots in self._reads:
+            calls += 1
+            try:
+                value = sheet.Range(ref).Value
+            except Exception as e:
+                error = e
+                if interrupts is not None and interrupts(e):
+                    aborted = True
+                    break
+            else:
+                if single and not isinstance(value, (tuple, list)):
+                    cur[slots[0][0]] = value
+                    seen[slots[0][0]] = n
+                    continue
+                for slot, dr, dc in slots:
+                    try:
+                        cur[slot] = value[dr][dc]
+                    except (IndexError, TypeError):
+                        cur[slot] = None
+                    seen[slot] = n
+                continue
+            cells = self.cells
+            for slot, _, _ in slots:
+                calls += 1
+                try:
+                    cur[slot] = sheet.Range(cells[slot]).Value
+                    seen[slot] = n
+                except Exception as e:
+                    error = e
+                    if interrupts is not None and interrupts(e):
+                        aborted = True
+                        break
+            if aborted:
+                break
+        self.last_calls = calls
+        self.last_ms = (time.perf_counter() - t0) * 1000.0
+        self.last_error = error
+        self.aborted = aborted
+        if error is not None:
+            self.stale = [c for c, k in zip(self.cells, seen) if k != n]
+        elif self.stale:
+            self.stale = []
+
+    def read(self, sheet, interrupts: Optional[Callable[[BaseException], bool]] = None) -> Dict[str, Any]:
+        """``read_slots``, as ``{cell: value}`` in the caller's cell order."""
+        self.read_slots(sheet, interrupts)
+        return self.as_dict()
+
+    def load(self, values: Dict[str, Any]):
+        """Take a read done elsewhere (``{cell: value}``) as the current one."""
+        cur = self._swap()
+        for i, c in enumerate(self.cells):
+            cur[i] = values.get(c)
+        self.last_error = None
+        self.aborted = False
+        if self.stale:
+            self.stale = []
+
+    def keep(self) -> Dict[str, Any]:
+        """No read possible (Excel gone): the last good values, all stale."""
+        self._swap()
+        self.last_calls = 0
+        self.last_ms = 0.0
+        self.aborted = True
+        self.stale = list(self.cells)
+        return self.as_dict()
+
+    def assume(self, values: Dict[str, Any]):
+        """Make ``cur`` match ``values`` (a snapshot published without a read, e.g. a hotkey write).
+
+        The next read is then compared against what was published.
+        """
+        cur = self.cur
+        for c, i in self.index.items():
+            if c in values:
+                cur[i] = values[c]
+
+    def changed_slots(self) -> Sequence[int]:
+        """Slots whose value differs from the previous read (``()`` if none: one list compare)."""
+        cur, prev = self.cur, self.prev
+        if cur == prev:
+            return ()
+        return [i for i in range(len(cur)) if cur[i] != prev[i]]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.cells, self.cur))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"comCalls": self.last_calls, "ms": round(self.last_ms, 3)}
+
+
+class _RangeValue:
+    __slots__ = ("Value",)
+
+    def __init__(self, value):
+        self.Value = value
+
+
+class _UsedRange:
+    """``UsedRange`` of a MemorySheet: bounding box of the non-empty cells."""
+
+    __slots__ = ("Row", "Column", "Value", "Address")
+
+    def __init__(self, row: int, col: int, value, address: str):
+        self.Row = row
+        self.Column = col
+        self.Value = value
+        self.Address = address
+
+
+class _MemoryCell:
+    """Single cell of a MemorySheet with a writable ``Value`` (like COM ``Cells``)."""
+
+    __slots__ = ("_sheet", "_ref")
+
+    def __init__(self, sheet: "MemorySheet", ref: str):
+        self._sheet = sheet
+        self._ref = ref
+
+    @property
+    def Value(self):
+        return self._sheet.values.get(self._ref)
+
+    @Value.setter
+    def Value(self, value):
+        self._sheet.writes += 1
+        self._sheet.values[self._ref] = value
+
+
+class MemorySheet:
+    """Dict-backed stand-in for a COM worksheet: ``Range(ref).Value`` and ``Cells(row, col).Value``.
+
+    Block refs ("M44:N44") return a tuple of row tuples like Excel does, so
+    ReadPlan works unchanged on top of it (replay, benchmarks, tests).
+    ``Cells`` values are writable; ``calls`` counts Range/Cells/UsedRange
+    calls, ``writes`` counts cell writes.
+    """
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None):
+        self.values: Dict[str, Any] = dict(values or {})
+        self.calls = 0
+        self.writes = 0
+
+    def Cells(self, row: int, col: int) -> _MemoryCell:
+        self.calls += 1
+        return _MemoryCell(self, cell_ref(row, col))
+
+    @property
+    def UsedRange(self) -> _UsedRange:
+        self.calls += 1
+        coords = [parse_cell(c) for c, v in self.values.items() if v is not None and v != ""]
+        if not coords:
+            return _UsedRange(1, 1, None, "$A$1")
+        top = min(r for r, _ in coords)
+        bottom = max(r for r, _ in coords)
+        left = min(c for _, c in coords)
+        right = max(c for _, c in coords)
+        ref = range_ref(top, left, bottom, right)
+        absolute = ":".join("$" + re.sub(r"(\d)", r"$\1", part, count=1) for part in ref.split(":"))
+        return _UsedRange(top, left, self.Range(ref).Value, absolute)
+
+    def Range(self, ref: str) -> _RangeValue:
+        self.calls += 1
+        if ":" not in ref:
+            return _RangeValue(self.values.get(ref.replace("$", "").upper()))
+        a, b = ref.split(":", 1)
+        top, left = parse_cell(a)
+        bottom, right = parse_cell(b)
+        get = self.values.get
+        cols = [index_to_col(c) for c in range(left, right + 1)]
+        return _RangeValue(tuple(
+            tuple(get(f"{col}{r}") for col in cols)
+            for r in range(top, bottom + 1)))
@@ -0,0 +1,124 @@
+"""Local command API for excel_hotkey_controller (``--command-api ENDPOINT``).
+
+Auto mode раньше управлял Excel через синтетические F21-F24 (PowerShell
+SendInput -> keyboard.hook -> очередь команд) и узнавал результат только по
+следующей записи current_state.json. Здесь тот же набор команд приходит по
+локальному сокету и каждая получает ответ с результатом:
+
+Endpoints: как у ``--serve`` (excel_publish.parse_endpoint), обычно
+``tcp://127.0.0.1:0`` - порт выбирается сам и пишется в hotkey_status.json
+(``commandApi``). Named pipes не поддерживаются (у них нет потока чтения).
+
+Wire format: одна JSON-строка на запрос / ответ (UTF-8, ``\\n``)::
+
+    -> {"id": 7, "cmd": "next", "map": 2, "steps": 1, "update": true}
+    <- {"id": 7, "ok": true, "status": "ok", "cmd": "next", "map": 2, "row": 190,
+        "old": 1.5, "new": 1.55, "away": 2.45, "steps": 1,
+        "queueMs": 0.21, "execMs": 0.84}
+
+    cmd       поля запроса                результат
+    prev/next map?, steps? (1), update?   old/new/away/steps; status из excel_keypath
+                                          (ok, blocked, edge, manual_only, not_found, no_value)
+    set       map?, value, update?        value должно быть в ODDSHOME (иначе not_found + nearest)
+    suspend   -                           кнопка CurrentMapSuspend + Send Update, old/new = caption
+    update    -                           Send Update
+    state     map?                        map/row/home/away без изменений
+
+``map`` по умолчанию - текущая карта (template_sync.json). ``update: true``
+у prev/next/set жмёт Send Update через 100 мс после шага при любом его
+статусе (blocked, edge, без изменения - тоже), как F22 после F23/F24 в
+пути через клавиши: auto mode рассчитывает на это подтверждение. В
+ответе тогда ``"update": "scheduled"``. Ошибки
+запроса (нет id / cmd, неизвестная команда, кривой map) отвечаются сразу
+из потока чтения: ``{"id", "ok": false, "status": "bad_request", "error"}``.
+Порядок выполнения - общий с хоткеями (одна очередь команд на COM-потоке).
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+from excel_publish import PublishServer, Subscriber, encode_line
+
+COMMANDS = ("prev", "next", "set", "suspend", "update", "state")
+STATUS_BAD_REQUEST = "bad_request"
+STATUS_FAILED = "failed"  # COM / Add-in вызов не удался
+MAX_STEPS = 50
+
+
+def update_after(req: Dict[str, Any]) -> bool:
+    """Send Update after this prev/next/set, whatever the step's status (keystroke path: F22 after F23/F24)."""
+    return bool(req.get("update")) and req.get("cmd") in ("prev", "next", "set")
+
+
+def validate(req: Dict[str, Any]) -> Optional[str]:
+    """Error text for a malformed request, None if it can be queued."""
+    if "id" not in req:
+        return "missing id"
+    cmd = req.get("cmd")
+    if cmd not in COMMANDS:
+        return f"unknown cmd {cmd!r} (expected one of {', '.join(COMMANDS)})"
+    map_num = req.get("map")
+    if map_num is not None and (not isinstance(map_num, int) or isinstance(map_num, bool) or map_num < 1):
+        return f"invalid map {map_num!r}"
+    steps = req.get("steps", 1)
+    if not isinstance(steps, int) or isinstance(steps, bool) or not 1 <= steps <= MAX_STEPS:
+        return f"invalid steps {steps!r} (1..{MAX_STEPS})"
+    if cmd == "set" and not isinstance(req.get("value"), (int, float)):
+        return "set needs a numeric value"
+    return None
+
+
+class CommandServer:
+    """Request/reply channel on top of PublishServer's socket handling.
+
+    Requests are validated on the connection's reader thread and handed to
+    ``submit(req, reply)``; the controller calls ``reply(dict)`` from its COM
+    thread once the command ran. Nothing is broadcast: every reply goes to
+    the connection that sent the request.
+    """
+
+    def __init__(self, endpoint: str, submit: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], None]):
+        self.submit = submit
+        self.requests = 0
+        self.rejected = 0
+        self.server = PublishServer(endpoint)
+        if self.server.kind == "pipe":
+            raise ValueError("--command-api needs tcp:// or a unix socket (pipes have no request reader)")
+        self.server.welcome = lambda: None  # no greeting, replies only
+        self.server.on_request = self._on_request
+
+    def start(self) -> "CommandServer":
+        self.server.start()
+        return self
+
+    def close(self):
+        self.server.close()
+
+    @property
+    def endpoint(self) -> str:
+        """Bound endpoint (real port for tcp://...:0), as clients should connect to it."""
+        return self.server.bound_endpoint
+
+    def _on_request(self, sub: Subscriber, req: Dict[str, Any]):
+        self.requests += 1
+        reply = lambda msg, s=sub: s.offer(encode_line(msg))  # noqa: E731
+        err = validate(req)
+        if err is not None:
+            self.rejected += 1
+            reply({"id": req.get("id"), "ok": False, "status": STATUS_BAD_REQUEST, "error": err})
+            return
+        self.submit(req, reply)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"endpoint": self.endpoint, "clients": len(self.server.subscribers()),
+                "requests": self.requests, "rejected": self.rejected}
+
+
+def make_reply(req: Dict[str, Any], status: str, enqueued_ns: int, started_ns: int, **fields) -> Dict[str, Any]:
+    """Reply dict with the request id, ok flag and queue / execution time (ms)."""
+    done_ns = time.perf_counter_ns()
+    msg: Dict[str, Any] = {"id": req.get("id"), "ok": status == "ok", "status": status, "cmd": req.get("cmd")}
+    msg.update(fields)
+    msg["queueMs"] = round((started_ns - enqueued_ns) / 1e6, 3)
+    msg["execMs"] = round((done_ns - started_ns) / 1e6, 3)
+    return msg
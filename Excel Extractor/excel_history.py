@@ -0,0 +1,266 @@
+"""Tick history for excel_watcher: append-only ring of cell changes in a memory-mapped file.
+
+Запись (``excel_watcher.py --record PATH``):
+    Каждое изменение ячейки -> одна запись фиксированного размера. Файл
+    создаётся заранее на ``capacity`` записей и отображается в память, так что
+    запись тика - это копирование в mmap без системных вызовов; при
+    заполнении самые старые записи перезаписываются. При смене матча
+    (шаблон C1 / команды K4, N4) кольцо сжимается в архив
+    ``PATH.<YYYYmmdd-HHMMSS>`` и начинается заново.
+
+Экспорт:
+    python excel_history.py PATH [--from ISO] [--to ISO] [--format csv|json|jsonl] [-o OUT]
+
+Layout (little endian):
+    header, 64 bytes:
+        8s   magic b"OMTICK01"
+        I    version
+        I    record size (64)
+        Q    capacity (records)
+        Q    written (total records ever appended; next slot = written % capacity)
+        q    wall-clock ns at creation
+        q    monotonic ns at creation (record timestamps are monotonic ns)
+        16x  reserved
+    record, 64 bytes:
+        q    monotonic ns
+        8s   cell ("M44", NUL padded)
+        B    type: 0 None, 1 float, 2 bool, 3 str, 4 other (str())
+        7x
+        d    numeric value (float / bool)
+        32s  UTF-8 string value (truncated to 32 bytes)
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import re
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"OMTICK01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQqq16x")
+RECORD = struct.Struct("<q8sB7xd32s")
+WRITTEN_OFFSET = 24  # offset of "written" in HEADER
+DEFAULT_CAPACITY = 1_000_000  # ~64 MB
+
+T_NONE, T_FLOAT, T_BOOL, T_STR, T_OTHER = range(5)
+_WRITTEN = struct.Struct("<Q")
+
+
+def _encode_value(value: Any) -> Tuple[int, float, bytes]:
+    if value is None:
+        return T_NONE, 0.0, b""
+    if isinstance(value, bool):
+        return T_BOOL, 1.0 if value else 0.0, b""
+    if isinstance(value, (int, float)):
+        return T_FLOAT, float(value), b""
+    if isinstance(value, str):
+        return T_STR, 0.0, value.encode("utf-8")[:32]
+    return T_OTHER, 0.0, str(value).encode("utf-8")[:32]
+
+
+def _decode_value(kind: int, num: float, text: bytes) -> Any:
+    if kind == T_FLOAT:
+        return num
+    if kind == T_BOOL:
+        return bool(num)
+    if kind in (T_STR, T_OTHER):
+        return text.rstrip(b"\0").decode("utf-8", errors="ignore")
+    return None
+
+
+class TickRecorder:
+    """Preallocated memory-mapped ring of (monotonic ns, cell, value) records."""
+
+    def __init__(self, path: Path, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.capacity = max(1, capacity)
+        self.rotations = 0
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._written = 0
+        self._open()
+        if self._written:
+            # Left over from a previous run: archive it with its own time anchor
+            self.rotate("restart")
+
+    def _open(self):
+        size = HEADER.size + self.capacity * RECORD.size
+        fresh = True
+        if self.path.exists() and self.path.stat().st_size == size:
+            with self.path.open("rb") as f:
+                head = f.read(HEADER.size)
+            magic, version, rec_size, capacity, written, _, _ = HEADER.unpack(head)
+            fresh = not (magic == MAGIC and version == VERSION and rec_size == RECORD.size
+                         and capacity == self.capacity)
+        if fresh:
+            with self.path.open("wb") as f:
+                f.truncate(size)  # sparse/zeroed preallocation
+        self._file = self.path.open("r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        if fresh or not written:
+            self._reset()
+        else:
+            self._written = written
+
+    def _reset(self):
+        # monotonic ns are only comparable within one boot/process run; the
+        # anchor pair converts them to wall-clock time on export
+        self._mm[:HEADER.size] = HEADER.pack(MAGIC, VERSION, RECORD.size, self.capacity, 0,
+                                             time.time_ns(), time.monotonic_ns())
+        self._written = 0
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def append(self, cell: str, value: Any, t_ns: Optional[int] = None):
+        """Append one change (memory copy only, no syscall)."""
+        kind, num, text = _encode_value(value)
+        slot = self._written % self.capacity
+        RECORD.pack_into(self._mm, HEADER.size + slot * RECORD.size,
+                         time.monotonic_ns() if t_ns is None else t_ns,
+                         cell.encode("ascii", errors="replace")[:8], kind, num, text)
+        self._written += 1
+        _WRITTEN.pack_into(self._mm, WRITTEN_OFFSET, self._written)
+
+    def append_changes(self, changed: Dict[str, Any], t_ns: Optional[int] = None):
+        t_ns = time.monotonic_ns() if t_ns is None else t_ns
+        for cell, value in changed.items():
+            self.append(cell, value, t_ns)
+
+    def rotate(self, label: str = "") -> Optional[Path]:
+        """Compact the current ring into an archive file and start an empty ring."""
+        if self._written == 0:
+            return None
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        label = re.sub(r"[^\w.-]+", "_", label).strip("_")[:60]
+        archive = self.path.with_name(f"{self.path.name}.{stamp}{'-' + label if label else ''}")
+        head = bytes(self._mm[:HEADER.size])
+        _, _, _, _, _, wall_ns, mono_ns = HEADER.unpack(head)
+        count = min(self._written, self.capacity)
+        with archive.open("wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, count, wall_ns, mono_ns))
+            for chunk in _ring_chunks(self._mm, self.capacity, self._written):
+                f.write(chunk)
+        self._reset()
+        self.rotations += 1
+        return archive
+
+    def flush(self):
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"records": self._written, "capacity": self.capacity, "rotations": self.rotations}
+
+
+def _ring_chunks(buf, capacity: int, written: int) -> List[bytes]:
+    """Record bytes in chronological order (oldest first)."""
+    count = min(written, capacity)
+    start = (written - count) % capacity
+    base = HEADER.size
+    first = buf[base + start * RECORD.size: base + min(capacity, start + count) * RECORD.size]
+    wrapped = start + count - capacity
+    if wrapped > 0:
+        return [first, buf[base: base + wrapped * RECORD.size]]
+    return [first]
+
+
+class TickLog:
+    """Reader for a ring or archive file (records unrolled into time order)."""
+
+    def __init__(self, path: Path):
+        data = Path(path).read_bytes()
+        magic, version, rec_size, capacity, written, wall_ns, mono_ns = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or rec_size != RECORD.size:
+            raise ValueError(f"Not a tick history file: {path}")
+        self.wall_ns = wall_ns
+        self.mono_ns = mono_ns
+        self._blob = b"".join(_ring_chunks(memoryview(data), capacity, written))
+        self.count = len(self._blob) // RECORD.size
+        # Timestamps of all records for bisect (one pass, no value decoding)
+        self._times = [t for (t,) in struct.iter_unpack("<q56x", self._blob)]
+
+    def to_wall_ns(self, mono_ns: int) -> int:
+        return self.wall_ns + (mono_ns - self.mono_ns)
+
+    def to_mono_ns(self, wall_ns: int) -> int:
+        return self.mono_ns + (wall_ns - self.wall_ns)
+
+    def records(self, start_wall_ns: Optional[int] = None, end_wall_ns: Optional[int] = None
+                ) -> Iterator[Tuple[int, str, Any]]:
+        """(wall ns, cell, value) for records in [start, end]."""
+        lo = 0 if start_wall_ns is None else bisect.bisect_left(self._times, self.to_mono_ns(start_wall_ns))
+        hi = self.count if end_wall_ns is None else bisect.bisect_right(self._times, self.to_mono_ns(end_wall_ns))
+        for i in range(lo, hi):
+            t, cell, kind, num, text = RECORD.unpack_from(self._blob, i * RECORD.size)
+            yield self.to_wall_ns(t), cell.rstrip(b"\0").decode("ascii"), _decode_value(kind, num, text)
+
+
+def _parse_time(value: str) -> Optional[int]:
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def export(log: TickLog, out, fmt: str, start: Optional[int], end: Optional[int]):
+    rows = log.records(start, end)
+    if fmt == "csv":
+        w = csv.writer(out)
+        w.writerow(["ts", "ts_ns", "cell", "value"])
+        for t, cell, value in rows:
+            w.writerow([datetime.fromtimestamp(t / 1e9).isoformat(timespec="milliseconds"), t, cell, value])
+    elif fmt == "json":
+        json.dump([{"ts_ns": t, "cell": cell, "value": value} for t, cell, value in rows],
+                  out, ensure_ascii=False)
+        out.write("\n")
+    else:
+        # jsonl: one line per tick (changes with the same timestamp grouped)
+        cur_t, cells = None, {}
+        for t, cell, value in rows:
+            if t != cur_t and cells:
+                out.write(json.dumps({"t": cur_t / 1e9, "cells": cells}, ensure_ascii=False) + "\n")
+                cells = {}
+            cur_t = t
+            cells[cell] = value
+        if cells:
+            out.write(json.dumps({"t": cur_t / 1e9, "cells": cells}, ensure_ascii=False) + "\n")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Export excel_watcher tick history")
+    p.add_argument("path", help="Ring file (--record PATH) or rotated archive")
+    p.add_argument("--from", dest="start", default="", help="ISO time, e.g. 2026-03-01T18:00:00")
+    p.add_argument("--to", dest="end", default="", help="ISO time")
+    p.add_argument("--format", choices=("csv", "json", "jsonl"), default="csv")
+    p.add_argument("-o", "--out", default="", help="Output file (default: stdout)")
+    args = p.parse_args(argv)
+
+    log = TickLog(Path(args.path))
+    start, end = _parse_time(args.start), _parse_time(args.end)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8", newline="") as f:
+            export(log, f, args.format, start, end)
+    else:
+        export(log, sys.stdout, args.format, start, end)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ Hotkeys:
     F22 -> Send Update only (auto mode confirm)
     F23 -> PreviousOddsHome (external trigger)
     F24 -> NextOddsHome (external trigger)
-    Ctrl+Esc or Ctrl+C -> Exit
+    Ctrl+Esc or Ctrl+C -> Exit (under excel_bridge Ctrl+Esc stops the hotkeys only)
 
 Map selection is synchronized from Odds Board via template_sync.json.
 Manual map switching via Numpad* is disabled - map follows Board selection.
@@ -18,15 +18,37 @@ Reads current map from template_sync.json.
 Detects max maps from template (C1): Bo1=1, Bo3=3, Bo5=5.
 Blocks changes to cells with WIN/LOSE values.
 
-Map Winner rows:
+Map Winner rows and odds columns come from the sheet layout (excel_layout.py,
+cached in layout_cache.json, re-checked when the template in C1 changes);
+the default layout is:
     Map 1: row 44
     Map 2: row 190  
     Map 3: row 336
     Map 4: row 482
     Map 5: row 628
 
+Latency metrics (p50/p95/p99/max over the last minute, see excel_metrics.py)
+are written to hotkey_status.json under "metrics": queue_wait (hotkey ->
+main loop), com_read, com_write, key_to_write (hotkey -> odds cell written)
+and command (whole command handling).
+
+Auto mode can skip the F21-F24 keystrokes: with --command-api ENDPOINT the
+same commands (prev/next/set/suspend/update/state) are accepted as JSON lines
+on a local socket and each gets a reply with old/new odds or the blocked
+reason (see excel_commands.py). The bound endpoint is written to
+hotkey_status.json as "commandApi".
+
+Excel busy (cell edit, dialog) or restarted: COM retries rejected calls
+(--com-retry-ms) and the controller reattaches to the workbook on its own
+once Excel is back, without a restart (see excel_session.py); state and
+retry/reconnect counters are in hotkey_status.json under "session".
+
 Run:
-    python excel_hotkey_controller.py
+    python excel_hotkey_controller.py [--file BOOK.xlsm] [--sheet NAME] [--command-api tcp://127.0.0.1:0]
+
+Without --file the active workbook is used (old behaviour). The same
+controller also runs inside excel_bridge.py, sharing one COM connection
+with the watcher; this script is the hotkeys-only entry point to it.
 """
 
 import json
@@ -42,6 +64,17 @@ import win32con
 import win32api
 import pythoncom
 
+from excel_backends import open_workbook
+from excel_commands import STATUS_BAD_REQUEST, STATUS_FAILED, CommandServer, make_reply, update_after
+from excel_keypath import (KeyPath, LOCKED_VALUES, STEP_BLOCKED, STEP_EDGE, STEP_MANUAL_ONLY, STEP_NO_VALUE,
+                            STEP_NOT_FOUND, STEP_OK, StepResult, is_locked)
+from excel_ladder import OddsLadder
+from excel_layout import DEFAULT_LAYOUT, Layout, LayoutIndex
+from excel_metrics import Metrics
+from excel_scheduler import TaskScheduler
+from excel_session import DISCONNECTED, RETRY_BUDGET_MS, ComSession
+from excel_sync import TemplateSync
+
 # Try to import keyboard (requires: pip install keyboard)
 try:
     import keyboard
@@ -52,18 +85,23 @@ except ImportError:
 
 # Configuration
 SHEET_NAME = "InPlay FRONT"
-TEMPLATE_CELL = "C1"  # Template name cell (LoL Bo3, LoL Bo5, etc.)
 SYNC_FILE = Path(__file__).parent / "template_sync.json"
 STATUS_FILE = Path(__file__).parent / "hotkey_status.json"  # Written by this script for Electron to read
+STATE_FILE = Path(__file__).parent / "current_state.json"  # Rewritten by excel_watcher on every sheet change
 
-# Map Winner rows (1-indexed)
-MAP_WINNER_ROWS = {
-    1: 44,   # Map 1 Winner
-    2: 190,  # Map 2 Winner
-    3: 336,  # Map 3 Winner
-    4: 482,  # Map 4 Winner
-    5: 628,  # Map 5 Winner
-}
+# Metrics window = METRICS_SLICES status writes (~1s each)
+METRICS_SLICES = 60
+CONTROLLER_STAGES = ['queue_wait', 'com_read', 'com_write', 'key_to_write', 'command']
+
+# How often to re-read ODDSHOME/ODDSAWAY and rebuild the ladder if they changed (seconds);
+# also the template (C1) check for the sheet layout when running without excel_bridge
+LADDER_CHECK_INTERVAL = 2.0
+STATUS_INTERVAL = 1.0        # hotkey_status.json rewrite period
+SUSPEND_UPDATE_DELAY = 0.1   # Suspend -> Send Update
+BUTTON_UP_DELAY = 0.05       # Send Update: button down -> up
+MAX_WAIT = 0.25              # longest block on the command queue (keeps Ctrl+C responsive)
+SESSION_CHECK_INTERVAL = 1.0 # Excel still there? (hotkeys-only: reattach after a restart)
+ADDIN_TITLE = 'ExcelTradingAddIn'
 
 # Values that block cell modification
 BLOCKED_VALUES = {'WIN', 'LOSE', 'win', 'lose', 'Win', 'Lose'}
@@ -72,12 +110,19 @@ BLOCKED_VALUES = {'WIN', 'LOSE', 'win', 'lose', 'Win', 'Lose'}
 class ExcelOddsHotkeyController:
     """Hotkey controller for Excel odds management."""
     
-    def __init__(self):
+    def __init__(self, workbook_path: Optional[Path] = None, sheet_name: str = SHEET_NAME,
+                 retry_ms: Optional[int] = None):
+        self._workbook_path = workbook_path  # None = ActiveWorkbook
+        self._sheet_name = sheet_name
+        self._retry_ms = RETRY_BUDGET_MS if retry_ms is None else retry_ms
+        self._owns_com = False  # False when attached to a connection owned by excel_bridge
+        self._session: Optional[ComSession] = None  # busy retries / reattach, see excel_session.py
+        self._on_attach = None  # our session.on_attach callback (removed when the hotkeys stop)
         self._xl = None
         self._wb = None
         self._ws = None
-        self._odds_home: List = []
-        self._odds_away: List = []
+        self._ladder = OddsLadder([])  # ODDSHOME/ODDSAWAY index, see excel_ladder.py
+        self._ladder_raw = None  # last bulk read of both ranges (change detection)
         self._current_map = 1
         self._max_maps = 5  # Updated from template
         self._connected = False
@@ -86,17 +131,112 @@ class ExcelOddsHotkeyController:
         # Key hold state tracking - prevent repeat until odds change
         self._key_held = {}  # key_name -> {'snapshot': (home, away), 'pending': bool}
         self._last_odds_snapshot = None  # (home, away) tuple for current map
-        
+        self._metrics = Metrics(METRICS_SLICES, CONTROLLER_STAGES)
+        self._cmd_enqueued_ns = 0  # enqueue time of the command being processed
+        self._keys: Optional[KeyPath] = None  # M/N row cache + single-write step path
+        self._sync = TemplateSync(SYNC_FILE)  # map/template from Odds Board, kept in memory
+        # prev/next folding in process_commands: presses applied, Excel writes,
+        # presses dropped at ladder ends / WIN/LOSE, presses waiting for hold release
+        self._coalesce = {'presses': 0, 'writes': 0, 'coalesced': 0, 'clamped': 0, 'held': 0}
+        # Delayed/periodic actions on the main (COM) thread, see excel_scheduler.py
+        self._scheduler = TaskScheduler()
+        self._periodic = []  # start_hotkeys' call_every tasks (cancelled when the hotkeys stop)
+        self._addin_hwnd = None  # cached Add-in panel window, revalidated before use
+        self._api: Optional[CommandServer] = None  # --command-api, see excel_commands.py
+        # Map rows / odds columns / template cell; own LayoutIndex unless excel_bridge shares its layout
+        self._layout: Layout = DEFAULT_LAYOUT
+        self._layouts: Optional[LayoutIndex] = None
+        self._layout_template = ''
+        
+    @property
+    def scheduler(self) -> TaskScheduler:
+        return self._scheduler
+    
+    @property
+    def keys(self) -> Optional[KeyPath]:
+        return self._keys
+    
+    @property
+    def layout(self) -> Layout:
+        return self._layout
+    
+    def set_layout(self, layout: Layout):
+        """Switch map rows / odds columns (excel_bridge calls this when the watcher relayouts)."""
+        if layout == self._layout:
+            return
+        self._layout = layout
+        if self._keys is not None:
+            self._keys.set_columns(layout.home_col, layout.away_col)
+        self._last_odds_snapshot = None
+        self._key_held.clear()
+        print(f"[i] Layout: {layout.describe()}")
+    
+    @property
+    def _offline(self) -> bool:
+        """Excel closed / restarted and not reattached yet (periodic sheet reads wait for it)."""
+        return self._session is not None and self._session.state == DISCONNECTED
+    
+    def _check_layout(self):
+        """Template changed since the last check -> cached (or rediscovered) layout for it."""
+        if self._offline:
+            return
+        template = self._get_template_name()
+        if template == self._layout_template:
+            return
+        self._layout_template = template
+        self.set_layout(self._layouts.resolve(self._ws))
+        self._update_max_maps()
+    
     def connect(self) -> bool:
         """Connect to Excel (call only from main thread!)."""
         try:
             pythoncom.CoInitialize()
-            self._xl = win32com.client.GetActiveObject("Excel.Application")
-            self._wb = self._xl.ActiveWorkbook
-            self._ws = self._wb.Worksheets(SHEET_NAME)
+            self._owns_com = True
+            session = ComSession(self._workbook_path, self._sheet_name, early=False, retry_ms=self._retry_ms)
+            session.install_filter()
+            xl = win32com.client.GetActiveObject("Excel.Application")
+            # --file: same workbook as excel_watcher watches
+            wb = open_workbook(xl, self._workbook_path) if self._workbook_path else xl.ActiveWorkbook
+            if wb is None:
+                print(f"ERROR: Workbook not open in Excel: {self._workbook_path}")
+                return False
+            if session.path is None:
+                session.path = Path(wb.FullName)  # reattach to this one, not whatever is active then
+            session.bind(xl, wb)
+            return self.attach(xl, wb, session.sheet, session=session)
+        except Exception as e:
+            print(f"ERROR connecting to Excel: {e}")
+            return False
+    
+    def attach(self, xl, wb, ws, notify_file: Optional[Path] = STATE_FILE, layout: Optional[Layout] = None,
+               session: Optional[ComSession] = None) -> bool:
+        """Use an existing COM connection (connect(), or the one excel_bridge owns).
+        
+        notify_file: file whose rewrites drop the M/N row cache; None when
+        the owner keeps the cache current itself (excel_bridge).
+        layout: sheet layout resolved by the owner (excel_bridge); None =
+        resolve it here through layout_cache.json.
+        session: the connection's ComSession; its reattaches are followed
+        here (see rebind).
+        """
+        try:
+            if session is not None:
+                self._session = session
+                self._on_attach = lambda s: self.rebind(s.app, s.workbook, s.sheet)
+                session.on_attach.append(self._on_attach)
+            self._sync.start()
+            self._xl, self._wb, self._ws = xl, wb, ws
+            if layout is None:
+                self._layouts = LayoutIndex(self._workbook_path or wb.FullName, self._sheet_name)
+                layout = self._layouts.resolve(ws)
+                self._layout_template = self._layouts.template
+                print(f"[i] Layout: {layout.describe()} in {self._layouts.last_ms:.1f}ms")
+            self._layout = layout
             
             # Load odds tables
             self._load_odds_tables()
+            self._keys = KeyPath(self._ws, self._ladder, notify_file=notify_file, metrics=self._metrics,
+                                 home_col=layout.home_col, away_col=layout.away_col)
             
             # Detect max maps from template
             self._update_max_maps()
@@ -109,21 +249,64 @@ class ExcelOddsHotkeyController:
             print(f"ERROR connecting to Excel: {e}")
             return False
     
-    def _load_odds_tables(self):
-        """Load ODDSHOME and ODDSAWAY tables."""
+    def rebind(self, xl, wb, ws):
+        """The session reattached (Excel restarted / workbook reopened): same sheet, new COM objects."""
+        self._xl, self._wb, self._ws = xl, wb, ws
+        self._addin_hwnd = None
+        if self._keys is not None:
+            self._keys.ws = ws
+            self._keys.cache.invalidate()
+        self._ladder_raw = None  # re-read ODDSHOME/ODDSAWAY from the reopened workbook
+        self._load_odds_tables()
+        self._connected = True
+        print(f"[OK] Reconnected to: {wb.Name}")
+        self.write_status()
+    
+    def _check_session(self):
+        """Hotkeys-only: notice a closed Excel between key presses and reattach when it is back."""
+        session = self._session
+        if session.state == DISCONNECTED:
+            session.reconnect()
+            return
         try:
-            home_range = self._wb.Names('ODDSHOME').RefersToRange
-            self._odds_home = [cell.Value for cell in home_range if cell.Value is not None]
-            
-            away_range = self._wb.Names('ODDSAWAY').RefersToRange
-            self._odds_away = [cell.Value for cell in away_range if cell.Value is not None]
+            self._wb.Name  # one cheap call: raises once Excel / the workbook is gone
+        except Exception as e:
+            if session.failed(e) == DISCONNECTED:
+                self._connected = False
+                self.write_status()
+            return
+        session.ok()
+    
+    def _load_odds_tables(self) -> bool:
+        """Load ODDSHOME and ODDSAWAY tables (one bulk read each).
+        
+        The ladder is rebuilt only when the range contents differ from the
+        last load; returns True if it was rebuilt.
+        """
+        if self._offline:
+            return False
+        try:
+            home = self._wb.Names('ODDSHOME').RefersToRange.Value
+            away = self._wb.Names('ODDSAWAY').RefersToRange.Value
         except Exception as e:
             print(f"Warning: Could not load odds tables: {e}")
+            return False
+        raw = (home, away)
+        if raw == self._ladder_raw:
+            return False
+        reloaded = self._ladder_raw is not None
+        self._ladder = OddsLadder.from_ranges(home, away)  # swapped in one assignment
+        self._ladder_raw = raw
+        if self._keys is not None:
+            self._keys.ladder = self._ladder
+        if reloaded:
+            print(f"[i] Odds ladder reloaded: {len(self._ladder)} steps")
+        return True
     
     def _get_template_name(self) -> str:
-        """Get template name from cell C1."""
+        """Get template name from the layout's template cell (C1)."""
         try:
-            value = self._ws.Range(TEMPLATE_CELL).Value
+            value = self._ws.Range(self._layout.template_cell).Value
             return str(value).strip() if value else ""
         except:
             return ""
@@ -141,71 +324,71 @@ class ExcelOddsHotkeyController:
             self._max_maps = 5  # Default
         print(f"[i] Template: {self._get_template_name()} -> Max maps: {self._max_maps}")
     
-    def _find_odds_index(self, value, odds_list: List) -> int:
-        """Find index of value in odds list."""
-        if value in odds_list:
-            return odds_list.index(value)
-        for i, v in enumerate(odds_list):
-            if isinstance(v, (int, float)) and isinstance(value, (int, float)):
-                if abs(v - value) < 0.001:
-                    return i
-        return -1
+    def _find_odds_index(self, value) -> int:
+        """Find index of value in the home ladder (O(1), 0.001 tolerance)."""
+        return self._ladder.index_of(value)
     
     def write_status(self):
         """Write current status to hotkey_status.json for Electron to read."""
         try:
             current_map = self.read_current_map()
+            connected = self._connected and not self._offline
             status = {
                 'ts': time.time(),
                 'currentMap': current_map,
                 'maxMaps': self._max_maps,
-                'connected': self._connected,
-                'template': self._get_template_name() if self._connected else '',
+                'connected': connected,
+                'template': self._get_template_name() if connected else '',
+                'metrics': self._metrics.summary(),
+                'sync': self._sync.stats(),
+                'coalesce': dict(self._coalesce),
             }
+            if self._session is not None:
+                status['session'] = self._session.stats()
+            if self._api is not None:
+                status['commandApi'] = self._api.endpoint
+                status['api'] = self._api.stats()
+            self._metrics.rotate()
             STATUS_FILE.write_text(json.dumps(status), encoding='utf-8')
         except Exception as e:
             pass  # Silent fail - file is optional
     
     def read_current_map(self) -> int:
-        """Read current map from template_sync.json (synced from Odds Board)."""
-        try:
-            if SYNC_FILE.exists():
-                data = json.loads(SYNC_FILE.read_text(encoding='utf-8'))
-                map_num = data.get('map', 1)
-                if isinstance(map_num, int) and 1 <= map_num <= self._max_maps:
-                    return map_num
-        except:
-            pass
+        """Current map from template_sync.json (synced from Odds Board).
+        
+        No file I/O: TemplateSync keeps the parsed file in memory (see excel_sync.py).
+        """
+        map_num = self._sync.map
+        if map_num is not None and 1 <= map_num <= self._max_maps:
+            return map_num
         return self._current_map
     
     def get_row_for_current_map(self) -> int:
         """Get row for current map."""
         map_num = self.read_current_map()
         self._current_map = map_num
-        return MAP_WINNER_ROWS.get(map_num, 44)
+        rows = self._layout.map_rows
+        return rows.get(map_num) or rows[min(rows)]
     
     def get_current_odds(self, row: int) -> tuple:
-        """Get current odds for row."""
-        try:
-            home = self._ws.Cells(row, 13).Value  # M column
-            away = self._ws.Cells(row, 14).Value  # N column
-            return home, away
-        except:
+        """Get current odds for row (M, N): one bulk read, cached briefly (see excel_keypath.py)."""
+        if self._keys is None:
             return None, None
+        return self._keys.read_row(row)
     
     def _update_odds_snapshot(self):
         """Update odds snapshot for key hold detection."""
         row = self.get_row_for_current_map()
         self._last_odds_snapshot = self.get_current_odds(row)
     
-    def _check_key_hold_allowed(self, key_name: str) -> bool:
+    def _check_key_hold_allowed(self, key_name: str, current_odds: Optional[tuple] = None) -> bool:
         """Check if key press is allowed (first press or odds changed since last press).
         
         For held keys: only allow repeat if odds have changed since the key was first pressed.
         This prevents sending many signals when holding a key - only one per odds change.
         """
-        row = self.get_row_for_current_map()
-        current_odds = self.get_current_odds(row)
+        if current_odds is None:
+            current_odds = self.get_current_odds(self.get_row_for_current_map())
         
         if key_name not in self._key_held:
             # First press - allow and record snapshot
@@ -237,130 +420,157 @@ class ExcelOddsHotkeyController:
 
     def is_cell_blocked(self, row: int) -> bool:
         """Check if cell is blocked (WIN/LOSE)."""
-        home, away = self.get_current_odds(row)
-        # Check both values
-        home_str = str(home).strip().upper() if home else ""
-        away_str = str(away).strip().upper() if away else ""
-        return home_str in {'WIN', 'LOSE'} or away_str in {'WIN', 'LOSE'}
+        return is_locked(*self.get_current_odds(row))
     
-    def previous_odds_home(self) -> bool:
-        """Decrease home odds (PreviousOddsHome)."""
+    def _step_home(self, offset: int, odds: Optional[tuple] = None, enqueued: tuple = ()) -> bool:
+        """Move home odds ``offset`` ladder steps: at most one M:N read and one M write."""
         row = self.get_row_for_current_map()
-        
-        # Check for WIN/LOSE
-        if self.is_cell_blocked(row):
-            home, away = self.get_current_odds(row)
-            print(f"[BLOCKED] Map {self._current_map}: Cell locked (WIN/LOSE): Home={home}, Away={away}")
-            return False
-        
-        current, _ = self.get_current_odds(row)
-        
-        if current is None:
+        return self._step_row(self._current_map, row, offset, odds, enqueued).status == STEP_OK
+    
+    def _step_row(self, map_num: int, row: int, offset: int, odds: Optional[tuple] = None,
+                  enqueued: tuple = ()) -> StepResult:
+        """Step one map's row and log the outcome (hotkeys and command API)."""
+        res = self._keys.step(row, offset, odds)
+        if res.status == STEP_OK:
+            done_ns = time.perf_counter_ns()
+            for enqueued_ns in enqueued or ((self._cmd_enqueued_ns,) if self._cmd_enqueued_ns else ()):
+                self._metrics.record_ns('key_to_write', done_ns - enqueued_ns)
+            sign = '+' if offset > 0 else '-'
+            folded = f" ({abs(res.steps)} steps)" if abs(res.steps) > 1 else ""
+            print(f"[{sign}] Map {map_num} (row {row}): {res.old} -> {res.new} | Away: {res.away}{folded}")
+            return res
+        if res.status == STEP_BLOCKED:
+            print(f"[BLOCKED] Map {map_num}: Cell locked (WIN/LOSE): Home={res.old}, Away={res.away}")
+        elif res.status == STEP_NO_VALUE:
             print(f"[X] Could not read M{row}")
-            return False
-        
-        idx = self._find_odds_index(current, self._odds_home)
-        if idx < 0:
-            print(f"[X] Value {current} not found in ODDSHOME")
-            return False
-        
-        if idx <= 0:
-            print(f"[!] Map {self._current_map}: Already at minimum ({current})")
-            return False
-        
-        new_value = self._odds_home[idx - 1]
-        
-        # Block WIN/LOSE - only manual input allowed
-        if str(new_value).upper() in {'WIN', 'LOSE'}:
-            print(f"[BLOCKED] Map {self._current_map}: Cannot set {new_value} via hotkey (manual only)")
-            return False
-        
-        self._ws.Cells(row, 13).Value = new_value
+        elif res.status == STEP_NOT_FOUND:
+            print(f"[X] Value {res.old} not found in ODDSHOME (nearest: {res.new})")
+        elif res.status == STEP_EDGE:
+            edge = 'maximum' if offset > 0 else 'minimum'
+            print(f"[!] Map {map_num}: Already at {edge} ({res.old})")
+        elif res.status == STEP_MANUAL_ONLY:
+            print(f"[BLOCKED] Map {map_num}: Cannot set {res.new} via hotkey (manual only)")
+        return res
+    
+    def _run_step_group(self, group: list):
+        """Fold a run of prev/next/key_up commands into one net ladder move.
         
-        new_home, new_away = self.get_current_odds(row)
-        print(f"[-] Map {self._current_map} (row {row}): {current} -> {new_value} | Away: {new_away}")
-        return True
+        Presses are checked one by one against the odds they would see if
+        applied sequentially (hold-repeat rules, ladder ends, WIN/LOSE), so
+        the result matches the one-write-per-press behaviour with a single
+        M:N read and a single M write.
+        """
+        odds = None
+        offset = 0
+        clamped_dir = 0
+        applied = []  # enqueue times of presses folded into offset
+        for enqueued_ns, cmd_name, key_name in group:
+            if cmd_name == 'key_up':
+                # Key released - mark in state
+                if key_name:
+                    self._key_released(key_name)
+                continue
+            if odds is None:
+                # One row read shared by the hold checks and the write
+                odds = self.get_current_odds(self.get_row_for_current_map())
+            direction = -1 if cmd_name == 'prev' else 1
+            virtual = self._keys.preview(odds, offset) or odds
+            # For manual keys with hold tracking
+            if key_name and not self._check_key_hold_allowed(key_name, virtual):
+                self._coalesce['held'] += 1
+                continue  # Skip - waiting for odds change
+            if self._keys.preview(odds, offset + direction) is None:
+                self._coalesce['clamped'] += 1
+                clamped_dir = direction
+                continue
+            offset += direction
+            applied.append(enqueued_ns)
+        wrote = bool(offset) and self._step_home(offset, odds, tuple(applied))
+        self._coalesce['presses'] += len(applied)
+        self._coalesce['writes'] += int(wrote)
+        self._coalesce['coalesced'] += max(0, len(applied) - int(wrote))
+        if clamped_dir and not applied:
+            # Nothing could move (edge / WIN/LOSE / not on ladder): report why
+            self._step_home(clamped_dir, odds)
+    
+    def previous_odds_home(self, odds: Optional[tuple] = None) -> bool:
+        """Decrease home odds (PreviousOddsHome)."""
+        return self._step_home(-1, odds)
     
-    def next_odds_home(self) -> bool:
+    def next_odds_home(self, odds: Optional[tuple] = None) -> bool:
         """Increase home odds (NextOddsHome)."""
-        row = self.get_row_for_current_map()
-        
-        # Check for WIN/LOSE
-        if self.is_cell_blocked(row):
-            home, away = self.get_current_odds(row)
-            print(f"[BLOCKED] Map {self._current_map}: Cell locked (WIN/LOSE): Home={home}, Away={away}")
-            return False
-        
-        current, _ = self.get_current_odds(row)
-        
-        if current is None:
-            print(f"[X] Could not read M{row}")
-            return False
-        
-        idx = self._find_odds_index(current, self._odds_home)
-        if idx < 0:
-            print(f"[X] Value {current} not found in ODDSHOME")
-            return False
-        
-        if idx >= len(self._odds_home) - 1:
-            print(f"[!] Map {self._current_map}: Already at maximum ({current})")
-            return False
-        
-        new_value = self._odds_home[idx + 1]
-        
-        # Block WIN/LOSE - only manual input allowed
-        if str(new_value).upper() in {'WIN', 'LOSE'}:
-            print(f"[BLOCKED] Map {self._current_map}: Cannot set {new_value} via hotkey (manual only)")
-            return False
-        
-        self._ws.Cells(row, 13).Value = new_value
-        
-        new_home, new_away = self.get_current_odds(row)
-        print(f"[+] Map {self._current_map} (row {row}): {current} -> {new_value} | Away: {new_away}")
-        return True
+        return self._step_home(+1, odds)
     
     def click_suspend_button(self) -> bool:
         """Click CurrentMapSuspend button (toggle suspend/trade), then auto-send update."""
         try:
-            ole = self._ws.OLEObjects('CurrentMapSuspend')
-            btn = ole.Object
-            old_caption = btn.Caption
-            btn.Value = not btn.Value  # Toggle = single click
-            new_caption = btn.Caption
-            print(f"[SUSPEND] {old_caption} -> {new_caption}")
-            
-            # Auto-send update after 100ms
-            time.sleep(0.1)
-            self.click_send_update_button()
-            
+            self._toggle_suspend()
             return True
         except Exception as e:
             print(f"[X] Suspend button error: {e}")
             return False
     
-    def click_send_update_button(self) -> bool:
-        """Click Send Update button in Add-in panel (via PostMessage, no cursor move)."""
+    def _toggle_suspend(self) -> tuple:
+        """Toggle CurrentMapSuspend, schedule Send Update; returns (old, new) caption."""
+        ole = self._ws.OLEObjects('CurrentMapSuspend')
+        btn = ole.Object
+        old_caption = btn.Caption
+        btn.Value = not btn.Value  # Toggle = single click
+        new_caption = btn.Caption
+        print(f"[SUSPEND] {old_caption} -> {new_caption}")
+        
+        # Auto-send update after 100ms (scheduled - hotkeys keep flowing meanwhile)
+        self._scheduler.call_later(SUSPEND_UPDATE_DELAY, self.click_send_update_button)
+        return old_caption, new_caption
+    
+    def _find_addin_window(self):
+        """ExcelTradingAddIn WebView window: cached handle if still valid, else EnumChildWindows."""
+        hwnd = self._addin_hwnd
         try:
-            # Find Excel window
-            excel_hwnd = win32gui.FindWindow('XLMAIN', None)
-            if not excel_hwnd:
-                print("[X] Excel window not found")
+            if hwnd and win32gui.IsWindow(hwnd) and ADDIN_TITLE in win32gui.GetWindowText(hwnd):
+                return hwnd
+        except Exception:
+            pass
+        self._addin_hwnd = None
+        
+        # Find Excel window
+        excel_hwnd = win32gui.FindWindow('XLMAIN', None)
+        if not excel_hwnd:
+            print("[X] Excel window not found")
+            return None
+        
+        # Find ExcelTradingAddIn WebView
+        addin_hwnd = None
+        def find_addin(hwnd, _):
+            nonlocal addin_hwnd
+            title = win32gui.GetWindowText(hwnd)
+            if ADDIN_TITLE in title:
+                addin_hwnd = hwnd
                 return False
-            
-            # Find ExcelTradingAddIn WebView
-            addin_hwnd = None
-            def find_addin(hwnd, _):
-                nonlocal addin_hwnd
-                title = win32gui.GetWindowText(hwnd)
-                if 'ExcelTradingAddIn' in title:
-                    addin_hwnd = hwnd
-                    return False
-                return True
-            
+            return True
+        
+        try:
             win32gui.EnumChildWindows(excel_hwnd, find_addin, None)
-            
+        except Exception:
+            pass  # EnumChildWindows raises when the callback stops enumeration
+        
+        if not addin_hwnd:
+            print("[X] Add-in panel not found")
+            return None
+        self._addin_hwnd = addin_hwnd
+        return addin_hwnd
+    
+    def _button_up(self, hwnd, lParam):
+        try:
+            win32gui.PostMessage(hwnd, win32con.WM_LBUTTONUP, 0, lParam)
+        except Exception as e:
+            print(f"[X] Send Update button-up error: {e}")
+    
+    def click_send_update_button(self) -> bool:
+        """Click Send Update button in Add-in panel (via PostMessage, no cursor move)."""
+        try:
+            addin_hwnd = self._find_addin_window()
             if not addin_hwnd:
-                print("[X] Add-in panel not found")
                 return False
             
             # Send Update button position (relative to panel)
@@ -370,8 +580,7 @@ class ExcelOddsHotkeyController:
             # Send click via PostMessage (no cursor movement)
             lParam = win32api.MAKELONG(btn_x, btn_y)
             win32gui.PostMessage(addin_hwnd, win32con.WM_LBUTTONDOWN, win32con.MK_LBUTTON, lParam)
-            time.sleep(0.05)
-            win32gui.PostMessage(addin_hwnd, win32con.WM_LBUTTONUP, 0, lParam)
+            self._scheduler.call_later(BUTTON_UP_DELAY, self._button_up, addin_hwnd, lParam)
             
             print("[UPDATE] Clicked Send Update button")
             return True
@@ -391,7 +600,7 @@ class ExcelOddsHotkeyController:
         print(f"Template: {self._get_template_name()}")
         print(f"Current map: {self.read_current_map()} (max: {self._max_maps})")
         print()
-        for map_num, row in MAP_WINNER_ROWS.items():
+        for map_num, row in self._layout.map_rows.items():
             if map_num > self._max_maps:
                 continue  # Don't show maps beyond limit
             home, away = self.get_current_odds(row)
@@ -405,32 +614,125 @@ class ExcelOddsHotkeyController:
         print()
     
     # Hotkey handlers - only add command to queue!
+    def _enqueue(self, cmd):
+        """Queue a command with its enqueue time (for queue_wait / key_to_write)."""
+        self._command_queue.put((time.perf_counter_ns(), cmd))
+    
     def on_hotkey_prev(self):
         """Handler for Numpad- / F23."""
-        self._command_queue.put('prev')
+        self._enqueue('prev')
     
     def on_hotkey_next(self):
         """Handler for Numpad+ / F24."""
-        self._command_queue.put('next')
+        self._enqueue('next')
     
     def on_hotkey_suspend(self):
         """Handler for Numpad1 - suspend current map."""
-        self._command_queue.put('suspend')
+        self._enqueue('suspend')
     
     def on_hotkey_send_update(self):
         """Handler for Numpad0 - send update."""
-        self._command_queue.put('send_update')
+        self._enqueue('send_update')
+    
+    # Command API (excel_commands.py) - requests arrive on socket threads,
+    # run on the main thread in queue order together with hotkeys
+    def enable_command_api(self, endpoint: str) -> bool:
+        """Start the --command-api server (replies carry the applied result)."""
+        try:
+            self._api = CommandServer(endpoint, self._submit_api).start()
+        except Exception as e:
+            print(f"[WARN] Command API failed to start on {endpoint}: {e}")
+            self._api = None
+            return False
+        print(f"[OK] Command API on {self._api.endpoint}")
+        return True
+    
+    def _submit_api(self, req: dict, reply):
+        self._enqueue(('api', (req, reply)))
+    
+    def _run_api(self, payload: tuple, enqueued_ns: int, started_ns: int):
+        req, reply = payload
+        try:
+            msg = self._api_command(req, enqueued_ns, started_ns)
+        except Exception as e:
+            msg = make_reply(req, STATUS_FAILED, enqueued_ns, started_ns, error=str(e))
+        reply(msg)
+    
+    def _api_command(self, req: dict, enqueued_ns: int, started_ns: int) -> dict:
+        cmd = req['cmd']
+        if cmd == 'suspend':
+            old, new = self._toggle_suspend()
+            return make_reply(req, STEP_OK, enqueued_ns, started_ns, old=old, new=new, update='scheduled')
+        if cmd == 'update':
+            ok = self.click_send_update_button()
+            return make_reply(req, STEP_OK if ok else STATUS_FAILED, enqueued_ns, started_ns)
+        if self._keys is None:
+            return make_reply(req, STATUS_FAILED, enqueued_ns, started_ns, error='not connected')
+        
+        map_num = req.get('map') or self.read_current_map()
+        if map_num > self._max_maps or map_num not in self._layout.map_rows:
+            return make_reply(req, STATUS_BAD_REQUEST, enqueued_ns, started_ns,
+                              error=f'map {map_num} not in template (max {self._max_maps})')
+        row = self._layout.map_rows[map_num]
+        where = {'map': map_num, 'row': row}
+        if cmd == 'state':
+            home, away = self.get_current_odds(row)
+            return make_reply(req, STEP_OK, enqueued_ns, started_ns, home=home, away=away,
+                              blocked=is_locked(home, away), **where)
+        if cmd == 'set':
+            res = self._set_row(map_num, row, req['value'])
+        else:
+            offset = req.get('steps', 1) * (-1 if cmd == 'prev' else 1)
+            res = self._step_row(map_num, row, offset, enqueued=(enqueued_ns,))
+        fields = dict(where, old=res.old, new=res.new, away=res.away, steps=res.steps)
+        if update_after(req):
+            # Like F22 100 ms after F23/F24: also after a blocked / edge / no-op step
+            self._scheduler.call_later(SUSPEND_UPDATE_DELAY, self.click_send_update_button)
+            fields['update'] = 'scheduled'
+        return make_reply(req, res.status, enqueued_ns, started_ns, **fields)
+    
+    def _set_row(self, map_num: int, row: int, value) -> StepResult:
+        """Write an exact ODDSHOME value (command API ``set``): one read at most, one write."""
+        keys = self._keys
+        ladder = keys.ladder
+        home, away = keys.read_row(row)
+        if is_locked(home, away):
+            return StepResult(STEP_BLOCKED, row, home, None, away)
+        idx = ladder.index_of(value)
+        if idx < 0:
+            return StepResult(STEP_NOT_FOUND, row, home, ladder.nearest(value), away)
+        target = ladder.home[idx]
+        if str(target).upper() in LOCKED_VALUES:
+            return StepResult(STEP_MANUAL_ONLY, row, home, target, away)
+        cur = ladder.index_of(home) if home is not None else -1
+        if cur == idx:
+            return StepResult(STEP_OK, row, home, home, away, 0)
+        new_away = ladder.away_at(idx)
+        if new_away is None:
+            new_away = away
+        keys.write_home(row, target, new_away)
+        print(f"[=] Map {map_num} (row {row}): {home} -> {target} | Away: {new_away}")
+        return StepResult(STEP_OK, row, home, target, new_away, idx - cur if cur >= 0 else 0)
     
     def on_hotkey_exit(self):
         """Handler for Ctrl+Esc."""
         self._running = False
-        self._command_queue.put('exit')
+        self._enqueue('exit')
     
-    def process_commands(self):
-        """Process commands from queue (called in main thread)."""
+    def process_commands(self, block_timeout: float = 0.0):
+        """Process commands from queue (called in main thread).
+        
+        Waits up to ``block_timeout`` seconds for the first command, then
+        drains the queue; consecutive prev/next/key_up commands are folded
+        into one net ladder move (see _run_step_group).
+        """
+        batch = []
         try:
             while True:
-                cmd = self._command_queue.get_nowait()
+                if batch or block_timeout <= 0:
+                    enqueued_ns, cmd = self._command_queue.get_nowait()
+                else:
+                    enqueued_ns, cmd = self._command_queue.get(timeout=block_timeout)
                 # Handle both tuple and string commands
                 # Format: cmd or (cmd,) or (cmd, key_name) for hold-aware commands
                 if isinstance(cmd, tuple):
@@ -439,28 +741,41 @@ class ExcelOddsHotkeyController:
                 else:
                     cmd_name = cmd
                     key_name = None
-                
-                if cmd_name == 'prev':
-                    # For manual keys with hold tracking
-                    if key_name and not self._check_key_hold_allowed(key_name):
-                        continue  # Skip - waiting for odds change
-                    self.previous_odds_home()
-                elif cmd_name == 'next':
-                    if key_name and not self._check_key_hold_allowed(key_name):
-                        continue
-                    self.next_odds_home()
-                elif cmd_name == 'key_up':
-                    # Key released - mark in state
-                    if key_name:
-                        self._key_released(key_name)
-                elif cmd_name == 'suspend':
+                batch.append((enqueued_ns, cmd_name, key_name))
+        except Empty:
+            pass  # Queue empty - normal
+        if not batch:
+            return
+        
+        start_ns = time.perf_counter_ns()
+        for enqueued_ns, _, _ in batch:
+            self._metrics.record_ns('queue_wait', start_ns - enqueued_ns)
+        
+        i = 0
+        while i < len(batch):
+            enqueued_ns, cmd_name, key_name = batch[i]
+            t0 = time.perf_counter_ns()
+            self._cmd_enqueued_ns = enqueued_ns
+            try:
+                if cmd_name in ('prev', 'next', 'key_up'):
+                    j = i
+                    while j < len(batch) and batch[j][1] in ('prev', 'next', 'key_up'):
+                        j += 1
+                    self._run_step_group(batch[i:j])
+                    i = j
+                    continue
+                if cmd_name == 'suspend':
                     self.click_suspend_button()
                 elif cmd_name == 'send_update':
                     self.click_send_update_button()
+                elif cmd_name == 'api':
+                    self._run_api(key_name, enqueued_ns, t0)
                 elif cmd_name == 'exit':
                     pass  # Just exit loop
-        except Empty:
-            pass  # Queue empty - normal
+                i += 1
+            finally:
+                self._cmd_enqueued_ns = 0
+                self._metrics.record_ns('command', time.perf_counter_ns() - t0)
     
     def run(self):
         """Start hotkey controller."""
@@ -472,6 +787,11 @@ class ExcelOddsHotkeyController:
             print("Failed to connect to Excel. Make sure Excel is open.")
             return
         
+        self.start_hotkeys()
+        self.serve()
+    
+    def start_hotkeys(self):
+        """Print the hotkey list, install keyboard hooks, schedule periodic tasks."""
         print()
         print("Hotkeys active:")
         print("  Numpad-  -> Decrease Home odds (PreviousOddsHome)")
@@ -510,18 +830,18 @@ class ExcelOddsHotkeyController:
                 
                 if e.event_type == 'down':
                     if key_name == 'numpad0':
-                        self._command_queue.put('send_update')
+                        self._enqueue('send_update')
                     elif key_name == 'numpad1':
-                        self._command_queue.put('suspend')
+                        self._enqueue('suspend')
                     elif key_name == 'numpad_minus':
-                        self._command_queue.put(('prev', 'num_minus'))
+                        self._enqueue(('prev', 'num_minus'))
                     elif key_name == 'numpad_plus':
-                        self._command_queue.put(('next', 'num_plus'))
+                        self._enqueue(('next', 'num_plus'))
                 elif e.event_type == 'up':
                     if key_name == 'numpad_minus':
-                        self._command_queue.put(('key_up', 'num_minus'))
+                        self._enqueue(('key_up', 'num_minus'))
                     elif key_name == 'numpad_plus':
-                        self._command_queue.put(('key_up', 'num_plus'))
+                        self._enqueue(('key_up', 'num_plus'))
                 
                 # Suppress numpad keys (return False to block propagation)
                 return False
@@ -530,20 +850,20 @@ class ExcelOddsHotkeyController:
             # F23/F24 track press/release for hold prevention
             if e.name == 'f23':
                 if e.event_type == 'down':
-                    self._command_queue.put(('prev', 'f23'))
+                    self._enqueue(('prev', 'f23'))
                 else:
-                    self._command_queue.put(('key_up', 'f23'))
+                    self._enqueue(('key_up', 'f23'))
             elif e.name == 'f24':
                 if e.event_type == 'down':
-                    self._command_queue.put(('next', 'f24'))
+                    self._enqueue(('next', 'f24'))
                 else:
-                    self._command_queue.put(('key_up', 'f24'))
+                    self._enqueue(('key_up', 'f24'))
             elif e.name == 'f21':
                 if e.event_type == 'down':
-                    self._command_queue.put(('suspend',))
+                    self._enqueue(('suspend',))
             elif e.name == 'f22':
                 if e.event_type == 'down':
-                    self._command_queue.put(('send_update',))
+                    self._enqueue(('send_update',))
             
             # Allow all other keys to pass through
             return True
@@ -554,27 +874,64 @@ class ExcelOddsHotkeyController:
         
         # Write initial status
         self.write_status()
-        last_status_write = time.time()
+        sched = self._scheduler
+        periodic = self._periodic
+        periodic.append(sched.call_every(STATUS_INTERVAL, self.write_status))
+        # Pick up edits to ODDSHOME/ODDSAWAY without a restart
+        periodic.append(sched.call_every(LADDER_CHECK_INTERVAL, self._load_odds_tables))
+        if self._layouts is not None:
+            periodic.append(sched.call_every(LADDER_CHECK_INTERVAL, self._check_layout))
+        if self._owns_com and self._session is not None:
+            # Under excel_bridge the watcher's reads notice a lost Excel and reattach for both
+            periodic.append(sched.call_every(SESSION_CHECK_INTERVAL, self._check_session))
+    
+    def stop_hotkeys(self):
+        """Unhook the keyboard, stop the command API, this controller's periodic tasks and reattach callback.
         
+        The scheduler itself keeps running: under excel_bridge it also
+        drives the watcher's poll.
+        """
+        keyboard.unhook_all()
+        for task in self._periodic:
+            task.cancel()
+        self._periodic.clear()
+        if self._session is not None and self._on_attach in self._session.on_attach:
+            # excel_bridge keeps the session: its reattaches must not revive this controller
+            self._session.on_attach.remove(self._on_attach)
+        self._on_attach = None
+        if self._api is not None:
+            self._api.close()
+            self._api = None
+    
+    def serve(self) -> bool:
+        """Main loop on the COM thread until Ctrl+Esc / Ctrl+C (other owners may add scheduler tasks).
+        
+        Returns True after Ctrl+Esc (only the hotkeys exit; excel_bridge keeps
+        polling), False after Ctrl+C.
+        """
+        sched = self._scheduler
+        stopped = True
         try:
-            # Main loop - process commands in main thread
+            # Main loop - process commands in main thread; block on the queue
+            # until the next scheduled task is due (no sleep polling)
             while self._running:
-                self.process_commands()
-                # Periodic status write (every ~1s)
-                now = time.time()
-                if now - last_status_write >= 1.0:
-                    self.write_status()
-                    last_status_write = now
-                time.sleep(0.05)  # 50ms polling
+                self.process_commands(block_timeout=sched.next_delay(MAX_WAIT))
+                sched.run_due()
         except KeyboardInterrupt:
             print("\nExit by Ctrl+C...")
+            stopped = False
         finally:
             print("Shutting down...")
-            keyboard.unhook_all()
+            self.stop_hotkeys()
             self.disconnect()
+        return stopped
     
     def disconnect(self):
         """Disconnect from Excel."""
+        self._sync.close()
+        if self._api is not None:
+            self._api.close()
+            self._api = None
         try:
             if self._xl:
                 self._xl.Interactive = True
@@ -583,14 +940,16 @@ class ExcelOddsHotkeyController:
             self._wb = None
             self._xl = None
             self._connected = False
-            pythoncom.CoUninitialize()
+            if self._owns_com:
+                pythoncom.CoUninitialize()
         except:
             pass
 
 
-def main():
-    controller = ExcelOddsHotkeyController()
-    controller.run()
+def main(argv=None):
+    # Hotkeys-only entry point of excel_bridge (no state watcher)
+    from excel_bridge import main as bridge_main
+    bridge_main(argv, watch=False, hotkeys=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+"""Odds step on a hotkey with the fewest COM round trips (excel_hotkey_controller).
+
+Один шаг odds = не больше одного блочного чтения ``Range("M{row}:N{row}")``
+и одной записи ``Cells(row, 13)`` (колонки - из разметки листа, excel_layout.py):
+
+    - значения строки кэшируются на ROW_CACHE_TTL секунд (проверка WIN/LOSE,
+      проверка удержания клавиши и сам шаг используют одно чтение);
+    - запись обновляет кэш (read-your-writes: home = записанное значение,
+      away = парное значение из ODDSAWAY), лог не перечитывает ячейки;
+    - кэш сбрасывается, когда excel_watcher переписывает current_state.json
+      (значит, в листе что-то изменилось), и по TTL.
+
+    keys = KeyPath(ws, ladder, notify_file=Path("current_state.json"))
+    res = keys.step(row=44, offset=+1)
+    if res.status == STEP_OK: print(res.old, "->", res.new, res.away)
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from excel_cells import range_ref
+from excel_ladder import OddsLadder
+
+ROW_CACHE_TTL = 0.25  # секунд, после этого строка читается заново
+HOME_COL = 13  # M
+AWAY_COL = 14  # N
+LOCKED_VALUES = {"WIN", "LOSE"}
+
+STEP_OK = "ok"
+STEP_BLOCKED = "blocked"          # WIN/LOSE в строке
+STEP_NO_VALUE = "no_value"        # M{row} пустая / не читается
+STEP_NOT_FOUND = "not_found"      # значения нет в ODDSHOME
+STEP_EDGE = "edge"                # край лестницы
+STEP_MANUAL_ONLY = "manual_only"  # следующий шаг - WIN/LOSE
+
+
+def is_locked(home: Any, away: Any) -> bool:
+    """WIN/LOSE in either cell blocks hotkey changes."""
+    return any(str(v).strip().upper() in LOCKED_VALUES for v in (home, away) if v)
+
+
+def _file_sig(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class RowCache:
+    """row -> (home, away) for ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = ROW_CACHE_TTL):
+        self.ttl = ttl
+        self._rows: Dict[int, Tuple[float, Any, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, row: int) -> Optional[Tuple[Any, Any]]:
+        hit = self._rows.get(row)
+        if hit is not None and time.monotonic() - hit[0] < self.ttl:
+            self.hits += 1
+            return hit[1], hit[2]
+        self.misses += 1
+        return None
+
+    def put(self, row: int, home: Any, away: Any):
+        self._rows[row] = (time.monotonic(), home, away)
+
+    def invalidate(self, row: Optional[int] = None):
+        if row is None:
+            self._rows.clear()
+        else:
+            self._rows.pop(row, None)
+
+
+class StepResult:
+    __slots__ = ("status", "row", "old", "new", "away", "steps")
+
+    def __init__(self, status: str, row: int, old: Any = None, new: Any = None, away: Any = None,
+                 steps: int = 0):
+        self.status = status
+        self.row = row
+        self.old = old
+        self.new = new
+        self.away = away
+        self.steps = steps  # ladder steps actually applied (signed)
+
+
+class KeyPath:
+    """Row reads through RowCache, ladder step, single cell write."""
+
+    def __init__(self, ws, ladder: OddsLadder, cache: Optional[RowCache] = None,
+                 notify_file: Optional[Path] = None, metrics=None,
+                 home_col: int = HOME_COL, away_col: int = AWAY_COL):
+        self.ws = ws
+        self.ladder = ladder  # replaced by the controller when ODDSHOME/ODDSAWAY reload
+        self.cache = cache if cache is not None else RowCache()
+        self.notify_file = notify_file
+        self.metrics = metrics
+        self.home_col = home_col
+        self.away_col = away_col
+        # called as on_write(row, home, away) after a successful write (excel_bridge
+        # publishes it right away instead of waiting for the next poll)
+        self.on_write: Optional[Callable[[int, Any, Any], None]] = None
+        self._notify_sig = _file_sig(notify_file) if notify_file is not None else None
+
+    def set_columns(self, home_col: int, away_col: int):
+        """New odds columns (layout change): cached rows belong to the old ones."""
+        self.home_col, self.away_col = home_col, away_col
+        self.cache.invalidate()
+
+    def poll_notifications(self):
+        """Drop cached rows if the watcher has reported a sheet change since the last check."""
+        if self.notify_file is None:
+            return
+        sig = _file_sig(self.notify_file)
+        if sig != self._notify_sig:
+            self._notify_sig = sig
+            self.cache.invalidate()
+
+    def read_row(self, row: int) -> Tuple[Any, Any]:
+        """(home, away) of the row: cached, or one ``Range("M{row}:N{row}")`` read."""
+        self.poll_notifications()
+        hit = self.cache.get(row)
+        if hit is not None:
+            return hit
+        t0 = time.perf_counter_ns()
+        try:
+            home, away = self.ws.Range(range_ref(row, self.home_col, row, self.away_col)).Value[0]
+        except Exception:
+            return None, None
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_ns("com_read", time.perf_counter_ns() - t0)
+        self.cache.put(row, home, away)
+        return home, away
+
+    def write_home(self, row: int, value: Any, away: Any = None):
+        """Write M{row} and remember what the row now holds."""
+        t0 = time.perf_counter_ns()
+        try:
+            self.ws.Cells(row, self.home_col).Value = value
+        except Exception:
+            self.cache.invalidate(row)
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_ns("com_write", time.perf_counter_ns() - t0)
+        self.cache.put(row, value, away)
+        if self.on_write is not None:
+            self.on_write(row, value, away)
+
+    def _walk(self, idx: int, offset: int) -> Tuple[int, Any]:
+        """Ladder index after up to ``offset`` steps; stops at the ends and before WIN/LOSE (returned)."""
+        ladder = self.ladder
+        direction = 1 if offset > 0 else -1
+        j = idx
+        for _ in range(abs(offset)):
+            nxt = j + direction
+            if not 0 <= nxt < len(ladder):
+                return j, None
+            if str(ladder.home[nxt]).upper() in LOCKED_VALUES:
+                return j, ladder.home[nxt]
+            j = nxt
+        return j, None
+
+    def preview(self, odds: Tuple[Any, Any], offset: int) -> Optional[Tuple[Any, Any]]:
+        """(home, away) after ``offset`` steps from ``odds`` if every step is allowed, else None."""
+        home, away = odds
+        if is_locked(home, away) or home is None:
+            return None
+        idx = self.ladder.index_of(home)
+        if idx < 0:
+            return None
+        if offset == 0:
+            return home, away
+        j, _ = self._walk(idx, offset)
+        if j - idx != offset:
+            return None
+        new_away = self.ladder.away_at(j)
+        return self.ladder.home[j], new_away if new_away is not None else away
+
+    def step(self, row: int, offset: int, odds: Optional[Tuple[Any, Any]] = None) -> StepResult:
+        """Move M{row} ``offset`` ladder steps with one write; ``odds`` skips the read.
+
+        Larger offsets (coalesced keypresses) stop at the ladder ends and
+        before a WIN/LOSE step, like the same presses applied one by one.
+        """
+        home, away = odds if odds is not None else self.read_row(row)
+        if is_locked(home, away):
+            return StepResult(STEP_BLOCKED, row, home, None, away)
+        if home is None:
+            return StepResult(STEP_NO_VALUE, row)
+        ladder = self.ladder
+        idx = ladder.index_of(home)
+        if idx < 0:
+            return StepResult(STEP_NOT_FOUND, row, home, ladder.nearest(home), away)
+        j, stop = self._walk(idx, offset)
+        if j == idx:
+            if stop is not None:
+                return StepResult(STEP_MANUAL_ONLY, row, home, stop, away)
+            return StepResult(STEP_EDGE, row, home, None, away)
+        new_home, new_away = ladder.home[j], ladder.away_at(j)
+        if new_away is None:
+            new_away = away
+        self.write_home(row, new_home, new_away)
+        return StepResult(STEP_OK, row, home, new_home, new_away, j - idx)
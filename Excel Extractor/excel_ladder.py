@@ -0,0 +1,102 @@
+"""Odds ladder index for excel_hotkey_controller (ODDSHOME / ODDSAWAY named ranges).
+
+Шаг odds на хоткей = найти текущее значение M{row} в ODDSHOME и взять
+соседнее. Вместо ``list.index`` + линейного поиска с допуском:
+
+    - hash по корзинам допуска: round(value / TOLERANCE) -> индекс
+      (проверяются соседние корзины, так что 1.4999999 находит 1.5);
+    - отсортированный массив значений для bisect (ближайшее значение лестницы);
+    - away-лестница хранится парой к home (та же строка именованного диапазона).
+
+    ladder = OddsLadder.from_ranges(home_range.Value, away_range.Value)
+    i = ladder.index_of(1.85)
+    ladder.step(1.85, +1)  # -> (home, away) или None на краю лестницы
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional, Tuple
+
+TOLERANCE = 0.001  # как в старом _find_odds_index
+
+
+def flatten(value: Any) -> List[Any]:
+    """Range.Value (scalar or tuple of row tuples) -> flat list, row by row."""
+    if isinstance(value, (tuple, list)):
+        out = []
+        for row in value:
+            if isinstance(row, (tuple, list)):
+                out.extend(row)
+            else:
+                out.append(row)
+        return out
+    return [value]
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+class OddsLadder:
+    """Home ladder with O(1) value -> index lookup and the paired away ladder."""
+
+    def __init__(self, home: List[Any], away: Optional[List[Any]] = None):
+        self.home = list(home)
+        self.away = list(away) if away is not None else []
+        self._exact: Dict[Any, int] = {}
+        self._buckets: Dict[int, int] = {}
+        for i, v in enumerate(self.home):
+            self._exact.setdefault(v, i)
+            if _is_number(v):
+                self._buckets.setdefault(round(v / TOLERANCE), i)
+        numeric = sorted((v, i) for i, v in enumerate(self.home) if _is_number(v))
+        self._sorted_values = [v for v, _ in numeric]
+        self._sorted_index = [i for _, i in numeric]
+
+    @classmethod
+    def from_ranges(cls, home_value: Any, away_value: Any = None) -> "OddsLadder":
+        """Build from bulk ``Range.Value`` reads; empty home rows are skipped with their away pair."""
+        home = flatten(home_value)
+        away = flatten(away_value) if away_value is not None else []
+        pairs = [(h, away[i] if i < len(away) else None) for i, h in enumerate(home) if h is not None]
+        return cls([h for h, _ in pairs], [a for _, a in pairs])
+
+    def __len__(self) -> int:
+        return len(self.home)
+
+    def index_of(self, value: Any) -> int:
+        """Index of ``value`` in the home ladder (float tolerance), -1 if absent."""
+        try:
+            i = self._exact.get(value)
+        except TypeError:  # unhashable
+            return -1
+        if i is not None:
+            return i
+        if not _is_number(value):
+            return -1
+        key = round(value / TOLERANCE)
+        for k in (key, key - 1, key + 1):
+            i = self._buckets.get(k)
+            if i is not None and abs(self.home[i] - value) < TOLERANCE:
+                return i
+        return -1
+
+    def nearest(self, value: Any) -> Optional[Any]:
+        """Closest numeric ladder value (bisect), for diagnostics."""
+        if not _is_number(value) or not self._sorted_values:
+            return None
+        pos = bisect.bisect_left(self._sorted_values, value)
+        best = [self._sorted_values[j] for j in (pos - 1, pos) if 0 <= j < len(self._sorted_values)]
+        return min(best, key=lambda v: abs(v - value))
+
+    def away_at(self, index: int) -> Any:
+        return self.away[index] if 0 <= index < len(self.away) else None
+
+    def step(self, value: Any, direction: int) -> Optional[Tuple[Any, Any]]:
+        """(home, away) one step from ``value``; None if not on the ladder or at the edge."""
+        i = self.index_of(value)
+        if i < 0:
+            return None
+        j = i + direction
+        if not 0 <= j < len(self.home):
+            return None
+        return self.home[j], self.away_at(j)
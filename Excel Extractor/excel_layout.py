@@ -0,0 +1,260 @@
+"""Sheet layout discovery and its on-disk cache (excel_watcher + excel_hotkey_controller).
+
+Строки блоков "Map N Winner" (44/190/336/482/628), колонки odds (M/N) и
+ячейки статуса / команд раньше были зашиты в обоих скриптах; ревизия
+шаблона, сдвинувшая блок, молча ломала чтение odds. Здесь:
+
+    - ``discover(sheet)``: одно чтение ``UsedRange.Value``, поиск по
+      подписям: "Map N Winner" -> строка карты N, "Team 1"/"Team 2" и
+      "Status" -> ячейка справа от подписи (статус ещё и по значению
+      Trading/Suspended); колонки odds - соседняя пара с наибольшим числом
+      коэффициентов в строках карт (при равенстве - M/N). Не найденное
+      берётся из DEFAULT_LAYOUT;
+    - ``LayoutIndex``: кэш в layout_cache.json по ключу книга + лист +
+      шаблон (значение C1), проверка - адрес UsedRange. Тёплый старт = два
+      COM-вызова (C1 и UsedRange.Address) без чтения листа; discovery
+      повторяется, только когда меняется шаблон или границы листа.
+
+Ячейка шаблона (C1) - якорь ключа кэша, поэтому она не ищется.
+
+    index = LayoutIndex(workbook_path, sheet_name)
+    layout = index.resolve(ws)
+    layout.map_rows        # {1: 44, 2: 190, ...}
+    layout.map_cell_pairs  # [("M44", "N44"), ...]
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from excel_cells import as_rows, cell_ref, index_to_col, parse_cell
+
+LAYOUT_CACHE_FILE = Path(__file__).parent / "layout_cache.json"
+LAYOUT_CACHE_VERSION = 1
+MAX_CACHE_ENTRIES = 64
+
+_MAP_LABEL_RE = re.compile(r"^\s*map\s*(\d+)\s*winner\b", re.I)
+_TEAM_LABEL_RE = re.compile(r"^\s*team\s*([12])\s*:?\s*$", re.I)
+_STATUS_LABEL_RE = re.compile(r"^\s*status\s*:?\s*$", re.I)
+STATUS_VALUES = {"trading", "suspended"}
+ODDS_TEXT = {"WIN", "LOSE"}
+
+
+class Layout:
+    """Cell index of the InPlay sheet: header cells, map rows and odds columns."""
+
+    def __init__(self, map_rows: Dict[int, int], template_cell: str = "C1", status_cell: str = "C6",
+                 team1_cell: str = "K4", team2_cell: str = "N4", home_col: int = 13, away_col: int = 14,
+                 source: str = "default"):
+        self.map_rows = {int(k): int(v) for k, v in sorted(map_rows.items())}
+        self.template_cell = template_cell
+        self.status_cell = status_cell
+        self.team1_cell = team1_cell
+        self.team2_cell = team2_cell
+        self.home_col = home_col
+        self.away_col = away_col
+        self.source = source  # default / discovered / cache
+        self.map_cells: Dict[int, Tuple[str, str]] = {
+            n: (cell_ref(row, home_col), cell_ref(row, away_col)) for n, row in self.map_rows.items()}
+        self.map_cell_pairs: List[Tuple[str, str]] = list(self.map_cells.values())
+        self.cells: List[str] = ([template_cell, status_cell, team1_cell, team2_cell]
+                                 + [c for pair in self.map_cell_pairs for c in pair])
+
+    def row_for(self, map_num: int) -> Optional[int]:
+        return self.map_rows.get(map_num)
+
+    def describe(self) -> str:
+        rows = "/".join(str(r) for r in self.map_rows.values())
+        return (f"maps {len(self.map_rows)} at rows {rows}, odds "
+                f"{index_to_col(self.home_col)}/{index_to_col(self.away_col)}, status {self.status_cell}, "
+                f"teams {self.team1_cell}/{self.team2_cell} ({self.source})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"mapRows": {str(k): v for k, v in self.map_rows.items()}, "templateCell": self.template_cell,
+                "statusCell": self.status_cell, "team1Cell": self.team1_cell, "team2Cell": self.team2_cell,
+                "homeCol": self.home_col, "awayCol": self.away_col}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], source: str = "cache") -> "Layout":
+        return cls({int(k): v for k, v in d["mapRows"].items()}, d["templateCell"], d["statusCell"],
+                   d["team1Cell"], d["team2Cell"], d["homeCol"], d["awayCol"], source)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Layout) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        return hash(json.dumps(self.to_dict(), sort_keys=True))
+
+
+DEFAULT_LAYOUT = Layout({1: 44, 2: 190, 3: 336, 4: 482, 5: 628})
+
+
+def _is_odds(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return value > 1.0
+    return isinstance(value, str) and value.strip().upper() in ODDS_TEXT
+
+
+def _right_of(rows: List[List[Any]], i: int, j: int) -> Optional[int]:
+    """Column offset of the first non-empty cell right of (i, j), None if the row ends."""
+    row = rows[i]
+    for k in range(j + 1, len(row)):
+        if row[k] is not None and str(row[k]).strip() != "":
+            return k
+    return None
+
+
+def _used_bounds(used) -> Tuple[int, int, int, int]:
+    """(top, left, n_rows, n_cols) of a UsedRange from its address."""
+    parts = str(used.Address).replace("$", "").split(":")
+    top, left = parse_cell(parts[0])
+    bottom, right = parse_cell(parts[-1])
+    return top, left, bottom - top + 1, right - left + 1
+
+
+def discover(sheet, fallback: Layout = DEFAULT_LAYOUT) -> Layout:
+    """Find the layout by labels with one ``UsedRange.Value`` read (missing items from ``fallback``)."""
+    used = sheet.UsedRange
+    top, left, n_rows, n_cols = _used_bounds(used)
+    rows = as_rows(used.Value, n_rows, n_cols)
+
+    map_rows: Dict[int, int] = {}
+    map_label_cols: Dict[int, int] = {}
+    team: Dict[str, str] = {}
+    status_label = status_value = None
+    for i, row in enumerate(rows):
+        for j, v in enumerate(row):
+            if not isinstance(v, str) or not v.strip():
+                continue
+            m = _MAP_LABEL_RE.match(v)
+            if m:
+                n = int(m.group(1))
+                if n not in map_rows:
+                    map_rows[n] = top + i
+                    map_label_cols[n] = j
+                continue
+            m = _TEAM_LABEL_RE.match(v)
+            if m and m.group(1) not in team:
+                k = j + 1 if j + 1 < len(row) else None
+                if k is not None:
+                    team[m.group(1)] = cell_ref(top + i, left + k)
+                continue
+            if status_label is None and _STATUS_LABEL_RE.match(v):
+                k = _right_of(rows, i, j)
+                if k is not None:
+                    status_label = cell_ref(top + i, left + k)
+                continue
+            if status_value is None and v.strip().lower() in STATUS_VALUES:
+                status_value = cell_ref(top + i, left + j)
+
+    home_col, away_col = fallback.home_col, fallback.away_col
+    if map_rows:
+        # Adjacent column pair holding the most odds across the map rows; ties keep the fallback
+        score: Dict[int, int] = {}
+        for n, r in map_rows.items():
+            row = rows[r - top]
+            for j in range(map_label_cols[n] + 1, len(row) - 1):
+                if _is_odds(row[j]) and _is_odds(row[j + 1]):
+                    score[left + j] = score.get(left + j, 0) + 1
+        best = max(score.values(), default=0)
+        if best and score.get(fallback.home_col, 0) < best:
+            home_col = min(c for c, s in score.items() if s == best)
+            away_col = home_col + 1
+    else:
+        map_rows = dict(fallback.map_rows)
+
+    if status_label is None and status_value is not None:
+        # A Trading/Suspended value elsewhere only wins if the usual cell does not hold one
+        r, c = parse_cell(fallback.status_cell)
+        i, j = r - top, c - left
+        current = rows[i][j] if 0 <= i < len(rows) and 0 <= j < len(rows[i]) else None
+        if isinstance(current, str) and current.strip().lower() in STATUS_VALUES:
+            status_value = fallback.status_cell
+    return Layout(map_rows, fallback.template_cell, status_label or status_value or fallback.status_cell,
+                  team.get("1", fallback.team1_cell), team.get("2", fallback.team2_cell),
+                  home_col, away_col, source="discovered")
+
+
+class LayoutIndex:
+    """Discovered layouts cached on disk by workbook + sheet + template, checked against UsedRange."""
+
+    def __init__(self, workbook: Any, sheet_name: str, cache_file: Path = LAYOUT_CACHE_FILE,
+                 fallback: Layout = DEFAULT_LAYOUT):
+        self.workbook = str(workbook).lower()
+        self.sheet_name = sheet_name
+        self.cache_file = cache_file
+        self.fallback = fallback
+        self.layout = fallback
+        self.template = ""  # template value the current layout was resolved for
+        self.hits = 0
+        self.discoveries = 0
+        self.last_ms = 0.0
+
+    def fingerprint(self, sheet) -> Tuple[str, str]:
+        """(template value, UsedRange address): two COM calls, no cell data."""
+        template = sheet.Range(self.fallback.template_cell).Value
+        return (str(template).strip() if template is not None else ""), str(sheet.UsedRange.Address)
+
+    def _key(self, template: str) -> str:
+        return f"{self.workbook}|{self.sheet_name}|{template}"
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != LAYOUT_CACHE_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def _save(self, entries: Dict[str, Any]):
+        if len(entries) > MAX_CACHE_ENTRIES:
+            keep = sorted(entries, key=lambda k: entries[k].get("ts", 0))[-MAX_CACHE_ENTRIES:]
+            entries = {k: entries[k] for k in keep}
+        tmp = self.cache_file.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps({"version": LAYOUT_CACHE_VERSION, "entries": entries},
+                                      ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(self.cache_file)
+        except OSError as e:
+            print(f"[WARN] Не удалось записать {self.cache_file}: {e}")
+
+    def resolve(self, sheet, force: bool = False) -> Layout:
+        """Cached layout for the sheet's current template; discovery only on a miss (or ``force``)."""
+        t0 = time.perf_counter()
+        try:
+            template, address = self.fingerprint(sheet)
+        except Exception as e:
+            print(f"[WARN] Layout fingerprint failed ({e}), using {self.layout.source} layout")
+            return self.layout
+        self.template = template
+        key = self._key(template)
+        entries = self._load()
+        entry = entries.get(key)
+        if not force and entry is not None and entry.get("address") == address:
+            try:
+                self.layout = Layout.from_dict(entry["layout"])
+                self.hits += 1
+                self.last_ms = (time.perf_counter() - t0) * 1000.0
+                return self.layout
+            except (KeyError, TypeError, ValueError):
+                pass  # corrupt entry: rediscover
+        try:
+            layout = discover(sheet, self.fallback)
+        except Exception as e:
+            print(f"[WARN] Layout discovery failed ({e}), using {self.layout.source} layout")
+            return self.layout
+        self.discoveries += 1
+        entries[key] = {"address": address, "ts": time.time(), "layout": layout.to_dict()}
+        self._save(entries)
+        self.layout = layout
+        self.last_ms = (time.perf_counter() - t0) * 1000.0
+        return layout
+
+    def stats(self) -> Dict[str, Any]:
+        return {"source": self.layout.source, "hits": self.hits, "discoveries": self.discoveries,
+                "ms": round(self.last_ms, 3)}
@@ -0,0 +1,183 @@
+"""Full-market capture for excel_watcher (``--markets all``).
+
+Кроме пары Map Winner в каждом блоке карты (строки от "Map N Winner" до
+следующей карты, ~146 строк) есть остальные рынки. По ячейке их не
+прочитать, поэтому здесь:
+
+    - каждый блок карты - один ``Range(ref).Value`` за опрос (2D-массив,
+      tuple of row tuples), колонки - ``--market-cols`` (по умолчанию от A
+      до колонки away разметки, см. excel_layout.py);
+    - сравнение с прошлым массивом блока - построчно (равенство tuple
+      строки, без Python-цикла по ячейкам), наружу уходят только
+      изменившиеся строки: ``{"map": {"row": [значения по колонкам]}}``;
+    - ячейки Map Winner (M/N) берутся из тех же массивов, так что
+      ReadPlan watcher'а читает только шапку (C1/C6/K4/N4).
+
+Стоимость опроса = число карт COM-вызовов плюс сравнение строк, почти не
+растёт с числом ячеек (см. ``excel_bench.py markets``).
+
+В current_state.json ``markets`` - только изменения этого опроса (INIT и
+keyframe ``--wire delta`` - все строки); потребителю, который может
+пропустить перезапись файла, нужен ``--serve`` (seq + resync).
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from excel_cells import as_rows, col_to_index, index_to_col, parse_cell, range_ref
+from excel_layout import Layout
+
+MAX_BLOCK_ROWS = 400    # последний блок (или единственный) не длиннее этого
+LAST_BLOCK_ROWS = 146   # длина последнего блока, если её не с чем сравнить
+
+
+def parse_cols(spec: str) -> Tuple[int, int]:
+    """'A:N' -> (1, 14)."""
+    parts = spec.replace("$", "").upper().split(":")
+    if len(parts) != 2 or not all(p.isalpha() for p in parts):
+        raise ValueError(f"Invalid column range: {spec!r} (expected e.g. A:N)")
+    left, right = col_to_index(parts[0]), col_to_index(parts[1])
+    return min(left, right), max(left, right)
+
+
+class MarketBlock:
+    """Rows of one map read as a single 2D block."""
+
+    __slots__ = ("map_num", "top", "bottom", "left", "right", "ref", "rows")
+
+    def __init__(self, map_num: int, top: int, bottom: int, left: int, right: int):
+        self.map_num = map_num
+        self.top = top
+        self.bottom = bottom
+        self.left = left
+        self.right = right
+        self.ref = range_ref(top, left, bottom, right)
+        self.rows: Optional[tuple] = None  # last read, one tuple per sheet row
+
+    @property
+    def n_rows(self) -> int:
+        return self.bottom - self.top + 1
+
+    @property
+    def n_cols(self) -> int:
+        return self.right - self.left + 1
+
+
+def map_blocks(layout: Layout, left: int, right: int) -> List[MarketBlock]:
+    """One block per map: its Map Winner row up to the row before the next map."""
+    items = list(layout.map_rows.items())
+    blocks = []
+    span = LAST_BLOCK_ROWS
+    for k, (n, top) in enumerate(items):
+        if k + 1 < len(items):
+            bottom = items[k + 1][1] - 1
+            span = bottom - top + 1
+        else:
+            bottom = top + span - 1
+        bottom = max(top, min(bottom, top + MAX_BLOCK_ROWS - 1))
+        blocks.append(MarketBlock(n, top, bottom, left, right))
+    return blocks
+
+
+class MarketWatch:
+    """Reads every map block per tick and reports the rows that changed."""
+
+    def __init__(self, layout: Layout, cols: Optional[Tuple[int, int]] = None):
+        self.layout = layout
+        self.cols = cols
+        left, right = cols if cols is not None else (1, max(layout.home_col, layout.away_col))
+        self.left, self.right = left, right
+        self.blocks = map_blocks(layout, left, right)
+        # Layout cells inside a block: cell -> (block index, row offset, col offset)
+        self.covered: Dict[str, Tuple[int, int, int]] = {}
+        for c in layout.cells:
+            row, col = parse_cell(c)
+            for i, b in enumerate(self.blocks):
+                if b.top <= row <= b.bottom and left <= col <= right:
+                    self.covered[c] = (i, row - b.top, col - left)
+                    break
+        self.last_calls = 0
+        self.last_ms = 0.0
+        self.last_rows = 0
+        self.diff_ns = 0  # row comparison time of the last read (watcher "diff" stage)
+        self.reads = 0
+        self.changed_rows = 0
+
+    @property
+    def col_span(self) -> str:
+        return f"{index_to_col(self.left)}:{index_to_col(self.right)}"
+
+    @property
+    def cell_count(self) -> int:
+        return sum(b.n_rows * b.n_cols for b in self.blocks)
+
+    def describe(self) -> str:
+        return ", ".join(b.ref for b in self.blocks)
+
+    def header_cells(self) -> List[str]:
+        """Layout cells the blocks do not cover (left to the ReadPlan)."""
+        return [c for c in self.layout.cells if c not in self.covered]
+
+    def read(self, sheet) -> Tuple[Dict[str, Any], Dict[str, Dict[str, list]]]:
+        """Read all blocks: (values of the covered layout cells, changed rows by map)."""
+        clock = time.perf_counter_ns
+        t0 = clock()
+        diff_ns = 0
+        changes: Dict[str, Dict[str, list]] = {}
+        n_changed = 0
+        for b in self.blocks:
+            try:
+                rows = self._rows(sheet.Range(b.ref).Value, b)
+            except Exception:
+                rows = None
+            if rows is None or len(rows) != b.n_rows:
+                continue  # keep the last good block; retried next tick
+            t1 = clock()
+            prev = b.rows
+            b.rows = rows
+            if prev is None:
+                diff = range(len(rows))
+            elif prev == rows:
+                diff = ()
+            else:
+                diff = [i for i, (p, r) in enumerate(zip(prev, rows)) if p != r]
+            if diff:
+                changes[str(b.map_num)] = {str(b.top + i): list(rows[i]) for i in diff}
+                n_changed += len(diff)
+            diff_ns += clock() - t1
+        self.last_calls = len(self.blocks)
+        self.last_ms = (clock() - t0) / 1e6
+        self.diff_ns = diff_ns
+        self.last_rows = n_changed
+        self.reads += 1
+        self.changed_rows += n_changed
+        return self.values(), changes
+
+    @staticmethod
+    def _rows(value: Any, b: MarketBlock) -> tuple:
+        # COM already returns a tuple of row tuples: keep it as is (no per-cell copy)
+        if isinstance(value, tuple) and value and isinstance(value[0], tuple):
+            return value
+        return tuple(tuple(r) for r in as_rows(value, b.n_rows, b.n_cols))
+
+    def values(self) -> Dict[str, Any]:
+        """Covered layout cells from the last block arrays."""
+        out = {}
+        for c, (i, r, col) in self.covered.items():
+            rows = self.blocks[i].rows
+            out[c] = rows[r][col] if rows is not None and col < len(rows[r]) else None
+        return out
+
+    def snapshot(self) -> Dict[str, Dict[str, list]]:
+        """Every row of every block (INIT / keyframes)."""
+        return {str(b.map_num): {str(b.top + i): list(r) for i, r in enumerate(b.rows)}
+                for b in self.blocks if b.rows is not None}
+
+    def reset(self):
+        for b in self.blocks:
+            b.rows = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"blocks": len(self.blocks), "cells": self.cell_count, "cols": self.col_span,
+                "comCalls": self.last_calls, "ms": round(self.last_ms, 3), "changedRows": self.last_rows}
+
@@ -0,0 +1,204 @@
+"""Low-overhead latency metrics for excel_watcher / excel_hotkey_controller.
+
+Каждый этап (COM read, diff, serialize, ...) пишет длительность в свою
+гистограмму: log-linear корзины как в HdrHistogram (16 под-корзин на
+степень двойки, ~6% относительная точность), запись - пара целочисленных
+операций и инкремент в dict, без аллокаций на горячем пути.
+
+Окно скользящее: ``rotate()`` вызывается на каждом отчёте (status / metrics
+line) и выбрасывает самый старый срез, так что перцентили описывают последние
+``slices`` отчётных интервалов, а ``total`` - всё время работы.
+
+    m = Metrics(slices=6)
+    t0 = time.perf_counter_ns()
+    ...
+    m.record_ns("read", time.perf_counter_ns() - t0)
+    m.rotate()
+    m.summary()  # {"read": {"count", "total", "p50", "p95", "p99", "max"}} in ms
+
+``StartupTimer``: время от старта процесса до первого INIT по фазам
+(python = интерпретатор + импорты до таймера, далее - метки ``mark``).
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+SUB_BITS = 4
+SUB = 1 << SUB_BITS  # под-корзин на степень двойки
+LINEAR = SUB * 2     # значения < LINEAR (мкс) хранятся точно
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(us: int) -> int:
+    """HDR-style bucket for a value in microseconds."""
+    if us < LINEAR:
+        return us if us > 0 else 0
+    shift = us.bit_length() - SUB_BITS - 1
+    return (shift + 1) * SUB + (us >> shift) - SUB
+
+
+def bucket_value(idx: int) -> float:
+    """Midpoint of a bucket in microseconds."""
+    if idx < LINEAR:
+        return float(idx)
+    shift = idx // SUB - 1
+    lower = (idx % SUB + SUB) << shift
+    return lower + ((1 << shift) - 1) / 2.0
+
+
+class _Slice:
+    __slots__ = ("counts", "count", "max_us")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.max_us = 0
+
+
+class Histogram:
+    """Rolling log-linear histogram over the last ``slices`` report intervals."""
+
+    def __init__(self, slices: int = 6):
+        self.slices = max(1, slices)
+        self._window: Dict[int, int] = {}
+        self._ring: Deque[_Slice] = deque([_Slice()])
+        self.window_count = 0
+        self.total = 0
+
+    def record_us(self, us: int):
+        idx = bucket_index(us)
+        cur = self._ring[-1]
+        cur.counts[idx] = cur.counts.get(idx, 0) + 1
+        cur.count += 1
+        if us > cur.max_us:
+            cur.max_us = us
+        self._window[idx] = self._window.get(idx, 0) + 1
+        self.window_count += 1
+        self.total += 1
+
+    def rotate(self):
+        self._ring.append(_Slice())
+        if len(self._ring) > self.slices:
+            old = self._ring.popleft()
+            window = self._window
+            for idx, n in old.counts.items():
+                left = window[idx] - n
+                if left:
+                    window[idx] = left
+                else:
+                    del window[idx]
+            self.window_count -= old.count
+
+    def percentile(self, q: float) -> float:
+        """Value (us) at percentile ``q`` of the current window (never above its max)."""
+        if not self.window_count:
+            return 0.0
+        rank = max(1, int(q / 100.0 * self.window_count + 0.5))
+        seen = 0
+        idx = max(self._window)
+        for i in sorted(self._window):
+            seen += self._window[i]
+            if seen >= rank:
+                idx = i
+                break
+        # bucket midpoints can overshoot the exact max in the top bucket
+        return min(bucket_value(idx), float(self.max_us()))
+
+    def max_us(self) -> int:
+        return max(s.max_us for s in self._ring)
+
+    def summary(self) -> Dict[str, Any]:
+        """count / total / p50 / p95 / p99 / max, milliseconds."""
+        out: Dict[str, Any] = {"count": self.window_count, "total": self.total}
+        for q in PERCENTILES:
+            out[f"p{q}"] = round(self.percentile(q) / 1000.0, 3)
+        out["max"] = round(self.max_us() / 1000.0, 3)
+        return out
+
+
+class Metrics:
+    """Named histograms; ``order`` fixes the order of the metrics line."""
+
+    def __init__(self, slices: int = 6, order: Optional[List[str]] = None):
+        self.slices = slices
+        self.hists: Dict[str, Histogram] = {}
+        for name in order or ():
+            self.hists[name] = Histogram(slices)
+
+    def record_ns(self, name: str, ns: int):
+        h = self.hists.get(name)
+        if h is None:
+            h = self.hists[name] = Histogram(self.slices)
+        h.record_us(ns // 1000)
+
+    def rotate(self):
+        for h in self.hists.values():
+            h.rotate()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: h.summary() for name, h in self.hists.items() if h.total}
+
+    def line(self) -> str:
+        """One-line report: ``read n=120 p50=2.31 p99=7.80 max=9.12ms | ...``."""
+        parts = []
+        for name, s in self.summary().items():
+            parts.append(f"{name} n={s['count']} p50={s['p50']:.2f} p95={s['p95']:.2f} "
+                         f"p99={s['p99']:.2f} max={s['max']:.2f}ms")
+        return " | ".join(parts)
+
+
+def process_age_ms() -> Optional[float]:
+    """Milliseconds since this process was created, None where the OS does not tell."""
+    if os.name == "nt":
+        try:
+            import ctypes
+            from ctypes import wintypes
+            k32 = ctypes.windll.kernel32
+            created, exited, kernel, user, now = (wintypes.FILETIME() for _ in range(5))
+            if not k32.GetProcessTimes(k32.GetCurrentProcess(), ctypes.byref(created), ctypes.byref(exited),
+                                       ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            k32.GetSystemTimeAsFileTime(ctypes.byref(now))
+            ticks = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime  # noqa: E731 (100 ns units)
+            return (ticks(now) - ticks(created)) / 1e4
+        except (AttributeError, OSError):
+            return None
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, (uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")) * 1000.0)  # field 22: starttime
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """Process start -> first INIT, split into named phases (reported once)."""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        before = process_age_ms()
+        if before is not None:
+            self.phases.append(("python", before))  # interpreter start + imports before the timer
+
+    def mark(self, name: str):
+        """Close the phase that ended now."""
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000.0))
+        self._last = now
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.phases)
+
+    def line(self) -> str:
+        """``412ms (python 120, stale 2, attach 250, ...)``."""
+        return f"{self.total_ms:.0f}ms (" + ", ".join(f"{name} {ms:.0f}" for name, ms in self.phases) + ")"
+
+    def summary(self) -> Dict[str, Any]:
+        return {"totalMs": round(self.total_ms, 1), "phases": {name: round(ms, 1) for name, ms in self.phases}}
@@ -0,0 +1,342 @@
+"""Several workbooks from one watcher process (``--workbooks PATH ... | auto``).
+
+Раньше на каждый матч - свой excel_watcher.py и свой current_state.json
+(файлы конфликтовали, GetObject видит только один экземпляр Excel). Здесь
+один процесс и один COM-поток:
+
+    - у каждой книги свой Watcher, ReadPlan и AdaptiveScheduler, опросы -
+      задачи в общей куче дедлайнов (excel_scheduler.TaskScheduler);
+    - книга без изменений уходит в backoff (до --poll-max), поэтому активная
+      книга платит только за свои чтения: задержка не растёт линейно с
+      числом открытых книг (см. ``excel_bench.py multi``);
+    - ``auto``: все сохранённые книги всех экземпляров Excel из Running
+      Object Table, пересканирование каждые --discover-interval секунд
+      (закрытые книги отпадают после MAX_ERRORS опросов без подключения
+      подряд; книги из списка --workbooks переподключаются, см.
+      excel_session.py);
+    - у каждой книги своя разметка листа (excel_layout.py, общий кэш
+      layout_cache.json), так что книги разных ревизий шаблона не мешают;
+    - состояние - отдельный файл на книгу: главная книга пишет --state-file
+      как раньше (Electron), остальные ``current_state.<книга>.json``.
+      Главная - книга --file или первая из списка --workbooks; для одного
+      ``auto`` - первая по пути. Если главная книга отпала, файл переходит
+      к первой по пути оставшейся (только без --file / списка) или
+      переписывается со ``stale: true``;
+    - все файлы пишет один фоновый StateWriter (excel_writer.py), медленная
+      запись одной книги не задерживает опрос остальных;
+    - ``current_state.workbooks.json``: список книг с их файлами и
+      счётчиками + суммарная пропускная способность и перцентили этапов
+      (включая ``lag`` - опоздание опроса относительно его дедлайна).
+
+--serve / --record / --shm / --hotkeys / --mode events остаются однокнижными.
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import excel_watcher as watcher
+from excel_backends import ComBackend, SheetBackend, make_backend, norm_path, running_workbooks
+from excel_metrics import Metrics
+from excel_session import DISCONNECTED
+from excel_scheduler import TaskScheduler
+from excel_writer import StateWriter
+
+MULTI_STAGES = ["lag"] + watcher.WATCHER_STAGES
+MAX_ERRORS = 3          # ошибок чтения подряд, после которых найденная (auto) книга снимается
+INDEX_SUFFIX = ".workbooks.json"
+
+
+def slug(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name).strip("._") or "workbook"
+
+
+class WorkbookSlot:
+    """One watched workbook: its backend, pipeline and poll interval."""
+
+    def __init__(self, name: str, path: Path, backend: SheetBackend, w: "watcher.Watcher",
+                 poll: "watcher.AdaptiveScheduler", discovered: bool):
+        self.name = name
+        self.path = path
+        self.backend = backend
+        self.watcher = w
+        self.poll = poll
+        self.discovered = discovered
+        self.task = None
+        self.due = 0.0
+        self.ticks = 0
+        self.changes = 0
+        self.errors = 0  # подряд
+
+    def state(self) -> Dict[str, Any]:
+        return {"name": self.name, "path": str(self.path), "stateFile": str(self.watcher.state_file),
+                "ticks": self.ticks, "changes": self.changes, "errors": self.errors,
+                "poll": self.poll.state()}
+
+
+class MultiWatcher:
+    """Round-robin by deadline: each workbook is polled at its own adaptive interval."""
+
+    def __init__(self, state_file: Path, sheet_name: str, make_plan: Callable[[List[str]], Any],
+                 make_poll: Callable[[], "watcher.AdaptiveScheduler"], metrics: Metrics,
+                 tasks: Optional[TaskScheduler] = None):
+        self.state_file = state_file
+        self.sheet_name = sheet_name
+        self.make_plan = make_plan
+        self.make_poll = make_poll
+        self.metrics = metrics
+        self.tasks = tasks if tasks is not None else TaskScheduler()
+        self.slots: Dict[str, WorkbookSlot] = {}  # normalized path (lower) -> slot
+        self.metrics_file: Optional[Path] = None
+        self.rediscover = False  # --rediscover: skip layout_cache.json on add
+        self.early = True  # --com-binding early for workbooks found by discover()
+        self.retry_ms: Optional[int] = None  # --com-retry-ms
+        self.markets = "map"  # --markets / --market-cols for every workbook
+        self.market_cols = None
+        self.writer: Optional[StateWriter] = None  # shared by every workbook; None = inline writes
+        self._files: Dict[str, str] = {}  # state file -> slot key (no collisions)
+        self.main_key: Optional[str] = None  # --file / first --workbooks path: owns state_file; None = any
+        self._main: Optional[str] = None  # key of the slot writing state_file now
+        self._window_at = time.monotonic()
+        self._window_ticks = 0
+        self._window_changes = 0
+        self.throughput: Dict[str, float] = {}
+
+    @property
+    def index_file(self) -> Path:
+        return self.state_file.with_name(self.state_file.stem + INDEX_SUFFIX)
+
+    @staticmethod
+    def key(path: Path) -> str:
+        return norm_path(path).lower()  # string normalization only: no file system call per ROT entry
+
+    def _state_file_for(self, key: str, name: str) -> Path:
+        if self._main is None and (self.main_key is None or key == self.main_key):
+            self._main = key
+            path = self.state_file  # main workbook: the file Electron already reads
+        else:
+            base = self.state_file.stem + "." + slug(Path(name).stem)
+            path = self.state_file.with_name(base + ".json")
+            n = 2
+            while str(path) in self._files:
+                path = self.state_file.with_name(f"{base}.{n}.json")
+                n += 1
+        self._files[str(path)] = key
+        return path
+
+    def _release_main(self):
+        """The main workbook is gone: hand state_file to a survivor, or mark it stale."""
+        self._main = None
+        heir = min(self.slots) if self.slots and self.main_key is None else None
+        if heir is not None:
+            slot = self.slots[heir]
+            self._files.pop(str(slot.watcher.state_file), None)
+            slot.watcher.state_file = self._state_file_for(heir, slot.name)
+            slot.watcher.prev = None  # full INIT write into the new file on the next read
+            if slot.task is not None:
+                slot.task.cancel()
+            self._schedule(slot, 0.0)
+            print(f"[INFO] {slot.name} -> {self.state_file.name}")
+            return
+        if self.writer is not None:
+            self.writer.flush()  # a pending write of the old book must not land after the stale flag
+        if watcher.republish_stale(self.state_file) is not None:
+            print(f"[INFO] {self.state_file.name} marked stale (main workbook not watched)")
+
+    # -- workbooks ---------------------------------------------------------
+
+    def add(self, path: Path, backend: SheetBackend, discovered: bool = False) -> Optional[WorkbookSlot]:
+        key = self.key(path)
+        if key in self.slots:
+            return self.slots[key]
+        try:
+            backend.open()
+        except (SystemExit, Exception) as e:
+            print(f"[WARN] {Path(path).name}: cannot open ({e}), skipped")
+            return None
+        name = Path(path).name
+        poll = self.make_poll()
+        layouts = watcher.resolve_layout(backend, Path(path), self.sheet_name, self.rediscover)
+        layout = layouts.layout if layouts is not None else watcher.LAYOUT
+        w = watcher.Watcher(self.make_plan(layout.cells), poll, metrics=self.metrics, layout=layout)
+        if layouts is not None:
+            w.use_layouts(layouts)
+        w.label = name
+        watcher.setup_markets(w, backend, self.markets, self.market_cols)
+        w.writer = self.writer
+        w.session = getattr(backend, "session", None)
+        w.set_metrics_output(0, None)  # reported here, for all workbooks at once
+        w.state_file = self._state_file_for(key, name)
+        slot = WorkbookSlot(name, Path(path), backend, w, poll, discovered)
+        self.slots[key] = slot
+        print(f"[INFO] Watching {name} -> {w.state_file.name} ({backend.describe()})")
+        self._schedule(slot, 0.0)
+        return slot
+
+    def remove(self, slot: WorkbookSlot, reason: str):
+        key = self.key(slot.path)
+        if self.slots.pop(key, None) is None:
+            return
+        if slot.task is not None:
+            slot.task.cancel()
+        self._files.pop(str(slot.watcher.state_file), None)
+        try:
+            slot.backend.close()
+        except Exception:
+            pass
+        print(f"[INFO] Stopped watching {slot.name}: {reason}")
+        if key == self._main and reason != "shutdown":
+            self._release_main()
+
+    def discover(self):
+        """Add workbooks that appeared in the Running Object Table since the last scan."""
+        try:
+            found = running_workbooks()
+        except (SystemExit, Exception) as e:
+            print(f"[WARN] Workbook discovery failed: {e}")
+            return
+        # Path order, not ROT order: the same workbook becomes main on every start
+        for path, wb in sorted(found, key=lambda item: self.key(item[0])):
+            if self.key(path) not in self.slots:
+                self.add(path, ComBackend(path, self.sheet_name, workbook=wb, early=self.early,
+                                          retry_ms=self.retry_ms), discovered=True)
+
+    # -- polling -------------------------------------------------------------
+
+    def _schedule(self, slot: WorkbookSlot, delay: float):
+        slot.due = time.monotonic() + delay
+        slot.task = self.tasks.call_later(delay, self.poll, slot, name=f"poll {slot.name}")
+
+    def poll(self, slot: WorkbookSlot):
+        if self.key(slot.path) not in self.slots:
+            return
+        self.metrics.record_ns("lag", max(0, int((time.monotonic() - slot.due) * 1e9)))
+        try:
+            changed = slot.watcher.tick(slot.backend)
+            session = getattr(slot.backend, "session", None)
+            if session is not None and session.state == DISCONNECTED:
+                raise ConnectionError(session.last_error or "disconnected")
+        except Exception as e:
+            slot.errors += 1
+            print(f"[WARN] {slot.name}: read failed ({slot.errors}x): {e}")
+            if slot.discovered and slot.errors >= MAX_ERRORS:
+                self.remove(slot, "closed or unreachable")
+                return
+            self._schedule(slot, slot.poll.ceiling)
+            return
+        slot.errors = 0
+        slot.ticks += 1
+        self._window_ticks += 1
+        if changed:
+            slot.changes += 1
+            self._window_changes += 1
+        self._schedule(slot, slot.poll.update(changed))
+
+    def report(self):
+        """[METRICS] line for all workbooks + the index file, then slide the window."""
+        now = time.monotonic()
+        span = max(1e-9, now - self._window_at)
+        self.throughput = {"workbooks": len(self.slots),
+                           "ticksPerSec": round(self._window_ticks / span, 1),
+                           "changesPerSec": round(self._window_changes / span, 2)}
+        self._window_at, self._window_ticks, self._window_changes = now, 0, 0
+        writer = self.writer
+        line = " | ".join(part for part in (self.metrics.line(), writer.line() if writer is not None else "") if part)
+        t = self.throughput
+        print(f"{watcher.ts()} [METRICS] {t['workbooks']} workbooks, {t['ticksPerSec']} reads/s, "
+              f"{t['changesPerSec']} changes/s" + (f" | {line}" if line else ""))
+        self.write_index()
+        if self.metrics_file is not None:
+            watcher.write_json(self.metrics_file, {"ts": watcher.ts(), "throughput": t, "stages": self.stages()},
+                               writer)
+        self.metrics.rotate()
+        if writer is not None:
+            writer.rotate()
+
+    def stages(self) -> Dict[str, Any]:
+        out = self.metrics.summary()
+        if self.writer is not None:
+            out.update(self.writer.summary())
+        return out
+
+    def write_index(self):
+        payload = {"ts": watcher.ts(), "workbooks": [s.state() for s in self.slots.values()],
+                   "throughput": self.throughput, "stages": self.stages()}
+        if self.writer is not None:
+            payload["writer"] = self.writer.stats()
+            self.writer.offer(self.index_file, payload)
+        else:
+            watcher.replace_file(self.index_file, json.dumps(payload, ensure_ascii=False, indent=2))
+
+    def run(self, max_wait: float = watcher.POLL_MAX):
+        while True:
+            time.sleep(self.tasks.next_delay(max_wait))
+            self.tasks.run_due()
+
+
+def run_multi(args, state_file: Path, sheet_name: str):
+    """excel_watcher.py / excel_bridge.py with --workbooks."""
+    for flag, name in ((args.serve, "--serve"), (args.record, "--record"), (args.shm, "--shm"),
+                       (args.mode == "events", "--mode events")):
+        if flag:
+            print(f"[WARN] {name} is single-workbook only, ignored with --workbooks")
+    metrics = Metrics(watcher.METRICS_SLICES, MULTI_STAGES)
+    multi = MultiWatcher(
+        state_file, sheet_name,
+        make_plan=lambda cells: watcher.make_read_plan(cells, args.read_mode),
+        make_poll=lambda: watcher.AdaptiveScheduler(args.poll_min, args.poll_max, args.poll_burst, args.poll_backoff),
+        metrics=metrics)
+    multi.metrics_file = Path(args.metrics_file).expanduser() if args.metrics_file else None
+    multi.rediscover = args.rediscover
+    multi.early = args.com_binding == "early"
+    multi.retry_ms = args.com_retry_ms
+    multi.markets, multi.market_cols = args.markets, args.market_cols
+    if not args.sync_write:
+        multi.writer = StateWriter(args.write_interval, watcher.METRICS_SLICES).start()
+    paths = [p for p in args.workbooks if p.lower() != "auto"]
+    auto = len(paths) != len(args.workbooks)
+    main = args.file or (paths[0] if paths else None)
+    if args.file and MultiWatcher.key(Path(args.file).expanduser()) not in {
+            MultiWatcher.key(Path(p).expanduser()) for p in paths} and not auto:
+        paths.insert(0, args.file)  # the --file book is watched too
+    if main:
+        multi.main_key = MultiWatcher.key(Path(main).expanduser())
+        print(f"[INFO] {state_file.name}: {Path(main).name}")
+    if args.backend == "com":
+        # Bind explicit paths through the ROT too, so they may live in different Excel instances
+        try:
+            bound = {MultiWatcher.key(p): wb for p, wb in running_workbooks()}
+        except (SystemExit, Exception) as e:
+            print(f"[WARN] Running Object Table unavailable ({e}), using GetObject")
+            bound = {}
+        for p in paths:
+            path = Path(p).expanduser()
+            multi.add(path, ComBackend(path, sheet_name, workbook=bound.get(MultiWatcher.key(path)),
+                                        early=multi.early, retry_ms=multi.retry_ms))
+    else:
+        for p in paths:
+            path = Path(p).expanduser()
+            multi.add(path, make_backend(args.backend, path, sheet_name, multi.early, multi.retry_ms))
+    if auto:
+        if args.backend != "com":
+            print(f"[WARN] --workbooks auto needs the com backend, ignored for {args.backend}")
+        else:
+            multi.discover()
+            multi.tasks.call_every(args.discover_interval, multi.discover)
+    if not multi.slots and not auto:
+        print("[ERROR] No workbook could be opened.", flush=True)
+        raise SystemExit(watcher.EXIT_WORKBOOK_NOT_FOUND)
+    print(f"[INFO] Mode: multi-workbook poll ({len(multi.slots)} workbooks, "
+          f"{args.poll_min}s..{args.poll_max}s each)")
+    if args.metrics_interval > 0:
+        multi.tasks.call_every(args.metrics_interval, multi.report)
+    multi.write_index()
+    try:
+        multi.run(args.poll_max)
+    finally:
+        for slot in list(multi.slots.values()):
+            multi.remove(slot, "shutdown")
+        if multi.writer is not None:
+            multi.writer.close()
@@ -0,0 +1,397 @@
+"""Publish server for excel_watcher: pushes every state change to local subscribers.
+
+Endpoints (``--serve``):
+    tcp://127.0.0.1:8765        TCP socket
+    unix:///tmp/oddsmoni.sock   Unix socket (also a bare path on POSIX)
+    \\\\.\\pipe\\oddsmoni           Windows named pipe (pywin32)
+
+Wire format: one JSON document per line (UTF-8, ``\\n`` terminated). A new
+subscriber first receives the latest message (a fresh keyframe with
+``--wire delta``), then every change as it is detected. Each subscriber has its own bounded queue and writer thread, so a
+slow or stuck subscriber never blocks the watcher loop: when its queue is
+full the oldest queued message is dropped (and counted).
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAX_QUEUE = 256  # сообщений на подписчика, дальше выкидываем самые старые
+PIPE_BUFFER = 65536
+WIRE_VERSION = 1
+KEYFRAME_INTERVAL = 10.0  # секунд между полными кадрами в --wire delta
+
+
+def parse_endpoint(spec: str) -> Tuple[str, Any]:
+    """'tcp://host:port' -> ('tcp', (host, port)), pipe/unix paths -> (kind, path)."""
+    spec = spec.strip()
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        if not port.isdigit():
+            raise ValueError(f"Invalid tcp endpoint (expected tcp://host:port): {spec}")
+        return "tcp", (host or "127.0.0.1", int(port))
+    if spec.startswith("pipe://"):
+        return "pipe", "\\\\.\\pipe\\" + spec[len("pipe://"):]
+    if spec.lower().startswith("\\\\.\\pipe\\"):
+        return "pipe", spec
+    if spec.startswith("unix://"):
+        return "unix", spec[len("unix://"):]
+    return "unix", spec
+
+
+def encode_line(payload: Dict[str, Any]) -> bytes:
+    """Compact JSON + newline."""
+    return (json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+
+
+class DeltaEncoder:
+    """Versioned compact wire format (``--wire delta``): keyframes + deltas.
+
+    Keyframe (on start, on template change, every ``keyframe_interval`` s,
+    also without changes: the watcher checks ``keyframe_due`` every tick)::
+
+        {"v":1,"t":"k","seq":7,"ts":1760000000123,"cells":{...},
+         "mapCells":[["M44","N44"],...],"template":"LoL Bo3","maxMaps":3,...}
+
+    Delta (only the changed cells)::
+
+        {"v":1,"t":"d","seq":8,"ts":1760000000223,"c":{"M44":1.6}}
+
+    With ``--markets all`` keyframes also carry ``"markets"`` (every row of
+    every map block) and deltas ``"m"`` (changed rows only), both as
+    ``{"map": {"row": [values]}}`` (see excel_markets.py).
+
+    ``ts`` is epoch milliseconds. Consumers apply a delta only when its
+    ``seq`` is last+1, ignore ``seq <= last`` (already covered by a
+    keyframe) and on a gap send ``{"cmd":"resync"}``; the reply is a
+    keyframe with the current ``seq``.
+    """
+
+    def __init__(self, map_cells: List[Tuple[str, str]],
+                 describe: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 keyframe_interval: float = KEYFRAME_INTERVAL):
+        self.map_cells = [list(p) for p in map_cells]
+        self.describe = describe
+        self.keyframe_interval = keyframe_interval
+        self.markets: Optional[Callable[[], Dict[str, Any]]] = None  # full market rows for keyframes
+        self.seq = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self._last_key = 0.0
+        # (seq, ts_ms, cells) of the last message, replaced as one tuple so
+        # other threads (new subscriber, resync) always see a consistent view
+        self._snapshot: Optional[Tuple[int, int, Dict[str, Any]]] = None
+
+    def _keyframe(self, seq: int, ts_ms: int, cells: Dict[str, Any]) -> Dict[str, Any]:
+        msg = {"v": WIRE_VERSION, "t": "k", "seq": seq, "ts": ts_ms, "cells": cells, "mapCells": self.map_cells}
+        if self.describe is not None:
+            msg.update(self.describe(cells))
+        if self.markets is not None:
+            msg["markets"] = self.markets()
+        return msg
+
+    def encode(self, cells: Dict[str, Any], changed: Optional[Dict[str, Any]],
+               force_keyframe: bool = False, now: Optional[float] = None,
+               markets: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Next message for a new snapshot: keyframe when due, otherwise a delta."""
+        now = time.monotonic() if now is None else now
+        ts_ms = int(time.time() * 1000)
+        self.seq += 1
+        self._snapshot = (self.seq, ts_ms, cells)
+        if (force_keyframe or self.seq == 1 or not (changed or markets)
+                or now - self._last_key >= self.keyframe_interval):
+            self._last_key = now
+            self.keyframes += 1
+            return self._keyframe(self.seq, ts_ms, cells)
+        self.deltas += 1
+        msg = {"v": WIRE_VERSION, "t": "d", "seq": self.seq, "ts": ts_ms, "c": changed or {}}
+        if markets:
+            msg["m"] = markets
+        return msg
+
+    def keyframe_due(self, now: Optional[float] = None) -> bool:
+        """A periodic keyframe is owed (something was encoded and the interval has passed)."""
+        now = time.monotonic() if now is None else now
+        return self._snapshot is not None and now - self._last_key >= self.keyframe_interval
+
+    def keyframe_now(self) -> Optional[Dict[str, Any]]:
+        """Keyframe for the last encoded snapshot (same seq), for resync/new subscribers."""
+        snap = self._snapshot
+        if snap is None:
+            return None
+        return self._keyframe(*snap)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"wire": "delta", "seq": self.seq, "keyframes": self.keyframes, "deltas": self.deltas}
+
+
+class Subscriber:
+    """One connected client: bounded queue drained by its own writer thread."""
+
+    def __init__(self, server: "PublishServer", name: str, send: Callable[[bytes], None],
+                 close: Callable[[], None], recv: Optional[Callable[[int], bytes]] = None,
+                 max_queue: int = MAX_QUEUE):
+        self.server = server
+        self.name = name
+        self.sent = 0
+        self.dropped = 0
+        self._send = send
+        self._close = close
+        self._recv = recv
+        self._queue: deque = deque()
+        self._max_queue = max(1, max_queue)
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._writer, name=f"pub-w-{name}", daemon=True).start()
+        if recv is not None:
+            threading.Thread(target=self._reader, name=f"pub-r-{name}", daemon=True).start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def offer(self, data: bytes):
+        """Queue a message without blocking (drops the oldest one when full)."""
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._queue) >= self._max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(data)
+            self._cond.notify()
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                data = self._queue.popleft()
+            try:
+                self._send(data)
+                self.sent += 1
+            except Exception:
+                self.close()
+                return
+
+    def _reader(self):
+        """Detect disconnects and hand request lines to the server."""
+        buf = b""
+        while not self._closed:
+            try:
+                chunk = self._recv(4096)
+            except Exception:
+                chunk = b""
+            if not chunk:
+                self.close()
+                return
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                if line.strip():
+                    self.server.handle_request(self, line)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        try:
+            self._close()
+        except Exception:
+            pass
+        self.server.remove(self)
+
+
+class PublishServer:
+    """Accepts subscribers on a local endpoint and fans out published messages."""
+
+    def __init__(self, endpoint: str, max_queue: int = MAX_QUEUE):
+        self.endpoint = endpoint
+        self.kind, self.address = parse_endpoint(endpoint)
+        self.max_queue = max_queue
+        self.published = 0
+        self.on_request: Optional[Callable[[Subscriber, Dict[str, Any]], None]] = None
+        # First message for a new subscriber (default: the latest published one)
+        self.welcome: Optional[Callable[[], Optional[bytes]]] = None
+        self._subs: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._latest: Optional[bytes] = None
+        self._sock: Optional[socket.socket] = None
+        self._running = False
+        self._seq = 0
+
+    # -- lifecycle -----------------------------------------------------
+    def start(self) -> "PublishServer":
+        self._running = True
+        if self.kind == "pipe":
+            import win32pipe  # type: ignore  # noqa: F401  (fail early without pywin32)
+            target = self._accept_pipe
+        else:
+            self._sock = self._listen()
+            target = self._accept_socket
+        threading.Thread(target=target, name="pub-accept", daemon=True).start()
+        return self
+
+    def _listen(self) -> socket.socket:
+        if self.kind == "tcp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(self.address)
+        else:
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("Unix sockets are not supported here, use tcp:// or a \\\\.\\pipe\\ name")
+            try:
+                os.unlink(self.address)  # stale socket from a previous run
+            except OSError:
+                pass
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(self.address)
+        sock.listen(16)
+        return sock
+
+    @property
+    def bound_address(self):
+        """Actual address (useful with tcp port 0)."""
+        return self._sock.getsockname() if self._sock is not None else self.address
+
+    @property
+    def bound_endpoint(self) -> str:
+        """Bound endpoint (real port for tcp://...:0), as clients should connect to it."""
+        if self.kind == "tcp":
+            host, port = self.bound_address[:2]
+            return f"tcp://{host}:{port}"
+        return self.endpoint
+
+    def close(self):
+        self._running = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+            if self.kind == "unix":
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+        if self.kind == "pipe":
+            self._wake_pipe_accept()
+        for sub in self.subscribers():
+            sub.close()
+
+    # -- subscribers ---------------------------------------------------
+    def subscribers(self) -> List[Subscriber]:
+        with self._lock:
+            return list(self._subs)
+
+    def _add(self, sub: Subscriber):
+        # Under the lock so the welcome message is queued before any later publish
+        with self._lock:
+            if sub.closed:
+                return  # disconnected before it was registered
+            self._subs.append(sub)
+            first = self.welcome() if self.welcome is not None else self._latest
+            if first is not None:
+                sub.offer(first)
+
+    def remove(self, sub: Subscriber):
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def reply(self, sub: Subscriber, make: Callable[[], Optional[bytes]]):
+        """Queue ``make()`` for one subscriber in publish order (e.g. a resync keyframe).
+
+        Built under the lock publish_raw takes, like the welcome message: a
+        message encoded before it is published after it, never in between.
+        """
+        with self._lock:
+            data = make()
+            if data is not None:
+                sub.offer(data)
+
+    def handle_request(self, sub: Subscriber, line: bytes):
+        """Request line from a subscriber (JSON object); ignored unless on_request is set."""
+        if self.on_request is None:
+            return
+        try:
+            req = json.loads(line.decode("utf-8"))
+        except Exception:
+            return
+        if isinstance(req, dict):
+            self.on_request(sub, req)
+
+    def _accept_socket(self):
+        while self._running:
+            try:
+                conn, addr = self._sock.accept()
+            except OSError:
+                return
+            if self.kind == "tcp":
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._seq += 1
+            name = f"{addr[0]}:{addr[1]}" if isinstance(addr, tuple) else f"unix#{self._seq}"
+            self._add(Subscriber(self, name, conn.sendall, conn.close, conn.recv, self.max_queue))
+
+    def _accept_pipe(self):
+        import pywintypes  # type: ignore
+        import win32file  # type: ignore
+        import win32pipe  # type: ignore
+        while self._running:
+            handle = win32pipe.CreateNamedPipe(
+                self.address, win32pipe.PIPE_ACCESS_DUPLEX,
+                win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_WAIT,
+                win32pipe.PIPE_UNLIMITED_INSTANCES, PIPE_BUFFER, PIPE_BUFFER, 0, None)
+            try:
+                win32pipe.ConnectNamedPipe(handle, None)
+            except pywintypes.error:
+                pass  # ERROR_PIPE_CONNECTED: client connected between create and connect
+            if not self._running:
+                win32file.CloseHandle(handle)
+                return
+            self._seq += 1
+            # Synchronous pipe handles serialize ReadFile/WriteFile, so no reader
+            # thread here: disconnects surface as write errors.
+            self._add(Subscriber(
+                self, f"pipe#{self._seq}",
+                send=lambda data, h=handle: win32file.WriteFile(h, data),
+                close=lambda h=handle: win32file.CloseHandle(h),
+                max_queue=self.max_queue))
+
+    def _wake_pipe_accept(self):
+        try:
+            import win32file  # type: ignore
+            h = win32file.CreateFile(self.address, win32file.GENERIC_READ, 0, None,
+                                     win32file.OPEN_EXISTING, 0, None)
+            win32file.CloseHandle(h)
+        except Exception:
+            pass
+
+    # -- publishing ----------------------------------------------------
+    def publish(self, payload: Dict[str, Any]):
+        """Serialize once and queue for every subscriber (never blocks on I/O)."""
+        self.publish_raw(encode_line(payload))
+
+    def publish_raw(self, data: bytes):
+        with self._lock:
+            self._latest = data
+            self.published += 1
+            for sub in self._subs:
+                sub.offer(data)  # non-blocking
+
+    def stats(self) -> Dict[str, Any]:
+        subs = self.subscribers()
+        return {
+            "subscribers": len(subs),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subs),
+        }
@@ -0,0 +1,82 @@
+"""Replay recorded cell changes through the excel_watcher pipeline (no Excel needed).
+
+Запуск:
+    python excel_watcher.py --replay FILE [--speed N] [--state-file PATH] [--serve ...]
+
+--speed 1 = real time, N = N× faster, 0 = as fast as possible.
+
+FILE is either a tick ring / archive written by ``--record`` or JSONL, one
+tick per line::
+
+    {"t": 12.345, "cells": {"M44": 1.62, "N44": 2.3}}
+
+``t`` is seconds (any origin, only differences matter); ``cells`` holds the
+cells changed at that moment. The first line should be the full snapshot,
+later lines only the changes. ``excel_history.py PATH --format jsonl`` and
+``excel_bench.py`` traffic files use the same format.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+from excel_backends import MemoryBackend
+from excel_history import MAGIC, TickLog
+
+
+def load_ticks(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """(t seconds, changed cells) per tick from JSONL or a tick ring file."""
+    with open(path, "rb") as f:
+        is_ring = f.read(len(MAGIC)) == MAGIC
+    if is_ring:
+        yield from _ring_ticks(TickLog(Path(path)))
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            yield float(rec.get("t", 0.0)), rec.get("cells") or {}
+
+
+def _ring_ticks(log: TickLog) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    cur_t, cells = None, {}
+    for t_ns, cell, value in log.records():
+        if t_ns != cur_t and cells:
+            yield cur_t / 1e9, cells
+            cells = {}
+        cur_t = t_ns
+        cells[cell] = value
+    if cells:
+        yield cur_t / 1e9, cells
+
+
+def run_replay(watcher, ticks, speed: float = 1.0) -> Dict[str, Any]:
+    """Feed ticks into a MemoryBackend and run ``watcher.tick`` on it (same path as COM reads).
+
+    Returns throughput stats: ticks fed, ticks published, seconds, ticks/s.
+    """
+    backend = MemoryBackend()
+    fed = published = 0
+    start = time.perf_counter()
+    t_first = None
+    for t, cells in ticks:
+        if speed > 0:
+            if t_first is None:
+                t_first = t
+            delay = start + (t - t_first) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        backend.update(cells)
+        fed += 1
+        if watcher.tick(backend):
+            published += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "ticks": fed,
+        "published": published,
+        "seconds": round(elapsed, 3),
+        "ticksPerSec": round(fed / elapsed, 1) if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,91 @@
+"""Single-thread deadline scheduler for the Excel COM thread (no sleeps).
+
+Все отложенные и периодические действия (кнопка "вверх" через 50 мс,
+Send Update после Suspend, запись статуса раз в секунду, ...) лежат в куче
+по дедлайнам. Главный цикл блокируется на очереди команд ровно до
+ближайшего дедлайна, поэтому хоткей никогда не ждёт чужого ``time.sleep``:
+
+    sched = TaskScheduler()
+    sched.call_every(1.0, write_status)
+    sched.call_later(0.05, button_up)
+    while running:
+        process_commands(block_timeout=sched.next_delay(MAX_WAIT))
+        sched.run_due()
+"""
+
+import heapq
+import itertools
+import time
+from typing import Any, Callable, List, Optional
+
+
+class Task:
+    __slots__ = ("deadline", "fn", "args", "interval", "cancelled", "name")
+
+    def __init__(self, deadline: float, fn: Callable, args: tuple, interval: Optional[float], name: str):
+        self.deadline = deadline
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.cancelled = False
+        self.name = name
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TaskScheduler:
+    """Heap of (deadline, seq, Task); run on the thread that owns the COM objects."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List[Any] = []
+        self._seq = itertools.count()
+        self.runs = 0
+        self.errors = 0
+
+    def _push(self, task: Task) -> Task:
+        heapq.heappush(self._heap, (task.deadline, next(self._seq), task))
+        return task
+
+    def call_later(self, delay: float, fn: Callable, *args, name: str = "") -> Task:
+        return self._push(Task(self.clock() + delay, fn, args, None, name or getattr(fn, "__name__", "")))
+
+    def call_every(self, interval: float, fn: Callable, *args, first: Optional[float] = None, name: str = "") -> Task:
+        """Run ``fn`` every ``interval`` seconds (first run after ``first``, default ``interval``)."""
+        delay = interval if first is None else first
+        return self._push(Task(self.clock() + delay, fn, args, interval, name or getattr(fn, "__name__", "")))
+
+    def next_delay(self, max_wait: float) -> float:
+        """Seconds until the next deadline, capped at ``max_wait`` (0 if overdue)."""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return max_wait
+        return min(max_wait, max(0.0, self._heap[0][0] - self.clock()))
+
+    def run_due(self) -> int:
+        """Run every task whose deadline has passed; returns how many ran."""
+        ran = 0
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._heap)
+            if task.cancelled:
+                continue
+            try:
+                task.fn(*task.args)
+            except Exception as e:
+                self.errors += 1
+                print(f"[X] Scheduled task {task.name} failed: {e}")
+            ran += 1
+            if task.interval is not None and not task.cancelled:
+                # Next slot after now (a slow run does not cause a catch-up burst)
+                task.deadline += task.interval
+                if task.deadline <= now:
+                    task.deadline = now + task.interval
+                self._push(task)
+        self.runs += ran
+        return ran
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, t in self._heap if not t.cancelled)
@@ -0,0 +1,316 @@
+"""COM session for excel_watcher / excel_bridge / excel_hotkey_controller.
+
+Раньше любой сбой COM-вызова превращался в ``None`` в ячейке (watcher
+видел фантомное изменение и дважды переписывал current_state.json), а
+закрытый или перезапущенный Excel завершал процесс через ``SystemExit``, и
+Electron перезапускал Python и заново ставил хуки. Здесь:
+
+    - IMessageFilter на COM-потоке: вызов, отклонённый занятым Excel
+      (правка ячейки, диалог - SERVERCALL_RETRYLATER), COM повторяет сам с
+      растущей паузой RETRY_MIN_MS..RETRY_MAX_MS, пока не пройдёт
+      ``retry_ms`` (--com-retry-ms); короткие занятости так и не доходят
+      до Python;
+    - если Excel занят дольше (или ответил VBA_E_IGNORE), чтение
+      прерывается: ReadPlan отдаёт последние прочитанные значения, а
+      ячейки помечаются устаревшими (``stale``) вместо ``None``;
+    - Excel закрыт / перезапущен / книга закрыта (RPC_S_SERVER_UNAVAILABLE,
+      RPC_E_DISCONNECTED, ...): сессия отпускает объекты и переподключается
+      сама (GetObject + книга по пути, затем Running Object Table) с паузой
+      RECONNECT_MIN..RECONNECT_MAX; подписчики ``on_attach`` (контроллер
+      хоткеев, события книги) получают новые объекты;
+    - ``stats()`` - состояние и счётчики (retries / rejected / disconnects /
+      reconnects), в current_state.json и hotkey_status.json под ``session``.
+
+Коды выхода EXIT_* остаются только для первого подключения при старте.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from excel_backends import (attach_excel_app, early_bound, excel_app, find_workbook, norm_path, open_workbook,
+                            running_workbooks)
+
+RETRY_BUDGET_MS = 1000  # сколько COM повторяет отклонённый вызов, прежде чем вернуть ошибку
+RETRY_MIN_MS = 100      # RetryRejectedCall: меньше 100 значит "сразу", без паузы
+RETRY_MAX_MS = 400
+RECONNECT_MIN = 0.5     # секунд между попытками переподключения (растёт x2)
+RECONNECT_MAX = 5.0
+
+# IMessageFilter return values
+SERVERCALL_ISHANDLED = 0
+SERVERCALL_RETRYLATER = 2
+PENDINGMSG_WAITDEFPROCESS = 2
+
+CONNECTED = "connected"
+BUSY = "busy"
+DISCONNECTED = "disconnected"
+
+
+def _hr(code: int) -> int:
+    """HRESULT as pywintypes.com_error reports it (signed 32-bit)."""
+    return code - (1 << 32) if code & 0x80000000 else code
+
+
+DISP_E_EXCEPTION = _hr(0x80020009)
+# Excel is there but not taking calls right now
+BUSY_HRESULTS = {
+    _hr(0x80010001),  # RPC_E_CALL_REJECTED
+    _hr(0x8001010A),  # RPC_E_SERVERCALL_RETRYLATER
+    _hr(0x800AC472),  # VBA_E_IGNORE (cell edit mode)
+}
+# Excel (or the workbook) is gone: the objects we hold are dead
+GONE_HRESULTS = {
+    _hr(0x800706BA),  # RPC_S_SERVER_UNAVAILABLE
+    _hr(0x800706BE),  # RPC_S_CALL_FAILED
+    _hr(0x80010108),  # RPC_E_DISCONNECTED
+    _hr(0x80010007),  # RPC_E_SERVER_DIED_DNE
+    _hr(0x80010012),  # RPC_E_SERVER_DIED
+    _hr(0x800401FD),  # CO_E_OBJNOTCONNECTED
+}
+
+
+def com_hresult(e: BaseException) -> Optional[int]:
+    """HRESULT of a pywintypes.com_error (the inner scode for DISP_E_EXCEPTION)."""
+    args = getattr(e, "args", ())
+    if not args or not isinstance(args[0], int):
+        return None
+    hr = args[0]
+    if hr == DISP_E_EXCEPTION and len(args) > 2 and args[2] and len(args[2]) > 5 and args[2][5]:
+        return args[2][5]
+    return hr
+
+
+def error_kind(e: BaseException) -> str:
+    """BUSY / DISCONNECTED for session-level COM failures, "" for anything else (bad range, ...)."""
+    hr = com_hresult(e)
+    if hr in BUSY_HRESULTS:
+        return BUSY
+    if hr in GONE_HRESULTS:
+        return DISCONNECTED
+    return ""
+
+
+def retry_delay_ms(elapsed_ms: int, budget_ms: int = RETRY_BUDGET_MS) -> int:
+    """RetryRejectedCall answer: wait about as long as already waited (doubling), -1 once over budget."""
+    if elapsed_ms >= budget_ms:
+        return -1
+    return min(RETRY_MAX_MS, max(RETRY_MIN_MS, elapsed_ms))
+
+
+class BusyMessageFilter:
+    """IMessageFilter: COM retries calls a busy Excel rejects, for up to ``budget_ms``."""
+
+    _public_methods_ = ["HandleInComingCall", "RetryRejectedCall", "MessagePending"]
+
+    def __init__(self, budget_ms: int = RETRY_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.retries = 0   # rejected calls COM waited on and sent again
+        self.gave_up = 0   # rejected calls still failing after the budget
+
+    def HandleInComingCall(self, dwCallType, htaskCaller, dwTickCount, lpInterfaceInfo):
+        return SERVERCALL_ISHANDLED
+
+    def RetryRejectedCall(self, htaskCallee, dwTickCount, dwRejectType):
+        if dwRejectType != SERVERCALL_RETRYLATER:
+            return -1  # SERVERCALL_REJECTED: retrying will not help
+        delay = retry_delay_ms(dwTickCount, self.budget_ms)
+        if delay < 0:
+            self.gave_up += 1
+        else:
+            self.retries += 1
+        return delay
+
+    def MessagePending(self, htaskCallee, dwTickCount, dwPendingType):
+        return PENDINGMSG_WAITDEFPROCESS
+
+
+_thread_filter = threading.local()
+
+
+def install_message_filter(budget_ms: int = RETRY_BUDGET_MS) -> Optional[BusyMessageFilter]:
+    """Register BusyMessageFilter on this (STA) thread once; None if pywin32 cannot."""
+    current = getattr(_thread_filter, "filter", None)
+    if current is not None:
+        current.budget_ms = budget_ms
+        return current
+    try:
+        import pythoncom  # type: ignore
+        from win32com.server.util import wrap  # type: ignore
+        impl = BusyMessageFilter(budget_ms)
+        impl._com_interfaces_ = [pythoncom.IID_IMessageFilter]
+        pythoncom.CoRegisterMessageFilter(wrap(impl, pythoncom.IID_IMessageFilter))
+    except Exception as e:
+        print(f"[WARN] COM message filter not installed ({e}): busy Excel calls fail without retry")
+        return None
+    _thread_filter.filter = impl
+    return impl
+
+
+class ComSession:
+    """Workbook + sheet of a running Excel that survives a busy or restarted Excel.
+
+    ``app`` / ``workbook`` / ``sheet`` are None while disconnected. Callers
+    report each COM failure with ``failed(e)`` (or a whole read with
+    ``check``) and call ``ensure()`` before using the objects.
+    """
+
+    def __init__(self, path: Optional[Path], sheet_name: str, early: bool = True,
+                 retry_ms: int = RETRY_BUDGET_MS, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock  # reconnect throttle / state times (excel_bench drives a virtual one)
+        self.path = path  # None: set by the owner once it knows the workbook (ActiveWorkbook)
+        self.sheet_name = sheet_name
+        self.early = early
+        self.retry_ms = retry_ms
+        self.app = None
+        self.workbook = None
+        self.sheet = None
+        self.binding = ""
+        self.state = DISCONNECTED
+        self.filter: Optional[BusyMessageFilter] = None
+        # called with the session after every reconnect (objects changed)
+        self.on_attach: List[Callable[["ComSession"], None]] = []
+        self.rejected = 0      # reads cut short by a busy Excel
+        self.disconnects = 0
+        self.reconnects = 0
+        self.attempts = 0      # reconnect attempts
+        self.last_error = ""
+        self.since = self.clock()  # start of the current state
+        self._retry_at = 0.0
+        self._retry_delay = RECONNECT_MIN
+
+    @property
+    def available(self) -> bool:
+        return self.state == CONNECTED
+
+    def install_filter(self):
+        if self.filter is None:
+            self.filter = install_message_filter(self.retry_ms)
+
+    def open(self, workbook=None) -> "ComSession":
+        """First attach (startup): exits with the EXIT_* codes like before."""
+        self.install_filter()
+        if workbook is not None:
+            app = workbook.Application
+        else:
+            app = attach_excel_app()
+            workbook = find_workbook(app, self.path)
+        try:
+            self.bind(app, workbook)
+        except SystemExit:
+            raise
+        except Exception:
+            raise SystemExit(f"Sheet '{self.sheet_name}' not found.")
+        return self
+
+    def bind(self, app, workbook):
+        """Use ``workbook`` (of ``app``) from now on."""
+        sheet = workbook.Worksheets(self.sheet_name)
+        bound = early_bound(sheet) if self.early else sheet
+        self.app, self.workbook, self.sheet = app, workbook, bound
+        self.binding = "dynamic" if bound is sheet else "early-bound"
+        self._set_state(CONNECTED)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self.since = self.clock()
+
+    def ok(self):
+        """A call went through: a busy Excel is answering again."""
+        if self.state == BUSY:
+            self._set_state(CONNECTED)
+            print(f"[INFO] Excel is answering again ({self.name})")
+
+    def interrupts(self, e: BaseException) -> bool:
+        """Stop the current read on this error (further calls would fail or wait the same way)."""
+        return error_kind(e) != ""
+
+    def check(self, error: Optional[BaseException]):
+        """Result of one read: ``error`` is the last exception it hit, None if every call succeeded."""
+        if error is None or not error_kind(error):
+            self.ok()
+        else:
+            self.failed(error)
+
+    def failed(self, e: BaseException) -> str:
+        """Record a COM failure; returns its kind (BUSY / DISCONNECTED / "")."""
+        kind = error_kind(e)
+        if not kind:
+            return kind
+        self.last_error = str(e)
+        if kind == BUSY:
+            self.rejected += 1
+            if self.state == CONNECTED:
+                self._set_state(BUSY)
+                print(f"[WARN] Excel is busy ({self.name}): keeping the last values until it answers")
+        elif self.state != DISCONNECTED:
+            self.disconnects += 1
+            self.app = self.workbook = self.sheet = None
+            self._set_state(DISCONNECTED)
+            self._retry_delay = RECONNECT_MIN
+            self._retry_at = self.clock() + RECONNECT_MIN
+            print(f"[WARN] Excel connection lost ({self.name}): {e}; reconnecting")
+        return kind
+
+    def ensure(self) -> bool:
+        """True if the objects are usable (reconnects when disconnected and the retry is due)."""
+        if self.state != DISCONNECTED:
+            return True
+        return self.reconnect()
+
+    def reconnect(self, now: Optional[float] = None) -> bool:
+        """One attach attempt (throttled): the running Excel, then the Running Object Table."""
+        now = self.clock() if now is None else now
+        if now < self._retry_at:
+            return False
+        self.attempts += 1
+        try:
+            workbook = None
+            app = excel_app()
+            if app is not None:
+                workbook = open_workbook(app, self.path)
+            if workbook is None:
+                workbook = self._rot_workbook()
+                app = workbook.Application if workbook is not None else None
+            if workbook is None:
+                raise LookupError("Excel not running" if app is None else "workbook not open")
+            self.bind(app, workbook)
+        except Exception as e:
+            self.last_error = str(e)
+            self._retry_at = now + self._retry_delay
+            self._retry_delay = min(RECONNECT_MAX, self._retry_delay * 2)
+            return False
+        self.reconnects += 1
+        self._retry_delay = RECONNECT_MIN
+        print(f"[INFO] Reattached to {self.name} ({self.attempts} attempts so far, binding {self.binding})")
+        for callback in self.on_attach:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"[WARN] Reattach handler failed: {e}")
+        return True
+
+    def _rot_workbook(self):
+        """The workbook in any Excel instance (GetObject only sees one)."""
+        target = norm_path(self.path)
+        for path, wb in running_workbooks():
+            if norm_path(path) == target:
+                return wb
+        return None
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name if self.path else "workbook"
+
+    def stats(self) -> Dict[str, Any]:
+        f = self.filter
+        out = {"state": self.state, "forS": round(self.clock() - self.since, 1),
+               "retries": f.retries if f is not None else 0, "rejected": self.rejected,
+               "disconnects": self.disconnects, "reconnects": self.reconnects, "attempts": self.attempts}
+        if f is None:
+            out["filter"] = False
+        if self.last_error:
+            out["lastError"] = self.last_error
+        return out
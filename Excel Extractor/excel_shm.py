@@ -0,0 +1,292 @@
+"""Shared-memory snapshot of the watcher state (``excel_watcher.py --shm PATH``).
+
+current_state.json на каждой проверке надо открыть, прочитать целиком и
+разобрать JSON, даже если ничего не изменилось. Здесь то же состояние
+(шаблон, статус, команды, odds карт) лежит в файле фиксированного размера,
+отображённом в память:
+
+    - писатель (watcher, поток опроса) на каждое изменение: seq += 1
+      (нечётный = идёт запись), одна копия собранного заранее тела в mmap,
+      seq += 1 (чётный). Без системных вызовов и без JSON;
+    - читатель проверяет изменение чтением 8 байт seq (O(1), без syscall,
+      если файл отображён), а снимок копирует целиком и принимает его, только
+      если seq до и после копии одинаковый и чётный (seqlock), иначе
+      повторяет;
+    - ``ShmReader`` - эталонный читатель, ``python excel_shm.py PATH
+      [--watch]`` печатает снимки как JSON.
+
+Рынки --markets all сюда не попадают (переменный размер): только то, что
+есть в current_state.json кроме ``markets`` и диагностики.
+
+Layout (little endian, SIZE = 672 bytes):
+    header, 64 bytes:
+        0   8s   magic b"OMSNAP01"
+        8   I    version
+        12  I    total size (672)
+        16  Q    seq: even = stable, odd = write in progress
+        24  q    wall-clock ns of the last write
+        32  I    writer pid
+        36  H    flags: bit 0 = writer live (cleared on close)
+        38  H    maxMaps (from the template: Bo1/Bo3/Bo5)
+        40  H    map count (used slots)
+        42  H    map slots (8)
+        44  20x  reserved
+    text, 224 bytes (UTF-8, NUL padded, truncated):
+        64  64s  template
+        128 32s  status
+        160 64s  team1Name
+        224 64s  team2Name
+    map slot x 8, 48 bytes each, from offset 288:
+        +0  B    map number (0 = unused slot)
+        +1  B    side1 type: 0 None, 1 float, 2 bool, 3 str, 4 other
+        +2  B    side2 type
+        +3  5x
+        +8  Q    seq of the write that last changed this map
+        +16 d    side1 numeric value (float / bool)
+        +24 d    side2 numeric value
+        +32 8s   side1 text (str / other types)
+        +40 8s   side2 text
+
+Порядок чтения для других языков (Electron): s1 = seq @16; если нечётный -
+повторить; скопировать SIZE байт; s2 = seq @16; принять копию, если
+s1 == s2 и seq в копии == s1. Node без нативного модуля mmap не умеет:
+там проверка - ``fs.readSync(fd, buf, 0, 24, 0)`` (один pread на 24 байта
+вместо чтения и разбора всего JSON), снимок - один pread на SIZE байт.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from excel_history import T_BOOL, T_FLOAT, T_NONE, T_OTHER, T_STR
+
+MAGIC = b"OMSNAP01"
+VERSION = 1
+PREFIX = struct.Struct("<8sIIQ")        # magic, version, size, seq (written outside the seqlock)
+HEAD = struct.Struct("<qIHHHH20x")     # wall ns, pid, flags, maxMaps, map count, map slots
+HEADER = struct.Struct("<8sIIQqIHHHH20x")
+TEXT = struct.Struct("<64s32s64s64s")
+MAP_SLOT = struct.Struct("<BBB5xQdd8s8s")
+MAP_SLOTS = 8
+SEQ_OFFSET = 16
+BODY_OFFSET = PREFIX.size  # everything from here on is covered by the seqlock
+TEXT_OFFSET = HEADER.size
+MAPS_OFFSET = TEXT_OFFSET + TEXT.size
+SIZE = MAPS_OFFSET + MAP_SLOTS * MAP_SLOT.size
+FLAG_LIVE = 1
+READ_RETRIES = 1000
+
+_SEQ = struct.Struct("<Q")
+
+
+def _encode(value: Any) -> Tuple[int, float, bytes]:
+    if value is None:
+        return T_NONE, 0.0, b""
+    if isinstance(value, bool):
+        return T_BOOL, 1.0 if value else 0.0, b""
+    if isinstance(value, (int, float)):
+        return T_FLOAT, float(value), b""
+    if isinstance(value, str):
+        return T_STR, 0.0, value.encode("utf-8")[:8]
+    return T_OTHER, 0.0, str(value).encode("utf-8")[:8]
+
+
+def _decode(kind: int, num: float, text: bytes) -> Any:
+    if kind == T_FLOAT:
+        return num
+    if kind == T_BOOL:
+        return bool(num)
+    if kind in (T_STR, T_OTHER):
+        return _text(text)
+    return None
+
+
+def _text(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode("utf-8", errors="ignore")
+
+
+class ShmSnapshot:
+    """Seqlock-protected fixed-layout snapshot in a memory-mapped file (writer side)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.writes = 0
+        self._body = bytearray(SIZE - BODY_OFFSET)  # built in full before the seq bump
+        self._maps: Dict[int, Tuple[Any, Any, int]] = {}  # map -> (side1, side2, seq of last change)
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._seq = 0
+        self._open()
+
+    def _open(self):
+        # Reuse a file of the right size: a reader may still have it mapped (no truncate on Windows)
+        reuse = self.path.exists() and self.path.stat().st_size == SIZE
+        if not reuse:
+            with self.path.open("wb") as f:
+                f.truncate(SIZE)
+        self._file = self.path.open("r+b")
+        self._mm = mmap.mmap(self._file.fileno(), SIZE)
+        magic, version, size, seq = PREFIX.unpack_from(self._mm, 0)
+        if reuse and magic == MAGIC and version == VERSION and size == SIZE:
+            self._seq = seq + (seq & 1)  # continue the sequence so readers see the restart as a change
+        PREFIX.pack_into(self._mm, 0, MAGIC, VERSION, SIZE, self._seq)
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def write(self, template: str, status: str, team1: str, team2: str, max_maps: int,
+              maps: Sequence[Tuple[int, Any, Any]], live: bool = True):
+        """Publish one snapshot: ``maps`` = [(map number, side1, side2), ...] (at most MAP_SLOTS used)."""
+        mm = self._mm
+        if mm is None:
+            return
+        seq = self._seq + 2
+        body = self._body
+        used = min(len(maps), MAP_SLOTS)
+        HEAD.pack_into(body, 0, time.time_ns(), os.getpid(), FLAG_LIVE if live else 0, max_maps, used, MAP_SLOTS)
+        TEXT.pack_into(body, TEXT_OFFSET - BODY_OFFSET, template.encode("utf-8")[:64],
+                       status.encode("utf-8")[:32], team1.encode("utf-8")[:64], team2.encode("utf-8")[:64])
+        off = MAPS_OFFSET - BODY_OFFSET
+        for i in range(MAP_SLOTS):
+            if i >= used:
+                MAP_SLOT.pack_into(body, off, 0, T_NONE, T_NONE, 0, 0.0, 0.0, b"", b"")
+            else:
+                n, side1, side2 = maps[i]
+                last = self._maps.get(n)
+                changed_at = seq if last is None or last[0] != side1 or last[1] != side2 else last[2]
+                self._maps[n] = (side1, side2, changed_at)
+                k1, v1, t1 = _encode(side1)
+                k2, v2, t2 = _encode(side2)
+                MAP_SLOT.pack_into(body, off, n, k1, k2, changed_at, v1, v2, t1, t2)
+            off += MAP_SLOT.size
+        # seqlock: odd while the body is copied in, even once it is complete
+        _SEQ.pack_into(mm, SEQ_OFFSET, seq - 1)
+        mm[BODY_OFFSET:SIZE] = body
+        _SEQ.pack_into(mm, SEQ_OFFSET, seq)
+        self._seq = seq
+        self.writes += 1
+
+    def close(self):
+        """Clear the live flag (readers keep the last values) and unmap."""
+        mm = self._mm
+        if mm is None:
+            return
+        body = self._body
+        head = list(HEAD.unpack_from(body, 0))
+        head[2] = 0
+        HEAD.pack_into(body, 0, *head)
+        seq = self._seq + 2
+        _SEQ.pack_into(mm, SEQ_OFFSET, seq - 1)
+        mm[BODY_OFFSET:BODY_OFFSET + HEAD.size] = body[:HEAD.size]
+        _SEQ.pack_into(mm, SEQ_OFFSET, seq)
+        self._seq = seq
+        mm.flush()
+        mm.close()
+        self._mm = None
+        self._file.close()
+        self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"seq": self._seq, "writes": self.writes}
+
+
+class ShmReader:
+    """Reader for a --shm file: O(1) change check, consistent copies via the seqlock."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), SIZE, access=mmap.ACCESS_READ)
+        magic, version, size, _ = PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or size != SIZE:
+            self.close()
+            raise ValueError(f"Not a watcher snapshot file: {path}")
+        self.retries = 0  # copies thrown away because a write overlapped them
+
+    def seq(self) -> int:
+        """Current sequence number (odd while a write is in progress)."""
+        return _SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+
+    def changed(self, since: int) -> bool:
+        return self.seq() != since
+
+    def read_raw(self, retries: int = READ_RETRIES) -> Optional[Tuple[int, bytes]]:
+        """(seq, SIZE bytes) of one consistent snapshot; None if every attempt overlapped a write."""
+        mm = self._mm
+        for attempt in range(retries):
+            s1 = _SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if not s1 & 1:
+                blob = mm[:SIZE]
+                if _SEQ.unpack_from(mm, SEQ_OFFSET)[0] == s1 and _SEQ.unpack_from(blob, SEQ_OFFSET)[0] == s1:
+                    return s1, blob
+            self.retries += 1
+            if attempt & 63 == 63:
+                time.sleep(0)  # let a descheduled writer finish
+        return None
+
+    def read(self, retries: int = READ_RETRIES) -> Optional[Dict[str, Any]]:
+        """Decoded snapshot (keys as in current_state.json), None if no consistent copy was made."""
+        raw = self.read_raw(retries)
+        return decode(raw[1]) if raw is not None else None
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def decode(blob: bytes) -> Dict[str, Any]:
+    """Snapshot bytes -> dict with the current_state.json field names."""
+    seq = _SEQ.unpack_from(blob, SEQ_OFFSET)[0]
+    wall_ns, pid, flags, max_maps, count, _ = HEAD.unpack_from(blob, BODY_OFFSET)
+    template, status, team1, team2 = TEXT.unpack_from(blob, TEXT_OFFSET)
+    maps = {}
+    for i in range(min(count, MAP_SLOTS)):
+        n, k1, k2, changed_at, v1, v2, t1, t2 = MAP_SLOT.unpack_from(blob, MAPS_OFFSET + i * MAP_SLOT.size)
+        maps[str(n)] = {"side1": _decode(k1, v1, t1), "side2": _decode(k2, v2, t2), "changedSeq": changed_at}
+    return {"seq": seq, "ts_ns": wall_ns, "pid": pid, "live": bool(flags & FLAG_LIVE),
+            "template": _text(template), "status": _text(status), "team1Name": _text(team1),
+            "team2Name": _text(team2), "maxMaps": max_maps, "maps": maps}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Print the excel_watcher --shm snapshot")
+    p.add_argument("path", help="Snapshot file (excel_watcher.py --shm PATH)")
+    p.add_argument("--watch", action="store_true", help="Print every new snapshot (one JSON line each)")
+    p.add_argument("--interval", type=float, default=0.01, help="--watch: seconds between seq checks")
+    args = p.parse_args(argv)
+
+    reader = ShmReader(Path(args.path))
+    try:
+        if not args.watch:
+            json.dump(reader.read(), sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return
+        seen = None
+        while True:
+            seq = reader.seq()
+            if seq != seen and not seq & 1:
+                snap = reader.read()
+                if snap is not None:
+                    seen = snap["seq"]
+                    sys.stdout.write(json.dumps(snap, ensure_ascii=False) + "\n")
+                    sys.stdout.flush()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""template_sync.json in memory: current map / template pushed by file events.
+
+Electron (excelWatcher.js) переписывает template_sync.json при смене карты
+или шаблона через ``fs.writeFileSync`` (truncate + write, не атомарно). Вместо
+чтения файла на каждый хоткей:
+
+    - watchdog observer на папке файла; событие откладывает чтение на
+      ``debounce`` секунд (серия событий одной записи = одно чтение);
+    - недописанный / битый JSON не затирает последние значения, чтение
+      повторяется ещё через ``debounce``;
+    - если watchdog не установлен или observer умер - фоновая проверка
+      mtime/size раз в ``poll`` секунд;
+    - ``map`` / ``template`` / ``data`` читаются из памяти, без файлового I/O.
+
+    sync = TemplateSync(SYNC_FILE).start()
+    sync.map        # int или None
+    sync.template   # str
+    sync.close()
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+    from watchdog.observers import Observer  # type: ignore
+except ImportError:
+    FileSystemEventHandler = object  # type: ignore
+    Observer = None  # type: ignore
+
+DEBOUNCE = 0.05   # секунд тишины после события до чтения
+POLL = 0.25       # интервал stat-проверки без watchdog
+HEALTH = 1.0      # как часто проверять, жив ли observer
+RETRIES = 3       # повторных чтений битого JSON до следующего изменения файла
+
+
+class _SyncEvents(FileSystemEventHandler):
+    def __init__(self, owner: "TemplateSync"):
+        self.owner = owner
+
+    def on_any_event(self, event):
+        name = self.owner.path.name
+        paths = (getattr(event, "src_path", ""), getattr(event, "dest_path", ""))
+        if any(p and Path(p).name == name for p in paths):
+            self.owner.notify()
+
+
+class TemplateSync:
+    """Latest parsed template_sync.json, refreshed in the background."""
+
+    def __init__(self, path: Path, debounce: float = DEBOUNCE, poll: float = POLL):
+        self.path = Path(path)
+        self.debounce = debounce
+        self.poll = poll
+        self.data: Dict[str, Any] = {}
+        self.version = 0       # +1 на каждое применённое изменение
+        self.events = 0        # событий от watchdog
+        self.reloads = 0       # успешных чтений
+        self.bad_reads = 0     # недописанный / битый JSON
+        self.mode = "stat"     # "watchdog" | "stat"
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._sig: Optional[Tuple[int, int]] = None
+        self._retries = 0
+        self._due: Optional[float] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- values (no I/O) ------------------------------------------------------
+
+    @property
+    def map(self) -> Optional[int]:
+        value = self.data.get("map")
+        return value if isinstance(value, int) else None
+
+    @property
+    def template(self) -> str:
+        value = self.data.get("template")
+        return str(value).strip() if value else ""
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self) -> "TemplateSync":
+        """Initial read + background watch (no-op if already running)."""
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._load()
+        self._start_observer()
+        self._thread = threading.Thread(target=self._run, name="template-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+                self._observer.join(timeout=1.0)
+            except Exception:
+                pass
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _start_observer(self):
+        if Observer is None:
+            self.mode = "stat"
+            return
+        try:
+            observer = Observer()
+            observer.schedule(_SyncEvents(self), str(self.path.parent), recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+            self.mode = "watchdog"
+        except Exception as e:
+            print(f"[WARN] template_sync watch failed ({e}), falling back to mtime checks")
+            self._observer = None
+            self.mode = "stat"
+
+    def notify(self):
+        """File event (watchdog thread): read after ``debounce`` seconds of quiet."""
+        self.events += 1
+        self._due = time.monotonic() + self.debounce
+        self._wake.set()
+
+    # -- background thread ----------------------------------------------------
+
+    def _run(self):
+        next_check = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = self._due
+            if due is not None and now >= due:
+                self._due = None
+                self._load()
+                continue
+            if self.mode == "watchdog" and now >= next_check:
+                next_check = now + HEALTH
+                if self._observer is None or not self._observer.is_alive():
+                    print("[WARN] template_sync observer stopped, falling back to mtime checks")
+                    self._observer = None
+                    self.mode = "stat"
+            if self.mode == "stat":
+                self._check_stat()
+            timeout = self.poll if self.mode == "stat" else HEALTH
+            if due is not None:
+                timeout = min(timeout, max(0.0, due - now))
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _check_stat(self):
+        if self._stat() != self._sig and self._due is None:
+            self._due = time.monotonic() + self.debounce
+
+    def _load(self):
+        sig = self._stat()
+        if sig is None:
+            self._sig = None
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if not isinstance(data, dict):
+                raise ValueError("not an object")
+        except (OSError, ValueError):
+            # Electron is mid-write: keep the last values, try again shortly
+            self.bad_reads += 1
+            self._sig = sig
+            if self._retries < RETRIES:
+                self._retries += 1
+                self._due = time.monotonic() + self.debounce
+            return
+        self._sig = sig
+        self._retries = 0
+        self.reloads += 1
+        if data != self.data:
+            self.data = data
+            self.version += 1
+            for fn in list(self.listeners):
+                try:
+                    fn(data)
+                except Exception as e:
+                    print(f"[WARN] template_sync listener failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "events": self.events, "reloads": self.reloads,
+                "badReads": self.bad_reads, "version": self.version}
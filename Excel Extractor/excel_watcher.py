@@ -4,93 +4,222 @@
     python excel_watcher.py
 
 Поведение:
-    - Подключается к уже открытому Excel
-    - Каждые INTERVAL секунд читает ячейки odds и template
+    - Подключается к уже открытому Excel (--backend com), либо читает
+      сохранённый файл книги (--backend file), см. excel_backends.py
+    - Читает ячейки odds и template с адаптивным интервалом: POLL_MIN во время
+      активности (изменения ячеек / template_sync.json), затем экспоненциально
+      до POLL_MAX, пока ничего не меняется
+      (--mode events: только по событиям SheetChange/SheetCalculate листа)
+      (блоками: см. excel_cells.ReadPlan, --read-mode cells = по одной ячейке)
     - Пишет состояние в current_state.json для использования программой
+    - --serve ENDPOINT: дополнительно рассылает каждое изменение подписчикам
+      (NDJSON по локальному сокету / named pipe, см. excel_publish.py)
+    - --record PATH: пишет каждое изменение в кольцевой mmap-файл истории
+      (экспорт: python excel_history.py PATH --format csv)
+    - --replay FILE --speed N: без Excel, прогоняет записанный лог изменений
+      через тот же конвейер (см. excel_replay.py)
+    - Каждые --metrics-interval секунд печатает строку [METRICS] с p50/p95/p99/max
+      этапов (read, diff, serialize, replace, publish, tick), --metrics-file PATH
+      пишет то же в JSON (см. excel_metrics.py)
+    - Строки карт / колонки odds / ячейки статуса и команд (--backend com)
+      берутся из разметки листа (excel_layout.py, кэш layout_cache.json),
+      при смене шаблона разметка перепроверяется; --rediscover - заново
+    - Файл состояния пишет фоновый поток (excel_writer.py): не чаще раза в
+      --write-interval секунд, промежуточные состояния схлопываются, так
+      что медленный диск не тормозит опрос (--sync-write - как раньше)
+    - --shm PATH: то же состояние (без рынков) в mmap-файле фиксированного
+      размера с seqlock: читатель проверяет изменение по 8 байтам и копирует
+      снимок без разбора JSON (см. excel_shm.py)
+    - Старт: последний current_state.json сразу переписывается с
+      ``stale: true`` (табло показывает его до подключения к Excel), лист
+      оборачивается в early-bound класс makepy (--com-binding), книга
+      ищется через Workbooks(имя) + нормализованный путь, file-бэкенд и
+      win32com импортируются только когда нужны; время старта по фазам
+      печатается вместе с первым INIT (и попадает в его payload)
+    - Excel занят (правка ячейки, диалог): COM сам повторяет отклонённые
+      вызовы до --com-retry-ms, затем ячейки сохраняют последние значения
+      вместо None (после STALE_AFTER секунд - ``stale: true`` в состоянии,
+      короткие сбои ничего не пишут); закрытый / перезапущенный
+      Excel или переоткрытая книга подключаются заново без перезапуска
+      процесса, счётчики под ``session`` (см. excel_session.py)
+    - --markets all: каждый блок карты целиком одним чтением за опрос,
+      в состояние попадают только изменившиеся строки рынков
+      (см. excel_markets.py)
 
 Для управления odds используйте excel_hotkey_controller.py (заменил AHK).
 """
 
 import argparse
+import functools
 import json
 import os
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-
-try:
-    import win32com.client  # type: ignore
-except ImportError:
-    win32com = None  # type: ignore
+from typing import Callable, List, Dict, Any, Optional
+
+from excel_backends import (EXIT_EXCEL_NOT_RUNNING, EXIT_WORKBOOK_NOT_FOUND, SheetBackend,  # noqa: F401
+                            attach_excel_app, find_workbook, make_backend)
+from excel_cells import ReadPlan
+from excel_history import DEFAULT_CAPACITY, TickRecorder
+from excel_layout import DEFAULT_LAYOUT, Layout, LayoutIndex
+from excel_markets import MarketWatch, parse_cols
+from excel_metrics import Metrics, StartupTimer
+from excel_publish import KEYFRAME_INTERVAL, DeltaEncoder, PublishServer, encode_line
+from excel_shm import ShmSnapshot
+from excel_writer import WRITE_INTERVAL, StateWriter, replace_file  # noqa: F401 (replace_file: used via watcher.)
 
 DEFAULT_FILE_PATH = Path(r"C:\Users\kristian.vlassenko\Documents\Esports Excel Trading 16.04 mod.xlsm")
 SHEET_NAME = "InPlay FRONT"
 
-# Ячейки для чтения
-TEMPLATE_CELL = "C1"  # Имя шаблона (LoL Bo3, LoL Bo5, etc.)
-STATUS_CELL = "C6"    # Статус (Trading/Suspended)
-TEAM1_CELL = "K4"     # Название команды 1
-TEAM2_CELL = "N4"     # Название команды 2
+# Ячейки для чтения: разметка листа (excel_layout.py), по умолчанию
+# C1 (шаблон), C6 (статус), K4/N4 (команды), M/N строк 44/190/336/482/628.
+# Константы ниже повторяют текущую разметку (apply_layout).
+LAYOUT: Layout = DEFAULT_LAYOUT
+TEMPLATE_CELL = LAYOUT.template_cell  # Имя шаблона (LoL Bo3, LoL Bo5, etc.)
+STATUS_CELL = LAYOUT.status_cell      # Статус (Trading/Suspended)
+TEAM1_CELL = LAYOUT.team1_cell        # Название команды 1
+TEAM2_CELL = LAYOUT.team2_cell        # Название команды 2
 
 # Map Winner odds: (home, away) для каждой карты
-MAP_CELL_PAIRS: List[tuple] = [
-    ("M44", "N44"),    # Map 1
-    ("M190", "N190"),  # Map 2
-    ("M336", "N336"),  # Map 3
-    ("M482", "N482"),  # Map 4
-    ("M628", "N628"),  # Map 5
-]
-
-CELLS: List[str] = [TEMPLATE_CELL, STATUS_CELL, TEAM1_CELL, TEAM2_CELL] + [c for pair in MAP_CELL_PAIRS for c in pair]
-INTERVAL = 0.1  # секунды между чтениями (100ms для быстрого отклика на хоткеи)
+MAP_CELL_PAIRS: List[tuple] = LAYOUT.map_cell_pairs
+
+CELLS: List[str] = LAYOUT.cells
+POLL_MIN = 0.02     # интервал во время активности
+POLL_MAX = 0.5      # потолок интервала в простое
+POLL_BURST = 3.0    # секунд держать POLL_MIN после последнего изменения
+POLL_BACKOFF = 2.0  # множитель интервала в простое
+EVENT_RESYNC = 1.0  # --mode events: контрольное чтение, даже если событий не было
+STALE_AFTER = 2.0   # секунд без ответа Excel, после которых состояние пишется с ``stale: true``
+METRICS_INTERVAL = 10.0  # секунд между строками [METRICS]
+METRICS_SLICES = 6       # окно перцентилей = METRICS_SLICES * METRICS_INTERVAL
+WATCHER_STAGES = ["read", "diff", "serialize", "replace", "publish", "shm", "tick"]
 STATE_FILE = Path(__file__).parent / "current_state.json"
+SYNC_FILE = Path(__file__).parent / "template_sync.json"  # пишет Electron (текущая карта/шаблон)
 
 
 def ts() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-# Exit codes for structured error handling (Electron reads these)
-EXIT_EXCEL_NOT_RUNNING = 2
-EXIT_WORKBOOK_NOT_FOUND = 3
-
-
-def attach_excel_app():
-    """Connect to running Excel."""
-    if win32com is None:
-        raise SystemExit("pywin32 not installed. Run: pip install pywin32")
-    try:
-        app = win32com.client.GetObject(Class="Excel.Application")
-        return app
-    except Exception:
-        print("[ERROR] Excel is not running.", flush=True)
-        raise SystemExit(EXIT_EXCEL_NOT_RUNNING)
-
-
-def find_workbook(app, path: Path):
-    """Find already-open workbook (does NOT auto-open files)."""
-    for wb in app.Workbooks:
-        try:
-            if Path(wb.FullName).resolve().samefile(path):
-                return wb
-        except:
-            continue
-    
-    print(f"[ERROR] Workbook not found among open files: {path}", flush=True)
-    raise SystemExit(EXIT_WORKBOOK_NOT_FOUND)
-
-
-def parse_args() -> argparse.Namespace:
+def build_arg_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description="Excel watcher: reads odds cells and writes current_state.json")
     p.add_argument("--file", default=os.environ.get("ODDSMONI_EXCEL_FILE", ""),
                    help="Path to Excel file")
     p.add_argument("--sheet", default=SHEET_NAME, help="Sheet name")
-    return p.parse_args()
+    p.add_argument("--backend", choices=("com", "file", "memory"), default="com",
+                   help="com: running Excel; file: saved workbook on disk (re-read on change); "
+                        "memory: static cells from a .json --file (see excel_backends.py)")
+    p.add_argument("--com-binding", choices=("early", "dynamic"), default="early",
+                   help="early: makepy/gencache wrapper for the sheet (generated once, cached in gen_py); "
+                        "dynamic: late-bound dispatch (old behaviour)")
+    p.add_argument("--com-retry-ms", type=int, default=None, metavar="MS",
+                   help="how long COM retries calls a busy Excel rejects before the read keeps the last "
+                        "values (default 1000, see excel_session.py)")
+    p.add_argument("--read-mode", choices=("planned", "cells"), default="planned",
+                   help="planned: few block reads per poll; cells: one COM call per cell (legacy)")
+    p.add_argument("--markets", choices=("map", "all"), default="map",
+                   help="map: Map Winner odds only; all: every map block as one 2D read per tick, "
+                        "changed market rows in the state (see excel_markets.py)")
+    p.add_argument("--market-cols", type=parse_cols, default=None, metavar="A:N",
+                   help="--markets all: column span of the map blocks, e.g. A:N (default: A to the odds columns)")
+    p.add_argument("--mode", choices=("poll", "events"), default="poll",
+                   help="poll: adaptive interval (--poll-*); events: read on SheetChange/SheetCalculate (falls back to poll)")
+    p.add_argument("--event-resync", type=float, default=EVENT_RESYNC,
+                   help="events mode: safety re-read interval in seconds")
+    p.add_argument("--serve", default="",
+                   help="Also push every change to subscribers: tcp://127.0.0.1:PORT, unix socket path or \\\\.\\pipe\\NAME")
+    p.add_argument("--wire", choices=("full", "delta"), default="full",
+                   help="--serve message format: full state payload, or compact keyframes + deltas (excel_publish.DeltaEncoder)")
+    p.add_argument("--keyframe-interval", type=float, default=KEYFRAME_INTERVAL,
+                   help="--wire delta: seconds between periodic keyframes")
+    p.add_argument("--record", default="",
+                   help="Append every change to a memory-mapped tick ring file (export: excel_history.py)")
+    p.add_argument("--record-capacity", type=int, default=DEFAULT_CAPACITY,
+                   help="--record ring size in records (64 bytes each)")
+    p.add_argument("--shm", default="",
+                   help="Also keep a fixed-layout memory-mapped snapshot with a seqlock at PATH "
+                        "(zero-parse reads, see excel_shm.py)")
+    p.add_argument("--replay", default="",
+                   help="Drive the pipeline from a recorded change log instead of Excel (see excel_replay.py)")
+    p.add_argument("--speed", type=float, default=1.0,
+                   help="--replay speed: 1 = real time, N = N× faster, 0 = as fast as possible")
+    p.add_argument("--workbooks", nargs="+", default=None, metavar="PATH|auto",
+                   help="Watch several workbooks from one process (auto = every open workbook of every "
+                        "Excel instance); one state file per workbook, see excel_multi.py")
+    p.add_argument("--discover-interval", type=float, default=5.0,
+                   help="--workbooks auto: seconds between Running Object Table scans")
+    p.add_argument("--rediscover", action="store_true",
+                   help="Re-run sheet layout discovery instead of using layout_cache.json (see excel_layout.py)")
+    p.add_argument("--state-file", default="",
+                   help=f"State JSON output path (default: {STATE_FILE.name} next to this script)")
+    p.add_argument("--write-interval", type=float, default=WRITE_INTERVAL,
+                   help="min seconds between state file writes; states in between are merged (see excel_writer.py)")
+    p.add_argument("--sync-write", action="store_true",
+                   help="write the state file inside the poll loop (no writer thread, old behaviour)")
+    p.add_argument("--poll-min", type=float, default=POLL_MIN,
+                   help="poll mode: interval (s) while cells/template_sync.json are changing")
+    p.add_argument("--poll-max", type=float, default=POLL_MAX,
+                   help="poll mode: interval ceiling (s) when idle")
+    p.add_argument("--poll-burst", type=float, default=POLL_BURST,
+                   help="poll mode: seconds to stay at --poll-min after the last change")
+    p.add_argument("--poll-backoff", type=float, default=POLL_BACKOFF,
+                   help="poll mode: idle interval multiplier per poll")
+    p.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                   help="seconds between [METRICS] stage latency lines (0 = off)")
+    p.add_argument("--metrics-file", default="",
+                   help="Also write stage latency percentiles to this JSON file")
+    return p
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    return build_arg_parser().parse_args(argv)
+
+
+def apply_layout(layout: Layout):
+    """Make ``layout`` the module default (CELLS, MAP_CELL_PAIRS, header cells)."""
+    global LAYOUT, TEMPLATE_CELL, STATUS_CELL, TEAM1_CELL, TEAM2_CELL, MAP_CELL_PAIRS, CELLS
+    LAYOUT = layout
+    TEMPLATE_CELL, STATUS_CELL = layout.template_cell, layout.status_cell
+    TEAM1_CELL, TEAM2_CELL = layout.team1_cell, layout.team2_cell
+    MAP_CELL_PAIRS = layout.map_cell_pairs
+    CELLS = layout.cells
+
+
+def resolve_layout(backend: SheetBackend, path: Path, sheet_name: str,
+                   force: bool = False) -> Optional[LayoutIndex]:
+    """Cached/discovered layout of a live (com) sheet; None for file/memory (default layout)."""
+    if not backend.discoverable:
+        return None
+    index = LayoutIndex(path, sheet_name)
+    layout = index.resolve(backend.sheet, force)
+    print(f"[INFO] Layout: {layout.describe()} in {index.last_ms:.1f}ms")
+    return index
+
+
+def setup_markets(w: "Watcher", backend: SheetBackend, markets: str, cols: Optional[tuple] = None):
+    """--markets all on a Watcher (live sheets only: the file backend holds just the watched cells)."""
+    if markets != "all":
+        return
+    if backend.name == "file":
+        print("[WARN] --markets all needs the com or memory backend, watching Map Winner only")
+        return
+    w.enable_markets(cols)
+    mw = w.markets
+    print(f"[INFO] {w._tag}Markets: {mw.cell_count} cells in {len(mw.blocks)} block reads ({mw.describe()}), "
+          f"other cells: {w.plan.describe() or '-'}")
+
+
+def make_read_plan(cells: List[str], read_mode: str = "planned") -> ReadPlan:
+    """Build the per-poll read plan (``cells`` mode = one COM call per cell)."""
+    if read_mode == "cells":
+        return ReadPlan(cells, call_cost=0)
+    return ReadPlan(cells)
 
 
 def read_cells_batch(sheet, cells: List[str]) -> Dict[str, Any]:
-    """Read cells."""
+    """Read cells one by one (legacy path, see make_read_plan)."""
     values = {}
     for c in cells:
         try:
@@ -100,10 +229,10 @@ def read_cells_batch(sheet, cells: List[str]) -> Dict[str, Any]:
     return values
 
 
-def build_maps(full: dict) -> dict:
+def build_maps(full: dict, layout: Optional[Layout] = None) -> dict:
     """Построить структуру карт для JSON."""
     out = {}
-    for idx, (c1, c2) in enumerate(MAP_CELL_PAIRS, start=1):
+    for idx, (c1, c2) in (layout or LAYOUT).map_cells.items():
         out[str(idx)] = {
             "side1_cell": c1,
             "side2_cell": c2,
@@ -127,23 +256,24 @@ def get_max_maps_from_template(template: str) -> int:
     return 5  # по умолчанию
 
 
-def diff_maps(prev_full: dict, cur_full: dict) -> List[int]:
+def diff_maps(prev_full: dict, cur_full: dict, layout: Optional[Layout] = None) -> List[int]:
     """Найти какие карты изменились."""
     changed = []
-    for idx, (c1, c2) in enumerate(MAP_CELL_PAIRS, start=1):
+    for idx, (c1, c2) in (layout or LAYOUT).map_cells.items():
         if prev_full.get(c1) != cur_full.get(c1) or prev_full.get(c2) != cur_full.get(c2):
             changed.append(idx)
     return changed
 
 
-def write_state(timestamp: str, full: dict, changed: Optional[dict], first: bool, prev_full: Optional[dict]):
-    """Записать состояние в JSON файл."""
-    template_val = full.get(TEMPLATE_CELL)
+def state_header(full: dict, layout: Optional[Layout] = None) -> dict:
+    """template / maxMaps / имена команд из ячеек."""
+    layout = layout or LAYOUT
+    template_val = full.get(layout.template_cell)
     template_str = str(template_val).strip() if template_val else ""
     
     # Названия команд из K4/N4 (если пусто - Team 1/Team 2)
-    team1_raw = full.get(TEAM1_CELL)
-    team2_raw = full.get(TEAM2_CELL)
+    team1_raw = full.get(layout.team1_cell)
+    team2_raw = full.get(layout.team2_cell)
     team1_name = str(team1_raw).strip() if team1_raw else "Team 1"
     team2_name = str(team2_raw).strip() if team2_raw else "Team 2"
     if not team1_name:
@@ -151,23 +281,38 @@ def write_state(timestamp: str, full: dict, changed: Optional[dict], first: bool
     if not team2_name:
         team2_name = "Team 2"
     
+    return {
+        "template": template_str,
+        "maxMaps": get_max_maps_from_template(template_str),
+        "team1Name": team1_name,
+        "team2Name": team2_name,
+    }
+
+
+def match_key(full: dict, layout: Optional[Layout] = None) -> tuple:
+    """Шаблон + команды: смена означает новый матч."""
+    layout = layout or LAYOUT
+    return full.get(layout.template_cell), full.get(layout.team1_cell), full.get(layout.team2_cell)
+
+
+def build_state(timestamp: str, full: dict, changed: Optional[dict], first: bool, prev_full: Optional[dict],
+                extra: Optional[dict] = None, layout: Optional[Layout] = None) -> dict:
+    """Собрать payload состояния (то, что пишется в current_state.json)."""
+    layout = layout or LAYOUT
     template_changed = False
     if not first and prev_full:
-        template_changed = prev_full.get(TEMPLATE_CELL) != full.get(TEMPLATE_CELL)
+        template_changed = prev_full.get(layout.template_cell) != full.get(layout.template_cell)
     
     payload = {
         "ts": timestamp,
         "initial": first,
         "cells": full,
-        "maps": build_maps(full),
-        "template": template_str,
-        "maxMaps": get_max_maps_from_template(template_str),
-        "team1Name": team1_name,
-        "team2Name": team2_name,
+        "maps": build_maps(full, layout),
     }
+    payload.update(state_header(full, layout))
     
     if not first and prev_full:
-        maps_changed = diff_maps(prev_full, full)
+        maps_changed = diff_maps(prev_full, full, layout)
         if maps_changed:
             payload["mapsChanged"] = maps_changed
     
@@ -177,56 +322,579 @@ def write_state(timestamp: str, full: dict, changed: Optional[dict], first: bool
     if changed:
         payload["changed"] = changed
     
-    # Атомарная запись
-    tmp = STATE_FILE.with_suffix(".tmp")
-    try:
-        with tmp.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        tmp.replace(STATE_FILE)
-    except Exception as e:
-        print(f"[WARN] Не удалось записать {STATE_FILE}: {e}")
-
-
-def main():
-    args = parse_args()
-    file_path = Path(args.file).expanduser() if args.file else DEFAULT_FILE_PATH
-    sheet_name = args.sheet or SHEET_NAME
-
-    print("[INFO] Excel watcher started...")
-    print(f"[INFO] File: {file_path}")
-    print(f"[INFO] Sheet: {sheet_name}")
-    print(f"[INFO] Cells: {', '.join(CELLS)}")
-    
-    app = attach_excel_app()
-    wb = find_workbook(app, file_path)
+    if extra:
+        payload.update(extra)  # read stats, scheduler state
     
-    try:
-        sheet = wb.Worksheets(sheet_name)
-    except:
-        raise SystemExit(f"Sheet '{sheet_name}' not found.")
+    return payload
 
-    prev = None
-    
+
+def serialize_state(payload: dict) -> str:
+    # default=str like the wire (encode_line): whole map blocks may hold dates (pywintypes datetime)
+    return json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+
+
+def write_shm(shm: ShmSnapshot, full: dict, layout: Optional[Layout] = None):
+    """Header + Map Winner odds of ``full`` into the --shm snapshot."""
+    layout = layout or LAYOUT
+    head = state_header(full, layout)
+    status = full.get(layout.status_cell)
+    shm.write(head["template"], str(status).strip() if status is not None else "", head["team1Name"],
+              head["team2Name"], head["maxMaps"],
+              [(n, full.get(c1), full.get(c2)) for n, (c1, c2) in layout.map_cells.items()])
+
+
+def republish_stale(path: Path) -> Optional[dict]:
+    """Rewrite the last persisted state with ``stale: true`` so the board has data before the COM attach.
+
+    The first real write (INIT) drops the flag again.
+    """
     try:
-        while True:
-            current = read_cells_batch(sheet, CELLS)
-            
-            if prev is None:
-                now = ts()
-                print(f"{now} INIT: " + ", ".join(f"{k}={current[k]}" for k in CELLS))
-                write_state(now, current, None, first=True, prev_full=None)
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("cells"), dict):
+        return None
+    payload["stale"] = True
+    return payload if replace_file(path, serialize_state(payload)) else None
+
+
+def write_json(path: Path, payload: dict, writer: Optional[StateWriter] = None):
+    """Compact JSON side file (metrics, index): through the writer thread if there is one."""
+    if writer is not None:
+        writer.offer(path, payload, lambda p: json.dumps(p, ensure_ascii=False))
+    else:
+        replace_file(path, json.dumps(payload, ensure_ascii=False))
+
+
+def write_state_file(payload: dict):
+    """Атомарно записать payload в STATE_FILE."""
+    replace_file(STATE_FILE, serialize_state(payload))
+
+
+def write_state(timestamp: str, full: dict, changed: Optional[dict], first: bool, prev_full: Optional[dict],
+                extra: Optional[dict] = None) -> dict:
+    """Записать состояние в JSON файл."""
+    payload = build_state(timestamp, full, changed, first, prev_full, extra)
+    write_state_file(payload)
+    return payload
+
+
+class AdaptiveScheduler:
+    """Poll interval that bursts on activity and backs off when idle.
+
+    Stays at ``floor`` for ``burst`` seconds after the last activity, then
+    multiplies the interval by ``backoff`` per idle poll up to ``ceiling``.
+    """
+
+    def __init__(self, floor: float = POLL_MIN, ceiling: float = POLL_MAX,
+                 burst: float = POLL_BURST, backoff: float = POLL_BACKOFF):
+        self.floor = max(0.001, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.burst = max(0.0, burst)
+        self.backoff = max(1.0, backoff)
+        self.interval = self.floor
+        self.last_activity = time.monotonic()
+
+    def update(self, active: bool, now: Optional[float] = None) -> float:
+        """Feed one poll result, return the delay before the next poll."""
+        now = time.monotonic() if now is None else now
+        if active:
+            self.last_activity = now
+            self.interval = self.floor
+        elif now - self.last_activity >= self.burst:
+            self.interval = min(self.ceiling, self.interval * self.backoff)
+        return self.interval
+
+    @property
+    def mode(self) -> str:
+        if self.interval <= self.floor:
+            return "burst"
+        return "idle" if self.interval >= self.ceiling else "backoff"
+
+    def state(self) -> dict:
+        return {
+            "mode": self.mode,
+            "intervalMs": round(self.interval * 1000, 1),
+            "idleS": round(time.monotonic() - self.last_activity, 2),
+        }
+
+
+class FileTouchMonitor:
+    """Detects modifications of a file by mtime (one stat per check)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._sig = self._stat()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def touched(self) -> bool:
+        sig = self._stat()
+        if sig == self._sig:
+            return False
+        self._sig = sig
+        return True
+
+
+class Watcher:
+    """Read -> diff -> write_state pipeline shared by the poll and event loops."""
+
+    def __init__(self, plan: ReadPlan, scheduler: Optional[AdaptiveScheduler] = None,
+                 publisher: Optional[PublishServer] = None, encoder: Optional[DeltaEncoder] = None,
+                 recorder: Optional[TickRecorder] = None, metrics: Optional[Metrics] = None,
+                 layout: Optional[Layout] = None):
+        self.plan = plan
+        self.scheduler = scheduler
+        self.publisher = publisher
+        self.encoder = encoder  # None = publish the full state payload
+        self.recorder = recorder
+        self.metrics = metrics
+        self.metrics_file: Optional[Path] = None
+        self.metrics_interval = METRICS_INTERVAL
+        self.state_file: Optional[Path] = None  # None = STATE_FILE (excel_multi: one per workbook)
+        self.label = ""  # workbook name in log lines / payload (excel_multi)
+        self.layout = layout or LAYOUT
+        self.layouts: Optional[LayoutIndex] = None  # set by use_layouts: re-resolve on template change
+        self.markets: Optional[MarketWatch] = None  # --markets all, see enable_markets
+        self.writer: Optional[StateWriter] = None  # None = write the state file inline
+        self.shm: Optional[ShmSnapshot] = None  # --shm
+        self.startup: Optional[StartupTimer] = None  # reported with the first INIT, then dropped
+        self.on_layout: Optional[Callable[[Layout], None]] = None  # excel_bridge: share with the controller
+        self.session = None  # excel_session.ComSession of a com backend (counters in the payload)
+        self.stale: List[str] = []  # cells of the last read that kept an earlier value (Excel busy / gone)
+        self._stale_since: Optional[float] = None
+        self.clock: Callable[[], float] = time.monotonic  # STALE_AFTER timing (excel_bench: virtual)
+        self._stale_sent = False  # the last emitted state was marked stale
+        self._layout_template = ""
+        self._metrics_at = time.monotonic()
+        self.prev: Optional[dict] = None
+        if publisher is not None and encoder is not None:
+            publisher.welcome = self._keyframe_line
+            publisher.on_request = self._on_request
+
+    def _keyframe_line(self) -> Optional[bytes]:
+        msg = self.encoder.keyframe_now()
+        return encode_line(msg) if msg is not None else None
+
+    def _on_request(self, sub, req: dict):
+        if req.get("cmd") == "resync":
+            # Subscriber's reader thread: ordered against the poll thread's publishes
+            self.publisher.reply(sub, self._keyframe_line)
+
+    def use_layouts(self, index: LayoutIndex):
+        """Follow ``index``: its current layout now, a re-resolve whenever the template (C1) changes."""
+        self.layouts = index
+        self._layout_template = index.template
+        if index.layout != self.layout:
+            self.set_layout(index.layout)
+
+    def enable_markets(self, cols: Optional[tuple] = None):
+        """--markets all: map blocks are read whole; the ReadPlan keeps only the cells outside them."""
+        self.markets = MarketWatch(self.layout, cols)
+        self.plan = ReadPlan(self.markets.header_cells(), self.plan.call_cost)
+        if self.encoder is not None:
+            self.encoder.markets = self.markets.snapshot
+
+    def set_layout(self, layout: Layout):
+        """Switch cells / read plan / wire map cells; the next read starts over with INIT + keyframe."""
+        self.layout = layout
+        if self.markets is not None:
+            self.enable_markets(self.markets.cols)
+        else:
+            self.plan = ReadPlan(layout.cells, self.plan.call_cost)
+        if self.encoder is not None:
+            self.encoder.map_cells = [list(p) for p in layout.map_cell_pairs]
+            self.encoder.describe = functools.partial(state_header, layout=layout)
+        self.prev = None
+        if self.on_layout is not None:
+            self.on_layout(layout)
+
+    def check_layout(self, backend: SheetBackend):
+        """After a template change: cached (or rediscovered) layout for the new template."""
+        value = self.prev.get(self.layout.template_cell) if self.prev is not None else None
+        template = str(value).strip() if value is not None else ""
+        if template == self._layout_template:
+            return
+        self._layout_template = template
+        layout = self.layouts.resolve(backend.sheet)
+        if layout != self.layout:
+            print(f"{ts()} [INFO] {self._tag}Layout changed: {layout.describe()}")
+            self.set_layout(layout)
+
+    def extra(self) -> dict:
+        """Diagnostics merged into every state payload."""
+        out = {"read": self.plan.stats()}
+        if self.markets is not None:
+            out["marketRead"] = self.markets.stats()
+        if self.label:
+            out["workbook"] = self.label
+        if self.layouts is not None:
+            out["layout"] = self.layouts.stats()
+        if self.scheduler is not None:
+            out["scheduler"] = self.scheduler.state()
+        if self.publisher is not None:
+            out["publish"] = self.publisher.stats()
+            if self.encoder is not None:
+                out["publish"].update(self.encoder.stats())
+        if self.recorder is not None:
+            out["record"] = self.recorder.stats()
+        if self.writer is not None:
+            out["writer"] = self.writer.stats()
+        if self.shm is not None:
+            out["shm"] = self.shm.stats()
+        if self.startup is not None:
+            out["startup"] = self.startup.summary()
+        if self.session is not None:
+            out["session"] = self.session.stats()
+        if self._stale_sent:
+            out["stale"] = True  # Electron shows the values, frozen
+            out["staleCells"] = self.stale
+        return out
+
+    def set_metrics_output(self, interval: float, path: Optional[Path]):
+        self.metrics_interval = interval
+        self.metrics_file = path
+
+    def record(self, current: dict, changed: Optional[dict], prev: Optional[dict]):
+        """Append to the tick ring; a new match (C1/K4/N4) starts a new ring."""
+        rec = self.recorder
+        if prev is not None and match_key(prev, self.layout) != match_key(current, self.layout):
+            archive = rec.rotate(" vs ".join(str(v) for v in match_key(prev, self.layout)[1:] if v))
+            if archive is not None:
+                print(f"[INFO] Tick history archived: {archive}")
+            changed = None
+        # Every ring starts with a full snapshot so it replays on its own
+        rec.append_changes(current if changed is None or rec.written == 0 else changed)
+
+    def emit(self, timestamp: str, current: dict, changed: Optional[dict], first: bool, prev: Optional[dict],
+             markets: Optional[dict] = None):
+        """Push to subscribers first (lowest latency), then rewrite the state file."""
+        clock = time.perf_counter_ns
+        publish_ns = inline_ns = 0
+        if self.publisher is not None and self.encoder is not None:
+            t0 = clock()
+            cell = self.layout.template_cell
+            template_changed = prev is not None and prev.get(cell) != current.get(cell)
+            self.publisher.publish(self.encoder.encode(current, changed, force_keyframe=first or template_changed,
+                                                       markets=markets))
+            publish_ns = clock() - t0
+        if self.shm is not None:
+            t0 = clock()
+            write_shm(self.shm, current, self.layout)
+            if self.metrics is not None:
+                self.metrics.record_ns("shm", clock() - t0)
+        t0 = clock()
+        payload = build_state(timestamp, current, changed, first, prev, self.extra(), self.layout)
+        if markets:
+            payload["markets"] = markets  # changed rows only (all rows on INIT)
+        if self.publisher is not None and self.encoder is None:
+            t1 = clock()
+            self.publisher.publish(payload)
+            publish_ns = inline_ns = clock() - t1
+        if self.writer is not None:
+            # serialize + replace on the writer thread (recorded in its own histograms)
+            self.writer.offer(self.state_file or STATE_FILE, payload, serialize_state)
+            if self.metrics is not None and self.publisher is not None:
+                self.metrics.record_ns("publish", publish_ns)
+            return
+        text = serialize_state(payload)
+        t1 = clock()
+        replace_file(self.state_file or STATE_FILE, text)
+        m = self.metrics
+        if m is not None:
+            if self.publisher is not None:
+                m.record_ns("publish", publish_ns)
+            m.record_ns("serialize", t1 - t0 - inline_ns)
+            m.record_ns("replace", clock() - t1)
+
+    def emit_tick(self, timestamp: str, current: dict, changed: Optional[dict], first: bool, prev: Optional[dict],
+                  markets: Optional[dict] = None):
+        if self.recorder is not None and (changed or first):
+            self.record(current, changed, prev)
+        self.emit(timestamp, current, changed, first, prev, markets)
+
+    def read(self, backend: SheetBackend) -> tuple:
+        """(layout cells, changed market rows or None) from one pass over the backend."""
+        plan = self.plan
+        values = backend.read(plan)
+        self.stale = plan.stale
+        if self.markets is None:
+            return values, None
+        if plan.aborted:
+            # Excel busy / gone: the blocks would fail the same way, keep their last rows
+            covered, rows = self.markets.values(), None
+            self.stale = plan.stale + list(covered)
+        else:
+            covered, rows = self.markets.read(backend.sheet)
+        values.update(covered)
+        return {c: values.get(c) for c in self.layout.cells}, rows
+
+    def tick(self, backend: SheetBackend) -> bool:
+        """Read the backend once and publish if anything changed."""
+        m = self.metrics
+        t0 = time.perf_counter_ns()
+        if self.markets is None:
+            # Slot arrays of the plan: a tick without changes builds no dicts
+            backend.read_slots(self.plan)
+            self.stale = self.plan.stale
+            t1 = time.perf_counter_ns()
+            changed = self.process_slots()
+        else:
+            current, markets = self.read(backend)
+            t1 = time.perf_counter_ns()
+            changed = self.process(current, markets)
+        if m is not None:
+            m.record_ns("read", t1 - t0 - (self.markets.diff_ns if self.markets is not None else 0))
+            if changed:
+                m.record_ns("tick", time.perf_counter_ns() - t0)
+            if self.metrics_interval > 0 and time.monotonic() - self._metrics_at >= self.metrics_interval:
+                self.report_metrics()
+        if changed and self.layouts is not None:
+            self.check_layout(backend)
+        elif not changed and self.publisher is not None and self.encoder is not None and self.encoder.keyframe_due():
+            # --wire delta: periodic keyframe on a quiet sheet too (late joiners / lost deltas)
+            self.publisher.publish(self.encoder.encode(self.prev, None))
+        return changed
+
+    def report_metrics(self):
+        """Print the [METRICS] line (and --metrics-file), then slide the window."""
+        m = self.metrics
+        self._metrics_at = time.monotonic()
+        writer = self.writer
+        line = " | ".join(part for part in (m.line(), writer.line() if writer is not None else "") if part)
+        if line:
+            print(f"{ts()} [METRICS] {line}")
+        if self.metrics_file is not None:
+            stages = m.summary()
+            if writer is not None:
+                stages.update(writer.summary())
+            write_json(self.metrics_file, {"ts": ts(), "stages": stages}, writer)
+        m.rotate()
+        if writer is not None:
+            writer.rotate()
+
+    @property
+    def _tag(self) -> str:
+        return f"[{self.label}] " if self.label else ""
+
+    def _stale_now(self) -> bool:
+        """Cells have kept old values for STALE_AFTER seconds (shorter busy spells write nothing)."""
+        if not self.stale:
+            self._stale_since = None
+            return False
+        now = self.clock()
+        if self._stale_since is None:
+            self._stale_since = now
+        return now - self._stale_since >= STALE_AFTER
+
+    def process_slots(self) -> bool:
+        """``process`` for the read just made into the plan's slot arrays.
+
+        Changes are found by comparing the arrays (changed slot indices);
+        ``{cell: value}`` dicts are only built when something is published.
+        """
+        prev = self.prev
+        plan = self.plan
+        if prev is None:
+            return self.process(plan.as_dict())
+        t0 = time.perf_counter_ns()
+        changed = None
+        slots = plan.changed_slots()
+        if slots:
+            cells, cur = plan.cells, plan.cur
+            changed = {}
+            for i in slots:
+                if prev.get(cells[i]) != cur[i]:  # prev may hold a hotkey write the read now confirms
+                    changed[cells[i]] = cur[i]
+        if self.metrics is not None:
+            self.metrics.record_ns("diff", time.perf_counter_ns() - t0)
+        if not changed and self._stale_now() == self._stale_sent:
+            return False
+        current = plan.as_dict()
+        self.prev = current
+        return self._publish(current, changed or {}, None, prev)
+
+    def process(self, current: dict, markets: Optional[dict] = None) -> bool:
+        """Diff a fresh snapshot against the previous one and write state.
+
+        ``markets``: market rows that changed in this read (--markets all).
+        """
+        prev = self.prev
+        self.prev = current
+        plan = self.plan
+        plan.assume(current)  # the next slot read is compared against what is published here
+        mw = self.markets
+        if prev is None:
+            now = ts()
+            calls, ms = plan.last_calls, plan.last_ms
+            if mw is not None:
+                calls, ms = calls + mw.last_calls, ms + mw.last_ms
+                markets = mw.snapshot()
+            print(f"{now} {self._tag}INIT: " + ", ".join(f"{k}={current[k]}" for k in self.layout.cells)
+                  + f" | read: {calls} COM calls, {ms:.1f}ms"
+                  + (f" | markets: {mw.cell_count} cells in {len(mw.blocks)} blocks" if mw is not None else ""))
+            if self.startup is not None:
+                self.startup.mark("first read")
+                print(f"{now} [INFO] {self._tag}Startup: {self.startup.line()}")
+            self._stale_sent = self._stale_now()
+            self.emit_tick(now, current, None, True, None, markets)
+            self.startup = None
+            return True
+        t0 = time.perf_counter_ns()
+        changed = {k: v for k, v in current.items() if prev.get(k) != v}
+        if self.metrics is not None:
+            self.metrics.record_ns("diff", time.perf_counter_ns() - t0 + (mw.diff_ns if mw is not None else 0))
+        return self._publish(current, changed, markets, prev)
+
+    def _publish(self, current: dict, changed: dict, markets: Optional[dict], prev: dict) -> bool:
+        """CHG line + emit for a diffed snapshot (nothing if no cell, market row or stale flag changed)."""
+        stale = self._stale_now()
+        if not changed and not markets and stale == self._stale_sent:
+            return False
+        now = ts()
+        if stale != self._stale_sent:
+            # Only the flip is written: a busy Excel no longer shows up as changed cells
+            self._stale_sent = stale
+            if stale:
+                print(f"{now} [WARN] {self._tag}Excel not answering: {len(self.stale)} cells keep their last values")
             else:
-                changed = {k: v for k, v in current.items() if prev.get(k) != v}
-                if changed:
-                    now = ts()
-                    print(f"{now} CHG: " + ", ".join(f"{k}={changed[k]}" for k in changed))
-                    write_state(now, current, changed, first=False, prev_full=prev)
-            
-            prev = current
-            time.sleep(INTERVAL)
-            
-    except KeyboardInterrupt:
-        print("\n[INFO] Stopped.")
+                print(f"{now} [INFO] {self._tag}Excel answering again, values are live")
+        line = ", ".join(f"{k}={changed[k]}" for k in changed)
+        if markets:
+            rows = sum(len(v) for v in markets.values())
+            line += ("; " if line else "") + f"{rows} market rows (maps {', '.join(markets)})"
+        if line:
+            print(f"{now} {self._tag}CHG: {line}")
+        self.emit_tick(now, current, changed, False, prev, markets)
+        return True
+
+
+class SignalEventSource:
+    """Change notifications delivered from any thread (fake/test source).
+
+    ``fire(sheet_name)`` marks the watched sheet dirty; ``wait`` returns True
+    as soon as it is dirty, False on timeout. ComEventSource has the same
+    interface but is fed by Excel workbook events.
+    """
+
+    def __init__(self, sheet_name: str = SHEET_NAME):
+        self.sheet_name = sheet_name
+        self.events = 0
+        self._dirty = threading.Event()
+
+    def fire(self, sheet_name: Optional[str] = None):
+        if sheet_name is not None and sheet_name != self.sheet_name:
+            return
+        self.events += 1
+        self._dirty.set()
+
+    def wait(self, timeout: float) -> bool:
+        fired = self._dirty.wait(timeout)
+        self._dirty.clear()
+        return fired
+
+    def close(self):
+        pass
+
+
+class _WorkbookEvents:
+    """DispatchWithEvents sink: forwards SheetChange/SheetCalculate to the source."""
+
+    source: Optional["ComEventSource"] = None
+
+    def _on_sheet(self, sh):
+        src = self.source
+        if src is None:
+            return
+        try:
+            name = sh.Name
+        except Exception:
+            name = None  # can't tell which sheet - re-read to be safe
+        src.fire(name)
+
+    def OnSheetChange(self, Sh, Target):
+        self._on_sheet(Sh)
+
+    def OnSheetCalculate(self, Sh):
+        self._on_sheet(Sh)
+
+
+class ComEventSource(SignalEventSource):
+    """Workbook SheetChange/SheetCalculate events over COM.
+
+    COM events are delivered on this (STA) thread only while messages are
+    pumped, so ``wait`` pumps until the sheet fires or the timeout expires.
+    """
+
+    def __init__(self, wb, sheet_name: str):
+        super().__init__(sheet_name)
+        import pythoncom  # type: ignore
+        import win32com.client  # type: ignore
+        import win32event  # type: ignore
+        self._pythoncom = pythoncom
+        self._win32event = win32event
+        self._dispatch = win32com.client.DispatchWithEvents
+        self._sink = self._dispatch(wb, _WorkbookEvents)
+        self._sink.source = self
+
+    def rebind(self, wb):
+        """Events of ``wb`` from now on (the session reattached to a restarted Excel)."""
+        self.close()
+        self._sink = self._dispatch(wb, _WorkbookEvents)
+        self._sink.source = self
+        self._dirty.set()  # re-read right away
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            self._pythoncom.PumpWaitingMessages()
+            if self._dirty.is_set():
+                self._dirty.clear()
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._win32event.MsgWaitForMultipleObjects(
+                [], False, max(1, int(remaining * 1000)), self._win32event.QS_ALLINPUT)
+
+    def close(self):
+        try:
+            self._sink.source = None
+            self._sink.close()
+        except Exception:
+            pass
+
+
+def run_poll_loop(watcher: Watcher, backend: SheetBackend, scheduler: AdaptiveScheduler, sync: Optional[FileTouchMonitor] = None):
+    """Read with the adaptive interval; cell changes and template_sync.json touches count as activity."""
+    while True:
+        touched = sync.touched() if sync is not None else False
+        if touched:
+            scheduler.update(True)  # so the state written this tick already shows the burst
+        changed = watcher.tick(backend)
+        time.sleep(scheduler.update(changed or touched))
+
+
+def run_event_loop(watcher: Watcher, backend: SheetBackend, source, resync: float = EVENT_RESYNC):
+    """Read only when the watched sheet fires (plus a resync read every ``resync`` s).
+
+    The resync read covers changes made while VBA has Application.EnableEvents off.
+    """
+    watcher.tick(backend)
+    while True:
+        source.wait(resync)
+        watcher.tick(backend)
+
+
+def main(argv=None):
+    # Watcher entry point of excel_bridge (hotkeys only with --hotkeys)
+    from excel_bridge import main as bridge_main
+    bridge_main(argv, watch=True, hotkeys=None)
 
 
 if __name__ == "__main__":
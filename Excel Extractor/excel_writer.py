@@ -0,0 +1,177 @@
+"""Background state file writer for excel_watcher (``--write-interval``).
+
+Раньше current_state.json писался прямо в цикле опроса (json.dumps с
+indent=2 -> .tmp -> replace). Антивирус или папка OneDrive иногда держат
+такую запись 50-300 мс, и всё это время Excel не опрашивался. Здесь:
+
+    - цикл опроса только кладёт готовый payload в слот файла (последнее
+      значение побеждает) и сразу продолжает;
+    - один поток-писатель сериализует и заменяет файл не чаще раза в
+      ``min_interval`` секунд на файл; промежуточные состояния, которые
+      не успели записаться, схлопываются (``merged``), последним на диске
+      всегда оказывается самое свежее;
+    - ``close()`` дописывает то, что осталось в слотах;
+    - ``stats()`` (в payload под ``writer``) и гистограммы serialize /
+      replace / write_lag (от offer до файла на диске) в строке [METRICS].
+
+Файлы не пересекаются: у каждого пути свой слот (excel_multi пишет в один
+писатель состояния всех книг, индекс и --metrics-file).
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from excel_metrics import Metrics
+
+WRITE_INTERVAL = 0.05  # секунд между записями одного файла (при потоке изменений)
+WRITER_STAGES = ["serialize", "replace", "write_lag"]
+
+
+def replace_file(path: Path, text: str) -> bool:
+    """Атомарно заменить файл (tmp + replace)."""
+    tmp = path.with_suffix(".tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(text)
+        tmp.replace(path)
+        return True
+    except Exception as e:
+        print(f"[WARN] Не удалось записать {path}: {e}")
+        return False
+
+
+def dump_indented(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+
+
+class StateWriter:
+    """Latest-value-wins slot per file, drained by one writer thread."""
+
+    def __init__(self, min_interval: float = WRITE_INTERVAL, metrics_slices: int = 6,
+                 replace: Callable[[Path, str], bool] = replace_file):
+        self.min_interval = max(0.0, min_interval)
+        self.replace = replace
+        self.metrics = Metrics(metrics_slices, WRITER_STAGES)  # guarded by _cond (read from the poll thread)
+        self.offered = 0
+        self.writes = 0
+        self.merged = 0  # states replaced in their slot before they were written
+        self.failed = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self._cond = threading.Condition()
+        # path -> (payload, serialize, offered at ns)
+        self._slots: Dict[Path, Tuple[Any, Callable[[Any], str], int]] = {}
+        self._last_write: Dict[Path, float] = {}  # monotonic time of the last write start
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="state-writer", daemon=True)
+
+    def start(self) -> "StateWriter":
+        self._thread.start()
+        return self
+
+    def offer(self, path: Path, payload: Any, serialize: Callable[[Any], str] = dump_indented):
+        """Queue ``payload`` for ``path``; an unwritten earlier one for the same path is dropped.
+
+        ``payload`` must not be mutated afterwards (it is serialized on the writer thread).
+        """
+        with self._cond:
+            if path in self._slots:
+                self.merged += 1
+            self._slots[path] = (payload, serialize, time.perf_counter_ns())
+            self.offered += 1
+            self._cond.notify()
+
+    def _next(self) -> Optional[Tuple[Path, Any, Callable[[Any], str], int]]:
+        """Wait for the slot that may be written first (None once closed and drained)."""
+        with self._cond:
+            while True:
+                if self._slots:
+                    now = time.monotonic()
+                    wait = None
+                    for path in self._slots:
+                        due = self._last_write.get(path, 0.0) + self.min_interval
+                        if self._closed or due <= now:
+                            payload, serialize, offered_ns = self._slots.pop(path)
+                            self._last_write[path] = now
+                            self._busy = True
+                            return path, payload, serialize, offered_ns
+                        wait = due - now if wait is None else min(wait, due - now)
+                    self._cond.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        clock = time.perf_counter_ns
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            path, payload, serialize, offered_ns = item
+            t0 = clock()
+            try:
+                text = serialize(payload)
+            except Exception as e:
+                print(f"[WARN] State for {path.name} not serializable: {e}")
+                text = None
+            t1 = clock()
+            ok = text is not None and self.replace(path, text)
+            t2 = clock()
+            with self._cond:
+                self._busy = False
+                if ok:
+                    self.writes += 1
+                else:
+                    self.failed += 1
+                self.last_ms = (t2 - t0) / 1e6
+                self.max_ms = max(self.max_ms, self.last_ms)
+                m = self.metrics
+                m.record_ns("serialize", t1 - t0)
+                m.record_ns("replace", t2 - t1)
+                m.record_ns("write_lag", t2 - offered_ns)
+                self._cond.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every slot is written (ignores the interval); False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._last_write.clear()
+            self._cond.notify_all()
+            while self._slots or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Write what is left, then stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def line(self) -> str:
+        """Writer part of the [METRICS] line."""
+        with self._cond:
+            return self.metrics.line()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._cond:
+            return self.metrics.summary()
+
+    def rotate(self):
+        with self._cond:
+            self.metrics.rotate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"offered": self.offered, "writes": self.writes, "merged": self.merged, "failed": self.failed,
+                    "pending": len(self._slots), "lastMs": round(self.last_ms, 3), "maxMs": round(self.max_ms, 3),
+                    "minIntervalMs": round(self.min_interval * 1000, 1)}
@@ -0,0 +1,253 @@
+"""File backend for excel_watcher (``--backend file``): cells of a saved .xlsx/.xlsm without Excel.
+
+Отдельный модуль: zipfile / ElementTree / html нужны только этому бэкенду,
+excel_backends.make_backend импортирует его лишь для ``--backend file``,
+и обычный старт (com) их не грузит.
+"""
+
+import html
+import re
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from excel_backends import EXIT_WORKBOOK_NOT_FOUND, SheetBackend
+from excel_cells import MemorySheet, ReadPlan, parse_cell
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW_RE = re.compile(rb'<(?:\w+:)?row\b[^>]*?\br="(\d+)"[^>]*?(/?)>')
+_ROW_END_RE = re.compile(rb'</(?:\w+:)?row>')
+_CELL_RE = re.compile(rb'<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)', re.S)
+_ATTR_R_RE = re.compile(rb'\br="([A-Z]+\d+)"')
+_ATTR_T_RE = re.compile(rb'\bt="(\w+)"')
+_V_RE = re.compile(rb'<(?:\w+:)?v>(.*?)</(?:\w+:)?v>', re.S)
+_T_RE = re.compile(rb'<(?:\w+:)?t\b[^>]*>(.*?)</(?:\w+:)?t>', re.S)
+_SI_RE = re.compile(rb'<(?:\w+:)?si\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?si>)', re.S)
+_RPH_RE = re.compile(rb'<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>', re.S)
+
+CHUNK = 1 << 17
+
+
+def _text(raw: bytes) -> str:
+    return html.unescape(raw.decode("utf-8"))
+
+
+def _read_until_row(stream, max_row: int) -> bytes:
+    """Decompress the sheet part only up to the first row after ``max_row``.
+
+    Rows are stored in ascending order, so only the last row tag of each
+    chunk has to be checked.
+    """
+    buf = bytearray()
+    while True:
+        chunk = stream.read(CHUNK)
+        if not chunk:
+            return bytes(buf)
+        buf += chunk
+        m = _ROW_RE.search(buf, max(0, buf.rfind(b"<row ", 0, len(buf) - 64)))
+        last = None
+        while m is not None:
+            last = m
+            m = _ROW_RE.search(buf, m.end())
+        if last is not None and int(last.group(1)) > max_row:
+            return bytes(buf)
+
+
+def _find_row(data: bytes, row: int, pos: int) -> Optional["re.Match"]:
+    """Row tag for ``row`` at or after ``pos`` (Excel writes ``<row r="N"``, anything else via regex)."""
+    i = data.find(b'<row r="%d"' % row, pos)
+    if i >= 0:
+        return _ROW_RE.match(data, i)
+    return re.compile(rb'<(?:\w+:)?row\b[^>]*?\br="%d"[^>]*?(/?)>' % row).search(data, pos)
+
+
+class XlsxSheetReader:
+    """Streams target cells out of one worksheet part of an .xlsx/.xlsm zip."""
+
+    def __init__(self, path: Path, sheet_name: str):
+        self.path = path
+        self.sheet_name = sheet_name
+        self._part: Optional[str] = None
+        self._part_key = None  # CRCs of workbook.xml + rels the part was resolved from
+        self._strings: Dict[int, str] = {}  # only the indices target cells used
+        self._strings_crc = None
+
+    def _resolve_part(self, zf: zipfile.ZipFile) -> str:
+        key = (zf.getinfo("xl/workbook.xml").CRC, zf.getinfo("xl/_rels/workbook.xml.rels").CRC)
+        if self._part is not None and key == self._part_key:
+            return self._part
+        wb = ET.fromstring(zf.read("xl/workbook.xml"))
+        rid = None
+        for sh in wb.iter(f"{_NS_MAIN}sheet"):
+            if sh.get("name") == self.sheet_name:
+                rid = sh.get(f"{_NS_REL}id")
+                break
+        if rid is None:
+            raise KeyError(f"Sheet '{self.sheet_name}' not found in {self.path.name}")
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        target = None
+        for rel in rels.iter(f"{_NS_PKG_REL}Relationship"):
+            if rel.get("Id") == rid:
+                target = rel.get("Target")
+                break
+        if not target:
+            raise KeyError(f"Relationship {rid} for sheet '{self.sheet_name}' not found")
+        self._part = target.lstrip("/") if target.startswith("/") else "xl/" + target
+        self._part_key = key
+        return self._part
+
+    def part_crc(self, zf: zipfile.ZipFile) -> int:
+        return zf.getinfo(self._resolve_part(zf)).CRC
+
+    def _shared_strings(self, zf: zipfile.ZipFile, needed: set) -> Dict[int, str]:
+        """Decode only the ``needed`` shared string indices (cached per sharedStrings.xml CRC)."""
+        try:
+            info = zf.getinfo("xl/sharedStrings.xml")
+        except KeyError:
+            return {}
+        if info.CRC != self._strings_crc:
+            self._strings, self._strings_crc = {}, info.CRC
+        missing = needed - self._strings.keys()
+        if not missing:
+            return self._strings
+        upto = max(missing)
+        idx = 0
+        buf = b""
+        with zf.open(info) as f:
+            while idx <= upto:
+                chunk = f.read(CHUNK)
+                if not chunk:
+                    break
+                buf += chunk
+                end = 0
+                for m in _SI_RE.finditer(buf):
+                    if idx in missing:
+                        body = _RPH_RE.sub(b"", m.group(1) or b"")
+                        self._strings[idx] = "".join(_text(t) for t in _T_RE.findall(body))
+                    idx += 1
+                    end = m.end()
+                buf = buf[end:]
+        return self._strings
+
+    def read(self, zf: zipfile.ZipFile, cells: List[str]) -> Dict[str, Any]:
+        wanted: Dict[int, set] = {}
+        for c in cells:
+            r, _ = parse_cell(c)
+            wanted.setdefault(r, set()).add(c.upper())
+        max_row = max(wanted) if wanted else 0
+        with zf.open(self._resolve_part(zf)) as f:
+            data = _read_until_row(f, max_row)
+
+        raw: Dict[str, Tuple[Optional[bytes], bytes]] = {}
+        pos = 0
+        for row in sorted(wanted):
+            m = _find_row(data, row, pos)
+            if m is None or m.group(2) == b"/":
+                continue  # empty row
+            end = _ROW_END_RE.search(data, m.end())
+            pos = end.end() if end else len(data)
+            segment = data[m.end(): end.start() if end else len(data)]
+            targets = wanted[row]
+            for cm in _CELL_RE.finditer(segment):
+                rm = _ATTR_R_RE.search(cm.group(1))
+                if rm is None:
+                    continue
+                ref = rm.group(1).decode("ascii")
+                if ref in targets:
+                    tm = _ATTR_T_RE.search(cm.group(1))
+                    raw[ref] = (tm.group(1) if tm else None, cm.group(2) or b"")
+
+        need_strings = set()
+        for t, body in raw.values():
+            vm = _V_RE.search(body) if t == b"s" else None
+            if vm is not None:
+                need_strings.add(int(vm.group(1)))
+        strings = self._shared_strings(zf, need_strings) if need_strings else {}
+
+        out: Dict[str, Any] = {}
+        for c in cells:
+            item = raw.get(c.upper())
+            out[c] = self._value(item, strings) if item else None
+        return out
+
+    @staticmethod
+    def _value(item: Tuple[Optional[bytes], bytes], strings: Dict[int, str]) -> Any:
+        t, body = item
+        if t == b"inlineStr":
+            return "".join(_text(x) for x in _T_RE.findall(body)) or None
+        vm = _V_RE.search(body)
+        if vm is None:
+            return None
+        v = vm.group(1)
+        if t == b"s":
+            return strings.get(int(v))
+        if t in (b"str", b"e", b"d"):
+            return _text(v)
+        if t == b"b":
+            return v.strip() == b"1"
+        try:
+            return float(v)  # COM also returns numbers as float
+        except ValueError:
+            return _text(v)
+
+
+class FileBackend(SheetBackend):
+    """Saved workbook on disk, re-read when its mtime/size changes.
+
+    Only the target sheet's XML part is decompressed, only up to the last
+    watched row, and the cells are picked out of it by a byte scan instead
+    of loading the workbook. A half-written file (Excel saving) keeps the
+    previous values until the next change.
+    """
+
+    name = "file"
+
+    def __init__(self, path: Path, sheet_name: str):
+        self.path = Path(path)
+        self.sheet_name = sheet_name
+        self.reader = XlsxSheetReader(self.path, sheet_name)
+        self.sheet = MemorySheet()
+        self.reloads = 0
+        self.last_parse_ms = 0.0
+        self._sig = None
+        self._part_crc = None
+
+    def open(self) -> "FileBackend":
+        if not self.path.exists():
+            print(f"[ERROR] Workbook file not found: {self.path}", flush=True)
+            raise SystemExit(EXIT_WORKBOOK_NOT_FOUND)
+        return self
+
+    def _refresh(self, cells: List[str]):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return
+        sig = (st.st_mtime_ns, st.st_size)
+        if sig == self._sig:
+            return
+        t0 = time.perf_counter()
+        try:
+            with zipfile.ZipFile(self.path) as zf:
+                crc = self.reader.part_crc(zf)
+                if crc != self._part_crc:
+                    self.sheet.values = self.reader.read(zf, cells)
+                    self._part_crc = crc
+                    self.reloads += 1
+        except (zipfile.BadZipFile, OSError, EOFError, KeyError, ValueError) as e:
+            print(f"[WARN] Could not read {self.path.name}: {e}")
+            return  # retry on the next poll
+        self._sig = sig
+        self.last_parse_ms = (time.perf_counter() - t0) * 1000.0
+
+    def read_slots(self, plan: ReadPlan):
+        self._refresh(plan.cells)
+        plan.read_slots(self.sheet)
+
+    def describe(self) -> str:
+        return f"file ({self.path.name}, reloads {self.reloads}, last parse {self.last_parse_ms:.1f}ms)"
@@ -0,0 +1,97 @@
+"""ExcelBridge poll task without Excel (no hotkey controller).
+
+    python -m unittest test_excel_bridge      (or pytest, from this folder)
+"""
+
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import excel_watcher as watcher
+from excel_backends import MemoryBackend
+from excel_bridge import ExcelBridge
+from excel_scheduler import TaskScheduler
+from test_excel_events import seed_cells
+
+
+class FlakyBackend(MemoryBackend):
+    """MemoryBackend whose next ``fail`` reads raise."""
+
+    def __init__(self, values):
+        super().__init__(values)
+        self.fail = 0
+        self.reads = 0
+
+    def read_slots(self, plan):
+        self.reads += 1
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("injected read failure")
+        super().read_slots(plan)
+
+
+class BridgePollTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = [0.0]
+        self.tasks = TaskScheduler(clock=lambda: self.now[0])
+        self.backend = FlakyBackend(seed_cells())
+        self.poll = watcher.AdaptiveScheduler(0.01, 0.5, 0.0, 2.0)
+        self.w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS), self.poll)
+        self.w.state_file = Path(self.tmp.name) / "current_state.json"
+        self.bridge = ExcelBridge(self.w, self.backend, self.poll)
+        self.bridge.tasks = self.tasks
+        self.out = io.StringIO()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_for(self, seconds: float):
+        """Run the scheduler on its virtual clock (jump to each deadline)."""
+        end = self.now[0] + seconds
+        with contextlib.redirect_stdout(self.out):
+            while self.now[0] < end:
+                self.now[0] = min(end, self.now[0] + self.tasks.next_delay(end - self.now[0]))
+                self.tasks.run_due()
+
+    def state(self) -> dict:
+        return json.loads(self.w.state_file.read_text(encoding="utf-8"))
+
+    def test_poll_continues_after_a_failed_tick(self):
+        with contextlib.redirect_stdout(self.out):
+            self.bridge.start()
+        self.assertEqual(self.state()["cells"]["M44"], 1.5)
+
+        self.backend.fail = 1
+        self.backend.update({"M44": 2.5})
+        self.run_for(1.0)
+        self.assertIn("[WARN] Poll failed (1x): injected read failure", self.out.getvalue())
+        self.assertNotIn("[X] Scheduled task", self.out.getvalue())
+        self.assertEqual(self.bridge.errors, 0)  # reset by the next good poll
+        self.assertEqual(self.state()["cells"]["M44"], 2.5)
+        self.assertEqual(len(self.tasks), 1)  # still exactly one poll scheduled
+
+        reads = self.backend.reads
+        self.run_for(2.0)
+        self.assertGreater(self.backend.reads, reads)
+
+    def test_failed_poll_backs_off_to_the_ceiling(self):
+        times = []
+        read = self.backend.read_slots
+        self.backend.read_slots = lambda plan: (times.append(self.now[0]), read(plan))
+        with contextlib.redirect_stdout(self.out):
+            self.bridge.start()
+        self.backend.fail = 3
+        self.run_for(3.0)
+        self.assertEqual(self.out.getvalue().count("[WARN] Poll failed"), 3)
+        # each failed read is followed by a retry at the ceiling, then the adaptive interval again
+        gaps = [round(b - a, 3) for a, b in zip(times, times[1:])]
+        self.assertEqual(gaps[1:4], [0.5, 0.5, 0.5])
+        self.assertEqual(self.bridge.errors, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Command API (excel_commands.py) and the controller's update/no-update decision.
+
+    python -m unittest test_excel_commands    (or pytest, from this folder)
+
+ControllerUpdateTest needs the controller's imports (pywin32 + keyboard,
+i.e. Windows); Excel itself is not touched.
+"""
+
+import contextlib
+import io
+import unittest
+
+from excel_commands import update_after, validate
+from excel_keypath import STEP_BLOCKED, STEP_EDGE, STEP_OK, StepResult
+from excel_scheduler import TaskScheduler
+
+try:
+    import excel_hotkey_controller as controller
+except (ImportError, SystemExit):  # no pywin32 / keyboard here (the module exits without keyboard)
+    controller = None
+
+
+class CommandsTest(unittest.TestCase):
+    def test_update_after(self):
+        for cmd in ("prev", "next", "set"):
+            self.assertTrue(update_after({"id": 1, "cmd": cmd, "update": True}))
+            self.assertFalse(update_after({"id": 1, "cmd": cmd}))
+            self.assertFalse(update_after({"id": 1, "cmd": cmd, "update": False}))
+        for cmd in ("suspend", "update", "state"):
+            self.assertFalse(update_after({"id": 1, "cmd": cmd, "update": True}))
+
+    def test_validate(self):
+        self.assertIsNone(validate({"id": 1, "cmd": "next", "map": 2, "steps": 3, "update": True}))
+        self.assertIn("missing id", validate({"cmd": "next"}))
+        self.assertIn("unknown cmd", validate({"id": 1, "cmd": "jump"}))
+        self.assertIn("invalid map", validate({"id": 1, "cmd": "next", "map": 0}))
+        self.assertIn("invalid steps", validate({"id": 1, "cmd": "prev", "steps": True}))
+        self.assertIn("numeric value", validate({"id": 1, "cmd": "set", "value": "1.5"}))
+
+
+@unittest.skipIf(controller is None, "excel_hotkey_controller needs pywin32 + keyboard")
+class ControllerUpdateTest(unittest.TestCase):
+    """_api_command with the sheet step replaced: does Send Update follow, and when."""
+
+    def setUp(self):
+        self.now = [0.0]
+        ctl = controller.ExcelOddsHotkeyController(None)
+        ctl._scheduler = TaskScheduler(clock=lambda: self.now[0])
+        ctl._keys = object()  # connected (the step itself is stubbed below)
+        self.clicks = 0
+        self.result = StepResult(STEP_OK, 44, 1.5, 1.55, 2.45, 1)
+
+        def click() -> bool:
+            self.clicks += 1
+            return True
+        ctl.click_send_update_button = click
+        ctl._step_row = lambda map_num, row, offset, odds=None, enqueued=(): self.result
+        ctl._set_row = lambda map_num, row, value: self.result
+        self.ctl = ctl
+
+    def run_cmd(self, **req) -> dict:
+        req.setdefault("id", 1)
+        req.setdefault("map", 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            reply = self.ctl._api_command(req, 0, 0)
+            self.now[0] += controller.SUSPEND_UPDATE_DELAY
+            self.ctl._scheduler.run_due()
+        return reply
+
+    def test_update_follows_every_step_status(self):
+        for status, new in ((STEP_OK, 1.55), (STEP_OK, 1.5), (STEP_BLOCKED, None), (STEP_EDGE, 1.5)):
+            with self.subTest(status=status, new=new):
+                self.clicks = 0
+                self.result = StepResult(status, 44, 1.5, new, 2.45, 0)
+                reply = self.run_cmd(cmd="next", update=True)
+                self.assertEqual(reply["status"], status)
+                self.assertEqual(reply.get("update"), "scheduled")
+                self.assertEqual(self.clicks, 1)
+
+    def test_update_is_delayed_like_f22(self):
+        req = {"id": 1, "map": 1, "cmd": "prev", "update": True}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.ctl._api_command(req, 0, 0)
+            self.ctl._scheduler.run_due()
+        self.assertEqual(self.clicks, 0)
+        self.now[0] += controller.SUSPEND_UPDATE_DELAY
+        self.ctl._scheduler.run_due()
+        self.assertEqual(self.clicks, 1)
+
+    def test_no_update_without_the_flag(self):
+        for cmd in ("prev", "next"):
+            reply = self.run_cmd(cmd=cmd)
+            self.assertNotIn("update", reply)
+        reply = self.run_cmd(cmd="set", value=1.55)
+        self.assertNotIn("update", reply)
+        self.assertEqual(self.clicks, 0)
+
+    def test_set_with_update(self):
+        reply = self.run_cmd(cmd="set", value=1.55, update=True)
+        self.assertEqual(reply.get("update"), "scheduled")
+        self.assertEqual(self.clicks, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""--mode events without Excel: SignalEventSource -> run_event_loop -> state file.
+
+    python -m unittest test_excel_events      (or pytest, from this folder)
+"""
+
+import contextlib
+import io
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import excel_watcher as watcher
+from excel_backends import MemoryBackend
+
+
+class _Stop(Exception):
+    pass
+
+
+class StoppableSource(watcher.SignalEventSource):
+    """SignalEventSource whose wait() ends run_event_loop once stop() was called."""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+        self._stop = False
+
+    def wait(self, timeout: float) -> bool:
+        self.waits += 1
+        fired = super().wait(timeout)
+        if self._stop:
+            raise _Stop()
+        return fired
+
+    def stop(self):
+        self._stop = True
+        self._dirty.set()
+
+
+def seed_cells():
+    values = {c: 1.5 for c in watcher.CELLS}
+    values.update({"C1": "LoL Bo3", "C6": "Trading", "K4": "Team A", "N4": "Team B"})
+    return values
+
+
+class EventLoopTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_file = Path(self.tmp.name) / "current_state.json"
+        self.backend = MemoryBackend(seed_cells())
+        self.source = StoppableSource()
+        self.w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS))
+        self.w.state_file = self.state_file
+        self.out = io.StringIO()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.error = None
+
+    def tearDown(self):
+        self.source.stop()
+        self.thread.join(5)
+        self.tmp.cleanup()
+
+    def _loop(self):
+        try:
+            with contextlib.redirect_stdout(self.out):
+                watcher.run_event_loop(self.w, self.backend, self.source, resync=30.0)
+        except _Stop:
+            pass
+        except Exception as e:  # surfaced by the asserts below
+            self.error = e
+
+    def state(self, predicate, timeout: float = 5.0) -> dict:
+        """Wait for a state file matching ``predicate``."""
+        deadline = time.monotonic() + timeout
+        payload = None
+        while time.monotonic() < deadline:
+            try:
+                payload = json.loads(self.state_file.read_text(encoding="utf-8"))
+                if predicate(payload):
+                    return payload
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.01)
+        self.fail(f"state file never matched (last: {payload}, error: {self.error})")
+
+    def test_fire_reads_and_writes(self):
+        self.thread.start()
+        first = self.state(lambda p: p["cells"].get("M44") == 1.5)
+        self.assertEqual(first["cells"]["K4"], "Team A")
+
+        self.backend.update({"M44": 2.25})
+        self.source.fire(watcher.SHEET_NAME)
+        changed = self.state(lambda p: p["cells"].get("M44") == 2.25)
+        self.assertEqual(changed["changed"], {"M44": 2.25})
+        self.assertIn("CHG", self.out.getvalue())
+
+    def test_other_sheet_is_ignored(self):
+        self.thread.start()
+        self.state(lambda p: p["cells"].get("M44") == 1.5)
+        waits = self.source.waits
+        self.backend.update({"M44": 3.0})
+        self.source.fire("Some other sheet")
+        time.sleep(0.2)
+        # no wake-up: still in the same wait, nothing re-read
+        self.assertEqual(self.source.waits, waits)
+        self.assertEqual(json.loads(self.state_file.read_text(encoding="utf-8"))["cells"]["M44"], 1.5)
+
+        self.source.fire()  # unknown sheet name -> re-read to be safe
+        self.state(lambda p: p["cells"].get("M44") == 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
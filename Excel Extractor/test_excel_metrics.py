@@ -0,0 +1,59 @@
+"""Rolling latency histograms (excel_metrics.py).
+
+    python -m unittest test_excel_metrics     (or pytest, from this folder)
+"""
+
+import unittest
+
+from excel_metrics import LINEAR, Histogram, Metrics, bucket_index, bucket_value
+
+
+class HistogramTest(unittest.TestCase):
+    def test_small_values_are_exact(self):
+        for us in range(LINEAR):
+            self.assertEqual(bucket_value(bucket_index(us)), us)
+
+    def test_relative_error(self):
+        for us in (33, 100, 1000, 12345, 10 ** 6):
+            self.assertLess(abs(bucket_value(bucket_index(us)) - us) / us, 0.07)
+
+    def test_percentile_never_above_max(self):
+        h = Histogram()
+        h.record_us(1000)  # top bucket's midpoint is above 1000
+        self.assertGreater(bucket_value(bucket_index(1000)), 1000)
+        for q in (50, 95, 99, 100):
+            self.assertEqual(h.percentile(q), 1000.0)
+        s = h.summary()
+        self.assertEqual((s["p50"], s["p99"], s["max"]), (1.0, 1.0, 1.0))
+
+    def test_percentiles(self):
+        h = Histogram()
+        for us in range(1, 101):
+            h.record_us(us)
+        self.assertEqual(h.percentile(0), 1.0)
+        self.assertAlmostEqual(h.percentile(50), 50, delta=3)
+        self.assertAlmostEqual(h.percentile(99), 99, delta=6)
+        self.assertLessEqual(h.percentile(99), 100)
+
+    def test_window_slides(self):
+        h = Histogram(slices=2)
+        h.record_us(5000)
+        h.rotate()
+        h.record_us(10)
+        self.assertEqual(h.max_us(), 5000)
+        h.rotate()  # the 5000us slice leaves the window
+        self.assertEqual((h.window_count, h.total), (1, 2))
+        self.assertEqual(h.max_us(), 10)
+        self.assertEqual(h.percentile(99), 10.0)
+
+    def test_metrics_ns_to_ms(self):
+        m = Metrics(order=["read"])
+        m.record_ns("read", 2_000_000)
+        m.record_ns("extra", 500_000)
+        s = m.summary()
+        self.assertEqual(s["read"]["max"], 2.0)
+        self.assertEqual(s["extra"]["p50"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""--serve without Excel: a local socket client against PublishServer.
+
+    python -m unittest test_excel_publish     (or pytest, from this folder)
+"""
+
+import contextlib
+import io
+import json
+import socket
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import excel_watcher as watcher
+from excel_backends import MemoryBackend
+from excel_publish import DeltaEncoder, PublishServer
+from test_excel_events import seed_cells
+
+
+class Client:
+    """Line reader on a connected socket (timeouts fail the test instead of hanging it)."""
+
+    def __init__(self, sock: socket.socket):
+        sock.settimeout(5.0)
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    @classmethod
+    def connect(cls, server: PublishServer) -> "Client":
+        if server.kind == "tcp":
+            return cls(socket.create_connection(server.bound_address[:2]))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(server.address)
+        return cls(sock)
+
+    def message(self) -> dict:
+        line = self.file.readline()
+        if not line:
+            raise AssertionError("connection closed")
+        return json.loads(line)
+
+    def send(self, req: dict):
+        self.sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class PublishTest(unittest.TestCase):
+    endpoint = "tcp://127.0.0.1:0"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        if self.endpoint.startswith("unix://"):
+            self.endpoint = f"unix://{self.tmp.name}/pub.sock"
+        self.server = PublishServer(self.endpoint).start()
+        self.backend = MemoryBackend(seed_cells())
+        self.clients = []
+
+    def tearDown(self):
+        for c in self.clients:
+            c.close()
+        self.server.close()
+        self.tmp.cleanup()
+
+    def watcher(self, encoder=None) -> "watcher.Watcher":
+        w = watcher.Watcher(watcher.make_read_plan(watcher.CELLS), None, self.server, encoder)
+        w.state_file = Path(self.tmp.name) / "current_state.json"
+        return w
+
+    def tick(self, w, **cells) -> bool:
+        self.backend.update(cells)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return w.tick(self.backend)
+
+    def client(self) -> Client:
+        c = Client.connect(self.server)
+        self.clients.append(c)
+        self.assertTrue(wait_for(lambda: len(self.server.subscribers()) == len(self.clients)))
+        return c
+
+    def test_bound_endpoint(self):
+        if self.server.kind == "tcp":
+            self.assertNotEqual(self.server.bound_endpoint, self.endpoint)  # real port, not :0
+            self.assertTrue(self.server.bound_endpoint.endswith(f":{self.server.bound_address[1]}"))
+        else:
+            self.assertEqual(self.server.bound_endpoint, self.endpoint)
+
+    def test_full_payload(self):
+        w = self.watcher()
+        self.tick(w)
+        c = self.client()
+        first = c.message()  # the latest published state, right on connect
+        self.assertTrue(first["initial"])
+        self.assertEqual(first["cells"]["M44"], 1.5)
+        self.tick(w, M44=2.0)
+        self.assertEqual(c.message()["changed"], {"M44": 2.0})
+
+    def test_keyframe_then_delta(self):
+        w = self.watcher(DeltaEncoder(watcher.MAP_CELL_PAIRS, watcher.state_header))
+        self.tick(w)
+        c = self.client()
+        key = c.message()
+        self.assertEqual((key["t"], key["seq"]), ("k", 1))
+        self.assertEqual(key["cells"]["K4"], "Team A")
+        self.assertEqual(key["mapCells"][0], ["M44", "N44"])
+
+        self.tick(w, M44=2.0)
+        delta = c.message()
+        self.assertEqual((delta["t"], delta["seq"], delta["c"]), ("d", 2, {"M44": 2.0}))
+
+        c.send({"cmd": "resync"})
+        again = c.message()
+        self.assertEqual((again["t"], again["seq"]), ("k", 2))
+        self.assertEqual(again["cells"]["M44"], 2.0)
+
+    def test_quiet_sheet_gets_periodic_keyframes(self):
+        w = self.watcher(DeltaEncoder(watcher.MAP_CELL_PAIRS, watcher.state_header, keyframe_interval=0.05))
+        self.tick(w)
+        c = self.client()
+        self.assertEqual(c.message()["seq"], 1)
+        time.sleep(0.06)
+        self.assertFalse(self.tick(w))  # nothing changed
+        key = c.message()
+        self.assertEqual((key["t"], key["seq"]), ("k", 2))
+
+    def test_slow_subscriber_drops_instead_of_blocking(self):
+        self.server.max_queue = 4
+        stuck = self.client()  # never reads
+        fast = self.client()
+        blob = "x" * 256 * 1024
+        t0 = time.monotonic()
+        for n in range(100):  # ~25 MB: far more than the socket buffers hold
+            self.server.publish({"n": n, "blob": blob})
+        self.assertLess(time.monotonic() - t0, 2.0)  # publish never blocked on the stuck client
+        last = None
+        while last is None or last["n"] < 99:
+            last = fast.message()
+        self.assertEqual(last["n"], 99)  # the newest message always gets through
+        slow = [s for s in self.server.subscribers() if s.sent < 100]
+        self.assertTrue(slow)
+        self.assertGreater(sum(s.dropped for s in slow), 0)
+        self.assertGreater(self.server.stats()["dropped"], 0)
+        stuck.close()
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "no Unix sockets here")
+class UnixPublishTest(PublishTest):
+    endpoint = "unix://"
+
+
+if __name__ == "__main__":
+    unittest.main()
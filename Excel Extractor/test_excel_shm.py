@@ -0,0 +1,115 @@
+"""--shm round trip: ShmSnapshot (writer) -> ShmReader.
+
+    python -m unittest test_excel_shm         (or pytest, from this folder)
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import excel_watcher as watcher
+from excel_shm import SEQ_OFFSET, SIZE, ShmReader, ShmSnapshot, _SEQ
+from test_excel_events import seed_cells
+
+
+class ShmTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "state.shm"
+        self.writer = ShmSnapshot(self.path)
+        self.readers = []
+
+    def tearDown(self):
+        for r in self.readers:
+            r.close()
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def reader(self) -> ShmReader:
+        r = ShmReader(self.path)
+        self.readers.append(r)
+        return r
+
+    def test_round_trip(self):
+        self.writer.write("LoL Bo3", "Trading", "Team A", "Team B", 3,
+                          [(1, 1.5, 2.6), (2, "WIN", None), (3, True, 7)])
+        self.assertEqual(self.path.stat().st_size, SIZE)
+        snap = self.reader().read()
+        self.assertEqual(snap["seq"], 2)
+        self.assertTrue(snap["live"])
+        self.assertEqual((snap["template"], snap["status"], snap["team1Name"], snap["team2Name"], snap["maxMaps"]),
+                         ("LoL Bo3", "Trading", "Team A", "Team B", 3))
+        self.assertEqual(snap["maps"]["1"], {"side1": 1.5, "side2": 2.6, "changedSeq": 2})
+        self.assertEqual(snap["maps"]["2"], {"side1": "WIN", "side2": None, "changedSeq": 2})
+        self.assertEqual(snap["maps"]["3"], {"side1": True, "side2": 7.0, "changedSeq": 2})
+
+    def test_watcher_fields(self):
+        cells = seed_cells()
+        cells["M190"] = 3.25
+        watcher.write_shm(self.writer, cells)
+        snap = self.reader().read()
+        self.assertEqual((snap["template"], snap["team1Name"]), ("LoL Bo3", "Team A"))
+        self.assertEqual(snap["maps"]["2"]["side1"], 3.25)
+
+    def test_changed_seq_per_map(self):
+        maps = [(1, 1.5, 2.6), (2, 1.8, 2.0)]
+        self.writer.write("T", "S", "A", "B", 2, maps)             # seq 2
+        self.writer.write("T", "S", "A", "B", 2, [(1, 1.6, 2.4), (2, 1.8, 2.0)])  # seq 4: map 1 only
+        r = self.reader()
+        self.assertFalse(r.changed(4))
+        self.assertTrue(r.changed(2))
+        snap = r.read()
+        self.assertEqual(snap["seq"], 4)
+        self.assertEqual(snap["maps"]["1"]["changedSeq"], 4)
+        self.assertEqual(snap["maps"]["2"]["changedSeq"], 2)
+
+    def test_odd_seq_is_retried(self):
+        self.writer.write("T", "S", "A", "B", 1, [(1, 1.5, 2.6)])
+        r = self.reader()
+        mm = self.writer._mm
+        _SEQ.pack_into(mm, SEQ_OFFSET, 3)  # a write in progress
+        self.assertIsNone(r.read(retries=50))
+        self.assertEqual(r.retries, 50)
+
+        # the write completes while the reader is spinning: the copy is taken after it
+        done = threading.Timer(0.02, lambda: _SEQ.pack_into(mm, SEQ_OFFSET, 4))
+        done.start()
+        snap = r.read(retries=10 ** 7)
+        done.join()
+        self.assertIsNotNone(snap)
+        self.assertEqual(snap["seq"], 4)
+        self.assertGreater(r.retries, 50)
+
+    def test_reopen_continues_seq(self):
+        self.writer.write("T", "S", "A", "B", 1, [(1, 1.5, 2.6)])
+        r = self.reader()
+        self.writer.close()  # seq 4 (close bumps it once more)
+        self.writer = ShmSnapshot(self.path)
+        self.assertEqual(self.writer.seq, 4)
+        self.writer.write("T", "S", "A", "B", 1, [(1, 1.5, 2.6)])
+        self.assertEqual(self.writer.seq, 6)
+        snap = r.read()  # the old mapping sees the new writer
+        self.assertEqual(snap["seq"], 6)
+        self.assertTrue(snap["live"])
+
+    def test_close_clears_live(self):
+        self.writer.write("T", "S", "A", "B", 1, [(1, 1.5, 2.6)])
+        r = self.reader()
+        self.assertTrue(r.read()["live"])
+        self.writer.close()
+        snap = r.read()
+        self.assertFalse(snap["live"])
+        self.assertEqual(snap["seq"], 4)
+        self.assertEqual(snap["maps"]["1"]["side1"], 1.5)  # last values stay readable
+
+    def test_not_a_snapshot(self):
+        other = Path(self.tmp.name) / "other.bin"
+        other.write_bytes(b"\0" * SIZE)
+        with self.assertRaises(ValueError):
+            ShmReader(other)
+
+
+if __name__ == "__main__":
+    unittest.main()
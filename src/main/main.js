@@ -704,7 +704,8 @@ app.whenReady().then(()=>{
   // Auto-press IPC (extracted to modules/ipc/autoPress.js)
   try {
     const { initAutoPressIpc } = require('./modules/ipc/autoPress');
-    initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __autoLast, __sendInputScriptPath, broadcastAutoToggleAll });
+    initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __autoLast, __sendInputScriptPath, broadcastAutoToggleAll,
+      getExcelCommandEndpoint: () => (excelExtractorController ? excelExtractorController.getCommandEndpoint() : null) });
   } catch(e){ console.warn('[ipc][send-auto-press] register failed', e); }
   // Global Numpad5 toggle for auto modes (board + embedded stats) even when app not focused
   try {
@@ -0,0 +1,92 @@
+// Client for the Python hotkey controller's command API (Excel Extractor/excel_commands.py).
+// Line-delimited JSON over a local TCP socket: each request carries an id, each reply echoes it
+// with the applied result ({ ok, status, old, new, away, steps, queueMs, execMs }).
+// The endpoint comes from hotkey_status.json ("commandApi") via getEndpoint().
+
+const net = require('net');
+
+const CONNECT_TIMEOUT_MS = 500;
+const REPLY_TIMEOUT_MS = 1500;
+
+function createExcelCommandClient({ getEndpoint }) {
+  let sock = null;
+  let sockEndpoint = null;
+  let connecting = null; // Promise while a connect is in flight
+  let buf = '';
+  let nextId = 1;
+  const pending = new Map(); // id -> { resolve, timer }
+
+  function parseEndpoint(ep) {
+    const m = /^tcp:\/\/([^:]+):(\d+)$/.exec(String(ep || '').trim());
+    return m ? { host: m[1], port: Number(m[2]) } : null;
+  }
+
+  function failAll() {
+    for (const [id, p] of pending) { clearTimeout(p.timer); p.resolve({ id, ok: false, status: 'disconnected' }); pending.delete(id); }
+  }
+
+  function drop() {
+    try { if (sock) sock.destroy(); } catch (_) { }
+    sock = null; sockEndpoint = null; buf = '';
+    failAll();
+  }
+
+  function onData(chunk) {
+    buf += chunk.toString('utf8');
+    let nl;
+    while ((nl = buf.indexOf('\n')) !== -1) {
+      const line = buf.slice(0, nl); buf = buf.slice(nl + 1);
+      if (!line.trim()) continue;
+      let msg = null;
+      try { msg = JSON.parse(line); } catch (_) { continue; }
+      const p = msg && pending.get(msg.id);
+      if (!p) continue;
+      pending.delete(msg.id); clearTimeout(p.timer); p.resolve(msg);
+    }
+  }
+
+  function connect() {
+    const endpoint = getEndpoint && getEndpoint();
+    const addr = parseEndpoint(endpoint);
+    if (!addr) { if (sock) drop(); return Promise.resolve(null); }
+    if (sock && sockEndpoint === endpoint) return Promise.resolve(sock);
+    if (connecting) return connecting;
+    if (sock) drop(); // controller restarted on a new port
+    connecting = new Promise((resolve) => {
+      const s = net.connect(addr);
+      const timer = setTimeout(() => { s.destroy(); resolve(null); }, CONNECT_TIMEOUT_MS);
+      s.setNoDelay(true);
+      s.on('connect', () => {
+        clearTimeout(timer);
+        sock = s; sockEndpoint = endpoint; buf = '';
+        resolve(s);
+      });
+      s.on('data', onData);
+      s.on('error', () => { clearTimeout(timer); if (sock === s) drop(); resolve(null); });
+      s.on('close', () => { if (sock === s) drop(); });
+    }).finally(() => { connecting = null; });
+    return connecting;
+  }
+
+  // Resolves with the controller's reply; null only when nothing was sent (no endpoint / connect
+  // failed), so callers can fall back to the keystroke path without risking a double press.
+  // A sent request that gets no answer resolves with status 'timeout' / 'disconnected'.
+  async function send(cmd, fields) {
+    const s = await connect();
+    if (!s) return null;
+    const id = nextId++;
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => { pending.delete(id); resolve({ id, ok: false, status: 'timeout' }); }, REPLY_TIMEOUT_MS);
+      pending.set(id, { resolve, timer });
+      try { s.write(JSON.stringify(Object.assign({ id, cmd }, fields || {})) + '\n'); } catch (_) { pending.delete(id); clearTimeout(timer); resolve(null); }
+    });
+  }
+
+  function available() { return !!parseEndpoint(getEndpoint && getEndpoint()); }
+
+  function dispose() { drop(); }
+
+  return { send, available, dispose };
+}
+
+module.exports = { createExcelCommandClient };
@@ -22,6 +22,8 @@ function createExcelExtractorController({
     // Hotkey controller process (excel_hotkey_controller.py)
     hotkeyProc: null,
     hotkeyProcError: null,
+    // Hotkeys run inside the watcher process (excel_bridge.py, --hotkeys)
+    bridgeHotkeys: false,
 
     // AHK is managed by the Python extractor. We only surface its status (from current_state.json).
     ahkStatus: { running: false, starting: false, error: null, pid: null, exe: 'python', script: null, cwd: null, lastStderr: null },
@@ -250,6 +252,7 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
       currentMap: typeof data.currentMap === 'number' ? data.currentMap : null,
       maxMaps: typeof data.maxMaps === 'number' ? data.maxMaps : null,
       connected: !!data.connected, ts: data.ts || null,
+      commandApi: typeof data.commandApi === 'string' ? data.commandApi : null,
     };
   }
 
@@ -260,7 +263,7 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
       running: !!state.excelProc, starting: !!state.excelProcStarting,
       error: state.excelProcError, installing: !!state.excelDepsInstalling,
       ahk: Object.assign({}, state.ahkStatus, truncateStderr ? { lastStderr: short(state.ahkStatus.lastStderr, 220) } : {}),
-      hotkey: { running: !!state.hotkeyProc, error: state.hotkeyProcError },
+      hotkey: { running: !!state.hotkeyProc || (state.bridgeHotkeys && !!state.excelProc), error: state.hotkeyProcError },
       scriptMap: hs ? hs.currentMap : null, scriptMaxMaps: hs ? hs.maxMaps : null,
       scriptConnected: hs ? hs.connected : false,
     };
@@ -272,6 +275,9 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
   function pySpawnEnv() { return Object.assign({}, process.env, PYTHON_ENV); }
   function abortStart(msg) { state.excelProcError = msg; state.excelProcStarting = false; broadcastExcelStatus(); }
 
+  // Hotkey controller command socket (port picked by Python, published in hotkey_status.json)
+  const COMMAND_API = 'tcp://127.0.0.1:0';
+
   // Exit codes from excel_watcher.py for structured error handling
   const PY_EXIT_EXCEL_NOT_RUNNING = 2;
   const PY_EXIT_WORKBOOK_NOT_FOUND = 3;
@@ -355,6 +361,9 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
 
       const args = ['-u', scriptPath, '--file', workbookPath];
       const cwd = path.dirname(scriptPath);
+      // excel_bridge.py next to the watcher: one process, one COM connection for watcher + hotkeys
+      state.bridgeHotkeys = fs.existsSync(path.join(cwd, 'excel_bridge.py'));
+      if (state.bridgeHotkeys) args.push('--hotkeys', '--command-api', COMMAND_API);
 
       const spawnEnv = pySpawnEnv();
 
@@ -417,6 +426,7 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
 
         state.excelProc = null;
         state.excelProcStarting = false;
+        state.bridgeHotkeys = false;
         
         // Also stop hotkey controller when watcher exits
         stopHotkeyController();
@@ -458,8 +468,8 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
         }
       });
 
-      // Start hotkey controller after watcher is running
-      setTimeout(() => startHotkeyController(), 500);
+      // Start hotkey controller after watcher is running (separate process only without the bridge)
+      if (!state.bridgeHotkeys) setTimeout(() => startHotkeyController(), 500);
 
       broadcastExcelStatus();
     } catch (err) {
@@ -483,7 +493,7 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
     const py = resolvePythonExe();
 
     const cwd = path.dirname(scriptPath);
-    const args = ['-u', scriptPath];
+    const args = ['-u', scriptPath, '--command-api', COMMAND_API];
 
     try {
       state.hotkeyProc = spawn(py, args, { cwd, stdio: ['ignore', 'pipe', 'pipe'], env: pySpawnEnv(), windowsHide: true });
@@ -581,6 +591,14 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
 
   function getStatus() { return buildStatusPayload(false); }
 
+  // Command API endpoint of the running hotkey controller (null -> use keystrokes)
+  function getCommandEndpoint() {
+    const hotkeysRunning = !!state.hotkeyProc || (state.bridgeHotkeys && !!state.excelProc);
+    if (!hotkeysRunning) return null;
+    const hs = readHotkeyStatus();
+    return hs ? hs.commandApi : null;
+  }
+
   function dispose() {
     try { clearInterval(ahkPoll); } catch (_) { }
     try { stopExcelExtractor(); } catch (_) { }
@@ -605,6 +623,7 @@ print('MISSING:' + ','.join(missing) if missing else 'OK')
     stop: stopExcelExtractor,
     toggle,
     getStatus,
+    getCommandEndpoint,
     setExcelScriptPath,
     broadcastExcelStatus,
     dispose,
@@ -84,15 +84,16 @@ function createExcelWatcher({ win, store, sendOdds, statsManager, boardManager,
     return desired;
   }
 
-  function emitCurrent({ odds1, odds2, frozen, rawTs, mapId }){
+  function emitCurrent({ odds1, odds2, frozen, rawTs, mapId, stale }){
     const desiredMap = mapId || pickDesiredMap();
     const odds = [odds1, odds2].map(v=> (v==null||isNaN(v))? '-' : String(v));
-    const sig = (rawTs||'')+ ':' + desiredMap + ':' + odds.join('/') + ':' + (frozen?'F':'T');
+    const sig = (rawTs||'')+ ':' + desiredMap + ':' + odds.join('/') + ':' + (frozen?'F':'T') + (stale?':S':'');
     if(sig === lastSig && desiredMap === lastEmittedMap) return;
     lastSig = sig;
     lastEmittedMap = desiredMap;
   const payload = { broker:'excel', map:desiredMap, odds, frozen, ts:Date.now(), label:'Map '+desiredMap+' Winner', source:'excel' };
-  lastData = { odds1, odds2, frozen, rawTs, map: desiredMap };
+  if(stale) payload.stale = true;
+  lastData = { odds1, odds2, frozen, rawTs, map: desiredMap, stale: !!stale };
     try { win.webContents.send('odds-update', payload); } catch(e){ log('emit failed main win', e.message); }
     try { if(typeof sendOdds === 'function') sendOdds(payload); } catch(e){ log('emit forward failed', e.message); }
     // Note: Excel odds are no longer sent to extension - extension doesn't need them
@@ -136,7 +137,10 @@ function createExcelWatcher({ win, store, sendOdds, statsManager, boardManager,
       // Global status cell (default C6) for frozen detection
       const statusKey = (store.get('excelCurrentStateMapping')||{}).status || 'C6';
       const statusVal = String(cells[statusKey]||'').trim();
-      const frozen = /suspend|closed|halt|pause/i.test(statusVal||'');
+      // stale: last state republished by the extractor before it reached Excel, or Excel not answering
+      // (excel_session.py keeps the last values) - show it, but frozen
+      const stale = raw.stale === true;
+      const frozen = stale || /suspend|closed|halt|pause/i.test(statusVal||'');
       const desiredMap = pickDesiredMap();
       let odds1=null, odds2=null;
       if(maps && typeof maps==='object'){
@@ -177,7 +181,7 @@ function createExcelWatcher({ win, store, sendOdds, statsManager, boardManager,
           if(!isNaN(n1)) odds1=n1; if(!isNaN(n2)) odds2=n2;
       }
       if(odds1==null && odds2==null) return false;
-      emitCurrent({ odds1, odds2, frozen, rawTs: raw.ts||raw.timestamp||'', mapId: desiredMap });
+      emitCurrent({ odds1, odds2, frozen, rawTs: raw.ts||raw.timestamp||'', mapId: desiredMap, stale });
       return true;
     } catch(err){ log('current_state parse error', err.message); return false; }
   }
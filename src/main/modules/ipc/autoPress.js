@@ -3,8 +3,12 @@
 const fs = require('fs');
 const path = require('path');
 const { spawn } = require('child_process');
+const { createExcelCommandClient } = require('../excelCommandClient');
 
-function initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __autoLast, __sendInputScriptPath, broadcastAutoToggleAll }) {
+// F-key -> hotkey controller command API (excel_commands.py)
+const API_COMMANDS = { F21: 'suspend', F22: 'update', F23: 'prev', F24: 'next' };
+
+function initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __autoLast, __sendInputScriptPath, broadcastAutoToggleAll, getExcelCommandEndpoint }) {
   if (!ipcMain) return;
   if (app.__autoPressHandlerRegistered) return;
   app.__autoPressHandlerRegistered = true;
@@ -40,8 +44,13 @@ function initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __aut
     }
   }
 
+  // Direct command channel to the hotkey controller: no OS keyboard hop, and the reply
+  // carries the applied odds / blocked reason. Keystrokes remain the fallback.
+  const commandClient = getExcelCommandEndpoint ? createExcelCommandClient({ getEndpoint: getExcelCommandEndpoint }) : null;
+
   // Cleanup on app quit
   app.on('will-quit', () => {
+    try { if (commandClient) commandClient.dispose(); } catch (_) {}
     if (daemon && daemon.stdin && !daemon.stdin.destroyed) {
       try { daemon.stdin.write('EXIT\n'); } catch (_) {}
     }
@@ -137,26 +146,43 @@ function initAutoPressIpc({ ipcMain, app, broadcastToAll, getBroadcastCtx, __aut
     // Always write file signal for AHK
     writeAutoSignal({ side, key: keyLabel, direction, ts });
 
-    // SendInput via persistent PowerShell daemon (instant, no process spawn)
-    let sent = false;
-    try {
-      const injVk = vk;
-      if (injVk != null) {
-        sendVk(injVk);
-        sent = true;
-
-        // AUTO CONFIRM: directional key (F23/F24) → schedule F22 after 100ms
-        if (!noConfirm && (keyLabel === 'F23' || keyLabel === 'F24')) {
-          const confirmVk = 0x85; // F22
-          setTimeout(() => { sendVk(confirmVk); }, 100);
+    const apiCmd = API_COMMANDS[keyLabel];
+    if (apiCmd && commandClient && commandClient.available()) {
+      // F23/F24 confirm (F22) becomes update:true - the controller clicks Send Update 100 ms after the
+      // step whatever its status (blocked / edge / no-op too), same as the F22 the keystroke path sends
+      const fields = (!noConfirm && (keyLabel === 'F23' || keyLabel === 'F24')) ? { update: true } : {};
+      return commandClient.send(apiCmd, fields).then((reply) => {
+        if (reply) {
+          if (!reply.ok) console.log('[auto-press][api]', apiCmd, reply.status, reply.error || '');
+          return reply;
         }
-      }
-    } catch (e) { console.warn('[auto-press][ipc][si] unavailable', e.message); }
+        return pressViaKeys(); // API not reachable - nothing was sent
+      });
+    }
+    return pressViaKeys();
+
+    function pressViaKeys() {
+      // SendInput via persistent PowerShell daemon (instant, no process spawn)
+      let sent = false;
+      try {
+        const injVk = vk;
+        if (injVk != null) {
+          sendVk(injVk);
+          sent = true;
+
+          // AUTO CONFIRM: directional key (F23/F24) → schedule F22 after 100ms
+          if (!noConfirm && (keyLabel === 'F23' || keyLabel === 'F24')) {
+            const confirmVk = 0x85; // F22
+            setTimeout(() => { sendVk(confirmVk); }, 100);
+          }
+        }
+      } catch (e) { console.warn('[auto-press][ipc][si] unavailable', e.message); }
 
-    if (!sent) {
-      writeAutoSignal({ side, key: keyLabel, direction, ts });
+      if (!sent) {
+        writeAutoSignal({ side, key: keyLabel, direction, ts });
+      }
+      return true;
     }
-    return true;
   });
 
   // Auto mode relay